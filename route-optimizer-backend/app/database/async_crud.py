@@ -0,0 +1,171 @@
+"""Async counterparts of the CRUD classes in app.database.crud, for AsyncSession.
+
+Reads are native ``select()`` statements awaited on the async driver, so a
+slow query parks its coroutine instead of blocking the event loop. Code that
+is shared with the sync path (rollup deltas, the stats aggregate, the rollup
+reads) runs through ``AsyncSession.run_sync``: it still awaits the driver
+underneath, and the SQL stays in one place.
+
+Bulk inserts (``create_many``) stay sync-only: on PostgreSQL they COPY through
+psycopg2.
+"""
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import rollups
+from app.database.crud import CRUDRoute, CRUDStats, route_page, route_page_query
+from app.database.models import User, Route, OptimizationHistory
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AsyncCRUDUser:
+    """Async CRUD operations for User model"""
+
+    @staticmethod
+    async def get_by_api_key(db: AsyncSession, api_key: str):
+        """Get user by API key"""
+        return await db.scalar(select(User).where(User.api_key == api_key).limit(1))
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, user_id: int):
+        """Get user by ID"""
+        return await db.get(User, user_id)
+
+    @staticmethod
+    async def create(db: AsyncSession, business_name: str, contact_name: str, email: str,
+                     phone: str, api_key: str, subscription_plan: str = "free"):
+        """Create new user"""
+        user = User(
+            business_name=business_name,
+            contact_name=contact_name,
+            email=email,
+            phone=phone,
+            api_key=api_key,
+            subscription_plan=subscription_plan,
+            created_at=datetime.utcnow(),
+            rollups_backfilled_at=datetime.utcnow()  # no earlier rows to backfill
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+
+class AsyncCRUDRoute:
+    """Async CRUD operations for Route model"""
+
+    @staticmethod
+    async def create(db: AsyncSession, route_id: str, user_id: int, total_distance_km: float,
+                     total_cost_inr: float, cost_saved_inr: float, route_data: str):
+        """Create new route"""
+        route = Route(
+            route_id=route_id,
+            user_id=user_id,
+            total_distance_km=total_distance_km,
+            total_cost_inr=total_cost_inr,
+            cost_saved_inr=cost_saved_inr,
+            route_data=route_data,
+            optimization_date=datetime.utcnow(),
+            created_at=datetime.utcnow()
+        )
+        db.add(route)
+        await db.run_sync(rollups.apply, rollups.route_deltas([route]))
+        await db.commit()
+        await db.refresh(route)
+        return route
+
+    @staticmethod
+    async def get_user_route_page(db: AsyncSession, user_id: int, limit: int = 100,
+                                  cursor: Optional[str] = None) -> Tuple[List, Optional[str]]:
+        """One page of route summaries, newest first (see CRUDRoute.get_user_route_page)"""
+        rows = (await db.execute(route_page_query(user_id, limit, cursor))).all()
+        return route_page(rows, limit)
+
+    @staticmethod
+    async def get_by_route_id(db: AsyncSession, route_id: str):
+        """Get route by route ID"""
+        return await db.scalar(select(Route).where(Route.route_id == route_id).limit(1))
+
+    @staticmethod
+    async def delete(db: AsyncSession, route_id: str, user_id: int):
+        """Delete route (ensure user ownership)"""
+        route = await db.scalar(select(Route).where(
+            Route.route_id == route_id,
+            Route.user_id == user_id
+        ).limit(1))
+        if route:
+            await db.delete(route)
+            await db.run_sync(rollups.apply, rollups.route_deltas([route], sign=-1))
+            await db.commit()
+            return True
+        return False
+
+    @staticmethod
+    async def get_user_stats(db: AsyncSession, user_id: int):
+        """Get user's route statistics (one aggregate query, see CRUDRoute.get_user_stats)"""
+        return await db.run_sync(CRUDRoute.get_user_stats, user_id)
+
+class AsyncCRUDStats:
+    """Async analytics read from the per-user rollups"""
+
+    @staticmethod
+    async def get_user_stats(db: AsyncSession, user_id: int):
+        """Same shape as CRUDRoute.get_user_stats, from O(months) rollup rows"""
+        return await db.run_sync(CRUDStats.get_user_stats, user_id)
+
+    @staticmethod
+    async def get_timeseries(db: AsyncSession, user_id: int, period: str, start, end) -> List[Dict]:
+        """Per-day or per-month totals between two dates (periods without activity are omitted)"""
+        return await db.run_sync(CRUDStats.get_timeseries, user_id, period, start, end)
+
+class AsyncCRUDOptimization:
+    """Async CRUD operations for OptimizationHistory model"""
+
+    @staticmethod
+    async def create(db: AsyncSession, request_id: str, user_id: int, addresses_count: int,
+                     computation_time_ms: int, quality_score: float, success: bool = True,
+                     error_message: str = None, solver_trace: dict = None):
+        """Create optimization history record"""
+        history = OptimizationHistory(
+            request_id=request_id,
+            user_id=user_id,
+            addresses_count=addresses_count,
+            computation_time_ms=computation_time_ms,
+            quality_score=quality_score,
+            success=success,
+            error_message=error_message,
+            solver_trace=json.dumps(solver_trace, separators=(",", ":")) if solver_trace else None,
+            created_at=datetime.utcnow()
+        )
+        db.add(history)
+        await db.run_sync(rollups.apply, rollups.history_deltas([history]))
+        await db.commit()
+        await db.refresh(history)
+        return history
+
+    @staticmethod
+    async def get_user_history(db: AsyncSession, user_id: int, limit: int = 100):
+        """Get optimization history for user"""
+        return (await db.scalars(select(OptimizationHistory).where(
+            OptimizationHistory.user_id == user_id
+        ).order_by(desc(OptimizationHistory.created_at)).limit(limit))).all()
+
+    @staticmethod
+    async def get_by_request_id(db: AsyncSession, request_id: str):
+        """Get history by request ID"""
+        return await db.scalar(select(OptimizationHistory).where(
+            OptimizationHistory.request_id == request_id
+        ).limit(1))
+
+    @staticmethod
+    async def get_solver_trace(db: AsyncSession, request_id: str, user_id: int):
+        """Get the stored solver telemetry for a user's request, or None"""
+        trace = await db.scalar(select(OptimizationHistory.solver_trace).where(
+            OptimizationHistory.request_id == request_id,
+            OptimizationHistory.user_id == user_id
+        ).limit(1))
+        if not trace:
+            return None
+        return json.loads(trace)
@@ -0,0 +1,180 @@
+"""Bulk ingestion for Address, Route and OptimizationHistory.
+
+The CRUD classes add, commit and refresh one ORM object at a time. The
+functions here write many rows per statement instead, in one transaction per
+chunk of ``DATABASE_BULK_CHUNK_ROWS`` rows, without loading or refreshing
+objects:
+
+* PostgreSQL: ``COPY ... FROM STDIN`` (CSV) through the psycopg2 connection.
+  Address upserts COPY into a temporary table, then run
+  ``INSERT ... SELECT ... ON CONFLICT (user_id, external_id) DO UPDATE``.
+* SQLite (tests, local runs): one compiled ``INSERT`` (``INSERT ... ON
+  CONFLICT DO UPDATE`` for upserts) run with executemany over the chunk.
+
+Rows are plain dicts keyed by column name. Column defaults (``created_at``,
+``success``, ...) are filled in here, because COPY does not apply them. Route
+and history chunks update ``app.database.rollups`` in the same transaction.
+"""
+import io
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import rollups
+from app.database.models import Address, OptimizationHistory, Route
+
+ADDRESS_FIELDS = ("name", "street", "city", "postal_code", "phone", "latitude", "longitude")
+# Bound parameters per IN (...) lookup; SQLite builds before 3.32 allow only 999
+SQLITE_MAX_VARIABLES = 999
+
+
+def _chunks(rows: List[Dict], size: Optional[int]) -> Iterator[List[Dict]]:
+    size = size or settings.DATABASE_BULK_CHUNK_ROWS
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _columns(model) -> List[str]:
+    """Every column but the autoincrement primary key"""
+    return [c.name for c in model.__table__.columns if not c.primary_key]
+
+
+def _with_defaults(model, rows: List[Dict]) -> List[Dict]:
+    """Rows with every column present, unset ones taken from the column default (or None)"""
+    defaults = {}
+    for column in model.__table__.columns:
+        if column.primary_key:
+            continue
+        default = column.default
+        if default is None:
+            defaults[column.name] = None
+        elif default.is_callable:
+            defaults[column.name] = default.arg(None)  # one timestamp per chunk
+        else:
+            defaults[column.name] = default.arg
+    return [{**defaults, **row} for row in rows]
+
+
+def _csv_cell(value) -> str:
+    """One COPY CSV field: NULL is an unquoted empty field, so text is always quoted"""
+    if value is None:
+        return ""
+    if isinstance(value, (bool, int, float)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy(db: Session, table: str, columns: List[str], rows: List[Dict]):
+    """COPY rows into `table` on the session's connection (PostgreSQL/psycopg2 only)"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join([_csv_cell(row[c]) for c in columns]))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_many(db: Session, model, rows: List[Dict], chunk_rows: Optional[int], deltas) -> int:
+    """Insert in chunks; `deltas(chunk)` gives the rollup changes committed with each chunk"""
+    columns = _columns(model)
+    table = model.__table__.name
+    for chunk in _chunks(rows, chunk_rows):
+        chunk = _with_defaults(model, chunk)
+        if _is_postgres(db):
+            _copy(db, table, columns, chunk)
+        else:
+            db.execute(insert(model), chunk)
+        rollups.apply(db, deltas(chunk))
+        db.commit()
+    return len(rows)
+
+
+def insert_routes(db: Session, rows: List[Dict], chunk_rows: Optional[int] = None) -> int:
+    """Append Route rows (route_id, user_id, total_distance_km, ...); returns the row count"""
+    return _insert_many(db, Route, rows, chunk_rows, rollups.route_deltas)
+
+
+def insert_history(db: Session, rows: List[Dict], chunk_rows: Optional[int] = None) -> int:
+    """Append OptimizationHistory rows; a dict `solver_trace` is stored as compact JSON"""
+    rows = [
+        dict(row, solver_trace=json.dumps(row["solver_trace"], separators=(",", ":")))
+        if isinstance(row.get("solver_trace"), dict) else row
+        for row in rows
+    ]
+    return _insert_many(db, OptimizationHistory, rows, chunk_rows, rollups.history_deltas)
+
+
+def _existing_external_ids(db: Session, user_id: int, external_ids: List[int]) -> set:
+    found = set()
+    for start in range(0, len(external_ids), SQLITE_MAX_VARIABLES - 1):
+        batch = external_ids[start:start + SQLITE_MAX_VARIABLES - 1]
+        found.update(db.execute(
+            select(Address.external_id).where(Address.user_id == user_id, Address.external_id.in_(batch))
+        ).scalars())
+    return found
+
+
+def _upsert_chunk_postgres(db: Session, columns: List[str], chunk: List[Dict]):
+    """COPY into a per-connection staging table, then merge it into addresses"""
+    staging = "addresses_upsert"
+    connection = db.connection()
+    connection.exec_driver_sql(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS "
+        f"SELECT {', '.join(columns)} FROM addresses WITH NO DATA"
+    )
+    _copy(db, staging, columns, chunk)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in ADDRESS_FIELDS + ("updated_at",))
+    connection.exec_driver_sql(
+        f"INSERT INTO addresses ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {staging} "
+        f"ON CONFLICT (user_id, external_id) DO UPDATE SET {updates}"
+    )
+
+
+def _upsert_chunk_sqlite(db: Session, chunk: List[Dict]):
+    """One compiled INSERT ... ON CONFLICT DO UPDATE, executemany over the chunk"""
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    statement = sqlite_insert(Address)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "external_id"],
+        set_={c: statement.excluded[c] for c in ADDRESS_FIELDS + ("updated_at",)},
+    ), chunk)
+
+
+def upsert_addresses(db: Session, user_id: int, rows: List[Dict],
+                     chunk_rows: Optional[int] = None) -> Tuple[int, int]:
+    """Insert or update a user's addresses by external_id; returns (inserted, updated)
+
+    Each row needs external_id and the ADDRESS_FIELDS (postal_code and phone may
+    be missing). A later row with the same external_id wins. `created_at` of an
+    existing address is kept.
+    """
+    latest = {row["external_id"]: row for row in rows}  # dedupe: ON CONFLICT cannot hit a row twice per statement
+    now = datetime.utcnow()
+    rows = [
+        dict({f: row.get(f) for f in ADDRESS_FIELDS}, user_id=user_id, external_id=ext_id,
+             created_at=now, updated_at=now)
+        for ext_id, row in latest.items()
+    ]
+    columns = ["user_id", "external_id", *ADDRESS_FIELDS, "created_at", "updated_at"]
+    postgres = _is_postgres(db)
+
+    inserted = 0
+    for chunk in _chunks(rows, chunk_rows):
+        existing = _existing_external_ids(db, user_id, [row["external_id"] for row in chunk])
+        inserted += len(chunk) - len(existing)
+        if postgres:
+            _upsert_chunk_postgres(db, columns, chunk)
+        else:
+            _upsert_chunk_sqlite(db, chunk)
+        db.commit()
+    return inserted, len(rows) - inserted
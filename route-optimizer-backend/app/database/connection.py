@@ -1,8 +1,15 @@
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
 from app.database.models import Base
+from app.utils.metrics import register_pool
+from typing import Optional
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -13,18 +20,82 @@ engine = create_engine(
     pool_recycle=settings.DATABASE_POOL_RECYCLE,
     echo=False  # Set to True for SQL debugging
 )
+register_pool("sync", engine.pool)
 
 # Create session factory
 SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
 
+# Cleared while app.main runs create_all in the background at startup; the
+# session dependencies wait on it so early requests never see missing tables
+schema_ready = threading.Event()
+schema_ready.set()
+SCHEMA_WAIT_SECONDS = 30
+
+def wait_for_schema():
+    """Block until startup's create_all has finished (blocking: call it off the event loop)"""
+    if not schema_ready.wait(SCHEMA_WAIT_SECONDS):
+        logger.warning(f"Database schema still initializing after {SCHEMA_WAIT_SECONDS}s; continuing")
+
+# Async engine, created on first query: a request that fails validation or
+# never touches the database does not need the driver (asyncpg, aiosqlite)
+_async_engine: Optional[AsyncEngine] = None
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its async driver: asyncpg for PostgreSQL, aiosqlite for SQLite"""
+    url = make_url(url)
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}.get(url.get_backend_name())
+    if driver is None:
+        return url.render_as_string(hide_password=False)
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def get_async_engine() -> AsyncEngine:
+    """The shared async engine (same pool size and recycle as the sync one)"""
+    global _async_engine
+    if _async_engine is None:
+        url = make_url(settings.DATABASE_ASYNC_URL or async_database_url(settings.DATABASE_URL))
+        options = {"pool_size": settings.DATABASE_POOL_SIZE, "pool_recycle": settings.DATABASE_POOL_RECYCLE}
+        if url.get_backend_name() == "sqlite":
+            if url.database in (None, "", ":memory:"):
+                options = {}  # one shared connection (StaticPool)
+            else:
+                options["poolclass"] = AsyncAdaptedQueuePool  # aiosqlite defaults to NullPool
+        _async_engine = create_async_engine(url, echo=False, **options)
+        register_pool("async", _async_engine.sync_engine.pool)
+    return _async_engine
+
+class _AsyncEngineSession(Session):
+    """Sync half of an AsyncSession; resolves the async engine when a query needs it"""
+    
+    def get_bind(self, mapper=None, **kw):
+        return get_async_engine().sync_engine
+
+# Create async session factory
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, sync_session_class=_AsyncEngineSession,
+                                       expire_on_commit=False)
+
 def get_db():
     """Dependency function for FastAPI routes"""
+    wait_for_schema()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency for async routes: queries await the driver instead of blocking the event loop"""
+    if not schema_ready.is_set():
+        await run_in_threadpool(wait_for_schema)
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine():
+    """Close the async pool's connections (on shutdown)"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
 def init_db():
     """Initialize database tables"""
     try:
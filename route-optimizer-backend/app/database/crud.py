@@ -1,11 +1,32 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from app.database.models import User, Route, OptimizationHistory
-from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import desc, func, select, tuple_
+from app.database import bulk, rollups
+from app.database.models import User, Address, Route, OptimizationHistory
+from app.utils.pagination import decode_cursor, encode_cursor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+def route_page_query(user_id: int, limit: int, cursor: Optional[str]):
+    """Summary columns of up to limit + 1 routes after the cursor (see CRUDRoute.get_user_route_page)"""
+    query = select(
+        Route.id, Route.route_id, Route.optimization_date,
+        Route.total_distance_km, Route.total_cost_inr, Route.cost_saved_inr
+    ).where(Route.user_id == user_id)
+    if cursor:
+        query = query.where(tuple_(Route.optimization_date, Route.id) < tuple_(*decode_cursor(cursor)))
+    return query.order_by(desc(Route.optimization_date), desc(Route.id)).limit(limit + 1)
+
+def route_page(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    """Split route_page_query's rows into (page, next cursor or None)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].optimization_date, rows[-1].id)
+
 class CRUDUser:
     """CRUD operations for User model"""
     
@@ -30,13 +51,60 @@ class CRUDUser:
             phone=phone,
             api_key=api_key,
             subscription_plan=subscription_plan,
-            created_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            rollups_backfilled_at=datetime.utcnow()  # no earlier rows to backfill
         )
         db.add(user)
         db.commit()
         db.refresh(user)
         return user
 
+class CRUDAddress:
+    """CRUD operations for Address model (address book keyed by user_id + external_id)"""
+    
+    # Bound parameters per IN (...) query; SQLite's default limit is 999
+    LOOKUP_BATCH = 500
+    
+    @staticmethod
+    def upsert_many(db: Session, user_id: int, rows: List[Dict]) -> Tuple[int, int]:
+        """Insert or update addresses by external_id in bulk; returns (inserted, updated)
+        
+        Each row needs external_id, name, street, city, latitude, longitude;
+        postal_code and phone are optional. See app.database.bulk.
+        """
+        return bulk.upsert_addresses(db, user_id, rows)
+    
+    @staticmethod
+    def get_by_external_ids(db: Session, user_id: int, external_ids: List[int]) -> Dict[int, tuple]:
+        """external_id -> (name, street, city, postal_code, phone, latitude, longitude) for the ids found"""
+        found = {}
+        for start in range(0, len(external_ids), CRUDAddress.LOOKUP_BATCH):
+            batch = external_ids[start:start + CRUDAddress.LOOKUP_BATCH]
+            rows = db.query(
+                Address.external_id, Address.name, Address.street, Address.city,
+                Address.postal_code, Address.phone, Address.latitude, Address.longitude
+            ).filter(Address.user_id == user_id, Address.external_id.in_(batch))
+            for row in rows:
+                found[row[0]] = tuple(row[1:])
+        return found
+    
+    @staticmethod
+    def get_user_addresses(db: Session, user_id: int, limit: int = 100, offset: int = 0):
+        """Get a page of a user's address book, ordered by external_id"""
+        return db.query(Address).filter(
+            Address.user_id == user_id
+        ).order_by(Address.external_id).offset(offset).limit(limit).all()
+    
+    @staticmethod
+    def delete(db: Session, user_id: int, external_id: int):
+        """Delete an address book entry (ensure user ownership)"""
+        deleted = db.query(Address).filter(
+            Address.user_id == user_id,
+            Address.external_id == external_id
+        ).delete()
+        db.commit()
+        return deleted > 0
+
 class CRUDRoute:
     """CRUD operations for Route model"""
     
@@ -55,16 +123,35 @@ class CRUDRoute:
             created_at=datetime.utcnow()
         )
         db.add(route)
+        rollups.apply(db, rollups.route_deltas([route]))
         db.commit()
         db.refresh(route)
         return route
     
+    @staticmethod
+    def create_many(db: Session, routes: List[Dict]) -> int:
+        """Insert many routes (dicts of create()'s fields) in bulk; returns the count"""
+        return bulk.insert_routes(db, routes)
+    
     @staticmethod
     def get_user_routes(db: Session, user_id: int, limit: int = 100):
-        """Get all routes for a user, ordered by date descending"""
-        return db.query(Route).filter(
+        """Get a user's latest routes, ordered by date descending (route_data loads on access)"""
+        return db.query(Route).options(defer(Route.route_data)).filter(
             Route.user_id == user_id
-        ).order_by(desc(Route.optimization_date)).limit(limit).all()
+        ).order_by(desc(Route.optimization_date), desc(Route.id)).limit(limit).all()
+    
+    @staticmethod
+    def get_user_route_page(db: Session, user_id: int, limit: int = 100,
+                            cursor: Optional[str] = None) -> Tuple[List, Optional[str]]:
+        """One page of route summaries, newest first: (rows, cursor of the next page or None)
+        
+        Keyset pagination on (optimization_date, id) over ix_routes_user_date:
+        each page seeks past the previous page's last row, so every page costs
+        the same. Only the summary columns are selected, never route_data.
+        Raises InvalidCursor for a cursor this method did not produce.
+        """
+        rows = db.execute(route_page_query(user_id, limit, cursor)).all()
+        return route_page(rows, limit)
     
     @staticmethod
     def get_by_route_id(db: Session, route_id: str):
@@ -80,16 +167,29 @@ class CRUDRoute:
         ).first()
         if route:
             db.delete(route)
+            rollups.apply(db, rollups.route_deltas([route], sign=-1))
             db.commit()
             return True
         return False
     
     @staticmethod
     def get_user_stats(db: Session, user_id: int):
-        """Get user's route statistics"""
-        routes = db.query(Route).filter(Route.user_id == user_id).all()
+        """Get user's route statistics
+        
+        One aggregate query over the (user_id, optimization_date) index; no
+        route rows (or their route_data JSON) are loaded.
+        """
+        now = datetime.utcnow()
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        total_routes, total_distance_km, total_cost_saved_inr, average_distance_km, routes_this_month = db.query(
+            func.count(Route.id),
+            func.coalesce(func.sum(Route.total_distance_km), 0.0),
+            func.coalesce(func.sum(Route.cost_saved_inr), 0.0),
+            func.coalesce(func.avg(Route.total_distance_km), 0.0),
+            func.count(Route.id).filter(Route.optimization_date >= month_start)
+        ).filter(Route.user_id == user_id).one()
         
-        if not routes:
+        if not total_routes:
             return {
                 "total_routes": 0,
                 "total_distance_km": 0,
@@ -98,16 +198,6 @@ class CRUDRoute:
                 "routes_this_month": 0
             }
         
-        total_routes = len(routes)
-        total_distance_km = sum(r.total_distance_km for r in routes)
-        total_cost_saved_inr = sum(r.cost_saved_inr for r in routes)
-        average_distance_km = total_distance_km / total_routes if total_routes > 0 else 0
-        
-        # Count routes from this month
-        now = datetime.utcnow()
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        routes_this_month = len([r for r in routes if r.optimization_date >= month_start])
-        
         return {
             "total_routes": total_routes,
             "total_distance_km": round(total_distance_km, 2),
@@ -116,13 +206,56 @@ class CRUDRoute:
             "routes_this_month": routes_this_month
         }
 
+class CRUDStats:
+    """Analytics read from the per-user rollups (see app.database.rollups)"""
+    
+    @staticmethod
+    def get_user_stats(db: Session, user_id: int):
+        """Same shape as CRUDRoute.get_user_stats, from O(months) rollup rows
+        
+        Users whose rollups have not been backfilled (rows written before the
+        table existed) get the aggregate over their routes instead: their
+        rollups only hold what was written since.
+        """
+        if not rollups.is_backfilled(db, user_id):
+            return CRUDRoute.get_user_stats(db, user_id)
+        totals = rollups.totals(db, user_id)
+        total_routes = int(totals["route_count"])
+        if not total_routes:
+            return CRUDRoute.get_user_stats(db, user_id)  # nothing to average
+        
+        this_month = rollups.series(db, user_id, "month", *(2 * [rollups.period_start(datetime.utcnow(), "month")]))
+        return {
+            "total_routes": total_routes,
+            "total_distance_km": round(totals["total_distance_km"], 2),
+            "total_cost_saved_inr": round(totals["cost_saved_inr"], 2),
+            "average_distance_km": round(totals["total_distance_km"] / total_routes, 2),
+            "routes_this_month": this_month[0].route_count if this_month else 0
+        }
+    
+    @staticmethod
+    def get_timeseries(db: Session, user_id: int, period: str, start, end) -> List[Dict]:
+        """Per-day or per-month totals between two dates (periods without activity are omitted)"""
+        return [
+            {
+                "period_start": row.period_start.isoformat(),
+                "routes": row.route_count,
+                "total_distance_km": round(row.total_distance_km, 2),
+                "total_cost_inr": round(row.total_cost_inr, 2),
+                "cost_saved_inr": round(row.cost_saved_inr, 2),
+                "optimizations": row.optimization_count,
+                "computation_time_ms": row.computation_time_ms
+            }
+            for row in rollups.series(db, user_id, period, start, end)
+        ]
+
 class CRUDOptimization:
     """CRUD operations for OptimizationHistory model"""
     
     @staticmethod
     def create(db: Session, request_id: str, user_id: int, addresses_count: int,
                computation_time_ms: int, quality_score: float, success: bool = True,
-               error_message: str = None):
+               error_message: str = None, solver_trace: dict = None):
         """Create optimization history record"""
         history = OptimizationHistory(
             request_id=request_id,
@@ -132,13 +265,20 @@ class CRUDOptimization:
             quality_score=quality_score,
             success=success,
             error_message=error_message,
+            solver_trace=json.dumps(solver_trace, separators=(",", ":")) if solver_trace else None,
             created_at=datetime.utcnow()
         )
         db.add(history)
+        rollups.apply(db, rollups.history_deltas([history]))
         db.commit()
         db.refresh(history)
         return history
     
+    @staticmethod
+    def create_many(db: Session, records: List[Dict]) -> int:
+        """Insert many history records (dicts of create()'s fields) in bulk; returns the count"""
+        return bulk.insert_history(db, records)
+    
     @staticmethod
     def get_user_history(db: Session, user_id: int, limit: int = 100):
         """Get optimization history for user"""
@@ -152,3 +292,14 @@ class CRUDOptimization:
         return db.query(OptimizationHistory).filter(
             OptimizationHistory.request_id == request_id
         ).first()
+    
+    @staticmethod
+    def get_solver_trace(db: Session, request_id: str, user_id: int):
+        """Get the stored solver telemetry for a user's request, or None"""
+        history = db.query(OptimizationHistory).filter(
+            OptimizationHistory.request_id == request_id,
+            OptimizationHistory.user_id == user_id
+        ).first()
+        if not history or not history.solver_trace:
+            return None
+        return json.loads(history.solver_trace)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import BigInteger, Column, Date, Integer, String, Float, DateTime, Text, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -17,13 +17,19 @@ class User(Base):
     subscription_plan = Column(String(50), default="free")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
+    # Set once the analytics rollups cover all of the user's rows (see app.database.rollups)
+    rollups_backfilled_at = Column(DateTime, nullable=True)
 
 class Address(Base):
-    """Address model for storing delivery locations"""
+    """Address model for storing delivery locations (a user's address book)"""
     __tablename__ = "addresses"
+    __table_args__ = (
+        Index("ix_addresses_user_external", "user_id", "external_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, index=True)
+    external_id = Column(BigInteger)  # the customer's own stop id, unique per user
     name = Column(String(255))
     street = Column(String(255))
     city = Column(String(100))
@@ -32,10 +38,18 @@ class Address(Base):
     longitude = Column(Float)
     phone = Column(String(20), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 class Route(Base):
     """Route model for storing optimization results"""
     __tablename__ = "routes"
+    __table_args__ = (
+        # Per-user history and stats scan only this user's rows, in date order;
+        # id breaks ties for keyset pagination. On PostgreSQL the summed columns
+        # ride along, so get_user_stats is index-only
+        Index("ix_routes_user_date", "user_id", "optimization_date", "id",
+              postgresql_include=["total_distance_km", "cost_saved_inr"]),
+    )
     
     id = Column(Integer, primary_key=True)
     route_id = Column(String(50), unique=True, index=True)
@@ -59,5 +73,24 @@ class OptimizationHistory(Base):
     quality_score = Column(Float)
     success = Column(Boolean, default=True)
     error_message = Column(Text, nullable=True)
+    solver_trace = Column(Text, nullable=True)  # compact JSON, see SolveTelemetry.to_dict
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class UserStatsRollup(Base):
+    """Per-user totals per day and per month, kept up to date by the CRUD/bulk writers"""
+    __tablename__ = "user_stats_rollups"
+    __table_args__ = (
+        Index("ix_rollups_user_period", "user_id", "period", "period_start", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    period = Column(String(5), nullable=False)  # "day" or "month"
+    period_start = Column(Date, nullable=False)
+    route_count = Column(Integer, default=0)
+    total_distance_km = Column(Float, default=0.0)
+    total_cost_inr = Column(Float, default=0.0)
+    cost_saved_inr = Column(Float, default=0.0)
+    optimization_count = Column(Integer, default=0)
+    computation_time_ms = Column(BigInteger, default=0)
+
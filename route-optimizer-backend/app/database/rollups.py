@@ -0,0 +1,177 @@
+"""Per-user analytics rollups: ``python -m app.database.rollups [--user-id N]`` to backfill.
+
+``user_stats_rollups`` holds one row per user per day and per month with the
+route count, distance, cost, savings, optimization count and compute time of
+that period. Writers apply deltas in the same transaction as the rows they
+describe (``CRUDRoute.create``/``delete``, ``CRUDOptimization.create`` and the
+bulk inserts), as ``INSERT ... ON CONFLICT DO UPDATE SET col = col + delta``.
+Concurrent writers therefore never lose an update. Analytics then read
+O(months) rows instead of O(routes).
+
+The backfill recomputes the rollups from ``routes`` and
+``optimization_history``, for deployments that had data before the table
+existed or to repair drift. It stamps ``users.rollups_backfilled_at``; until
+then the user's rollups only hold what was written since the upgrade, and
+analytics read the routes instead. New users are stamped when created.
+"""
+import argparse
+import sys
+from collections import defaultdict
+from collections.abc import Mapping
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from app.database.models import OptimizationHistory, Route, User, UserStatsRollup
+
+PERIODS = ("day", "month")
+METRICS = ("route_count", "total_distance_km", "total_cost_inr", "cost_saved_inr",
+           "optimization_count", "computation_time_ms")
+
+Key = Tuple[int, str, date]
+
+
+def period_start(when: datetime, period: str) -> date:
+    day = when.date()
+    return day if period == "day" else day.replace(day=1)
+
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(UserStatsRollup)
+
+
+def apply(db: Session, deltas: Dict[Key, Dict[str, float]]):
+    """Add deltas to the rollup rows (user_id, period, period_start), creating them as needed
+
+    Does not commit: the caller commits with the rows the deltas describe.
+    """
+    if not deltas:
+        return
+    statement = _insert(db)
+    table = UserStatsRollup.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "period", "period_start"],
+        set_={m: table.c[m] + statement.excluded[m] for m in METRICS},
+    )
+    db.execute(statement, [
+        dict({m: 0 for m in METRICS}, user_id=user_id, period=period, period_start=start, **values)
+        for (user_id, period, start), values in deltas.items()
+    ])
+
+
+def _add(deltas: Dict[Key, Dict[str, float]], user_id: int, when: datetime, values: Dict[str, float]):
+    for period in PERIODS:
+        bucket = deltas[(user_id, period, period_start(when, period))]
+        for metric, value in values.items():
+            bucket[metric] = bucket.get(metric, 0) + (value or 0)
+
+
+def route_deltas(routes: Iterable, sign: int = 1) -> Dict[Key, Dict[str, float]]:
+    """Deltas for Route objects or mappings (user_id, optimization_date, distance/cost/saved)"""
+    deltas = defaultdict(dict)
+    for r in routes:
+        get = r.get if isinstance(r, Mapping) else lambda name: getattr(r, name)
+        _add(deltas, get("user_id"), get("optimization_date"), {
+            "route_count": sign,
+            "total_distance_km": sign * (get("total_distance_km") or 0),
+            "total_cost_inr": sign * (get("total_cost_inr") or 0),
+            "cost_saved_inr": sign * (get("cost_saved_inr") or 0),
+        })
+    return deltas
+
+
+def history_deltas(records: Iterable) -> Dict[Key, Dict[str, float]]:
+    """Deltas for OptimizationHistory objects or mappings (user_id, created_at, computation_time_ms)"""
+    deltas = defaultdict(dict)
+    for h in records:
+        get = h.get if isinstance(h, Mapping) else lambda name: getattr(h, name)
+        _add(deltas, get("user_id"), get("created_at"), {
+            "optimization_count": 1,
+            "computation_time_ms": get("computation_time_ms") or 0,
+        })
+    return deltas
+
+
+def is_backfilled(db: Session, user_id: int) -> bool:
+    """Whether the user's rollups cover all their rows (backfilled, or created after the rollups)"""
+    return db.scalar(select(User.rollups_backfilled_at).where(User.id == user_id)) is not None
+
+
+def totals(db: Session, user_id: int) -> Dict[str, float]:
+    """Sum of the user's monthly rollups (all time)"""
+    row = db.execute(
+        select(*[func.coalesce(func.sum(UserStatsRollup.__table__.c[m]), 0) for m in METRICS])
+        .where(UserStatsRollup.user_id == user_id, UserStatsRollup.period == "month")
+    ).one()
+    return dict(zip(METRICS, row))
+
+
+def series(db: Session, user_id: int, period: str, start: date, end: date) -> List[UserStatsRollup]:
+    """Rollup rows of one grain with start <= period_start <= end, oldest first"""
+    return list(db.execute(
+        select(UserStatsRollup).where(
+            UserStatsRollup.user_id == user_id,
+            UserStatsRollup.period == period,
+            UserStatsRollup.period_start >= start,
+            UserStatsRollup.period_start <= end,
+        ).order_by(UserStatsRollup.period_start)
+    ).scalars())
+
+
+def backfill(db: Session, user_id: Optional[int] = None, batch_rows: int = 10000) -> int:
+    """Rebuild rollups from routes and history (all users or one) in one transaction
+
+    Returns the number of rollup rows written. Source rows are streamed, so
+    memory is O(user-periods), not O(routes).
+    """
+    scope = [] if user_id is None else [UserStatsRollup.user_id == user_id]
+    db.execute(delete(UserStatsRollup).where(*scope))
+
+    deltas: Dict[Key, Dict[str, float]] = defaultdict(dict)
+    route_scope = [] if user_id is None else [Route.user_id == user_id]
+    routes = db.execute(
+        select(Route.user_id, Route.optimization_date, Route.total_distance_km,
+               Route.total_cost_inr, Route.cost_saved_inr).where(*route_scope)
+        .execution_options(yield_per=batch_rows)
+    ).mappings()
+    for key, values in route_deltas(routes).items():
+        deltas[key].update(values)
+
+    history_scope = [] if user_id is None else [OptimizationHistory.user_id == user_id]
+    records = db.execute(
+        select(OptimizationHistory.user_id, OptimizationHistory.created_at,
+               OptimizationHistory.computation_time_ms).where(*history_scope)
+        .execution_options(yield_per=batch_rows)
+    ).mappings()
+    for key, values in history_deltas(records).items():
+        deltas[key].update(values)
+
+    apply(db, deltas)
+    user_scope = [] if user_id is None else [User.id == user_id]
+    db.execute(update(User).where(*user_scope).values(rollups_backfilled_at=datetime.utcnow()))
+    db.commit()
+    return len(deltas)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild per-user analytics rollups")
+    parser.add_argument("--user-id", type=int, default=None, help="Only this user (default: everyone)")
+    args = parser.parse_args(argv)
+
+    from app.database.connection import SessionLocal, init_db
+    init_db()  # creates user_stats_rollups on databases that predate it
+    db = SessionLocal()
+    try:
+        written = backfill(db, args.user_id)
+    finally:
+        db.close()
+    print(f"Wrote {written} rollup rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.routing import Match
 import logging
-from datetime import datetime
+import threading
+import time
 from app.config import settings
-from app.routers import optimize, health, upload, history
-from app.database.connection import init_db
+from app.routers import optimize, health, upload, history, metrics, profiles, addresses
+from app.database.connection import dispose_async_engine, init_db, schema_ready
+from app.utils.loop_monitor import loop_monitor
+from app.utils.metrics import HTTP_REQUEST_SECONDS
+from app.utils.tracing import begin_trace
+from app.utils.profiler import profiling_middleware
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,6 +32,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _route_label(request: Request) -> str:
+    """Path template (not the raw path) so metric label cardinality stays bounded"""
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unknown")
+    return "unmatched"
+
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """Per-stage Server-Timing header and request latency histogram"""
+    trace = begin_trace()
+    start = time.perf_counter()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = trace.server_timing()
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method, route=_route_label(request), status=str(response.status_code)
+    )
+    return response
+
+if settings.ADMIN_API_KEY:
+    # Not registered at all otherwise, so normal deployments pay nothing for it
+    app.middleware("http")(profiling_middleware)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Error: {str(exc)}")
@@ -34,19 +65,45 @@ async def global_exception_handler(request, exc):
         content={"detail": "Internal server error"}
     )
 
-@app.on_event("startup")
-def startup_event():
-    """Initialize database on app startup"""
+def _init_db_background():
     try:
         init_db()
-        logger.info("Application started")
     except Exception as e:
         logger.error(f"Startup error: {str(e)}")
+    finally:
+        schema_ready.set()  # on failure, requests surface the database error themselves
+
+@app.on_event("startup")
+def startup_event():
+    """Initialize database without holding up the worker"""
+    if settings.INIT_DB_ON_STARTUP:
+        # create_all round-trips to the database per table; serve requests meanwhile.
+        # Database-backed requests wait for it (see get_db/get_async_db)
+        schema_ready.clear()
+        threading.Thread(target=_init_db_background, name="init-db", daemon=True).start()
+    logger.info("Application started")
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Sample event-loop lag for /api/health/loop"""
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+@app.on_event("shutdown")
+async def close_async_db():
+    await dispose_async_engine()
 
 app.include_router(health.router, prefix="/api/health")
 app.include_router(optimize.router, prefix="/api/optimize")
 app.include_router(upload.router, prefix="/api/upload")
 app.include_router(history.router)
+app.include_router(addresses.router)
+app.include_router(metrics.router)
+if settings.ADMIN_API_KEY:
+    app.include_router(profiles.router)
 
 @app.get("/")
 async def root():
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import List, Optional
 
 class AddressInput(BaseModel):
     """Input address from client"""
@@ -27,3 +27,7 @@ class AddressWithCoordinates(AddressInput):
     longitude: float = Field(..., ge=-180, le=180)
     geocoding_confidence: float = Field(default=0.95)
     geocoding_provider: str = "nominatim"
+
+class AddressBookUpsert(BaseModel):
+    """Bulk upsert into the address book; `id` is the caller's stable external id"""
+    addresses: List[AddressInput] = Field(..., min_length=1, max_length=10000)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, StringConstraints, field_validator, model_validator
+from typing import Annotated, List, Optional
 from datetime import datetime
 from app.models.address import AddressInput
 from app.models.route import Route, OptimizationMetrics
@@ -12,6 +12,51 @@ class OptimizationRequest(BaseModel):
     depot_name: str = Field(default="Office")
     optimize_for: str = Field(default="distance")
 
+Name = Annotated[str, StringConstraints(min_length=1, max_length=255)]
+Street = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=255)]
+City = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=100)]
+Latitude = Optional[Annotated[float, Field(ge=-90, le=90)]]
+Longitude = Optional[Annotated[float, Field(ge=-180, le=180)]]
+
+class ColumnarOptimizationRequest(BaseModel):
+    """Optimization request as parallel arrays (row i of every column is stop i)
+
+    Same rules as OptimizationRequest/AddressInput, without repeating every key
+    per stop. Optional columns may be omitted or hold nulls.
+    """
+    ids: List[int] = Field(..., min_length=2, max_length=1000)
+    names: List[Name]
+    streets: List[Street]
+    cities: List[City]
+    postal_codes: Optional[List[Optional[Annotated[str, StringConstraints(max_length=20)]]]] = None
+    phones: Optional[List[Optional[Annotated[str, StringConstraints(max_length=20)]]]] = None
+    latitudes: Optional[List[Latitude]] = None
+    longitudes: Optional[List[Longitude]] = None
+    depot_name: str = Field(default="Office")
+    optimize_for: str = Field(default="distance")
+
+    @model_validator(mode="after")
+    def columns_aligned(self):
+        n = len(self.ids)
+        for name in ("names", "streets", "cities", "postal_codes", "phones", "latitudes", "longitudes"):
+            column = getattr(self, name)
+            if column is not None and len(column) != n:
+                raise ValueError(f"{name} has {len(column)} rows, ids has {n}")
+        return self
+
+class AddressBookOptimizationRequest(BaseModel):
+    """Optimization request naming stops by address-book id (the first id is the depot)"""
+    address_ids: List[int] = Field(..., min_length=2, max_length=1000)
+    depot_name: str = Field(default="Office")
+    optimize_for: str = Field(default="distance")
+
+    @field_validator("address_ids")
+    @classmethod
+    def ids_unique(cls, v):
+        if len(set(v)) != len(v):
+            raise ValueError("address_ids must be unique")
+        return v
+
 class OptimizationResponse(BaseModel):
     """Optimization response"""
     request_id: str
@@ -0,0 +1,145 @@
+"""Columnar (struct-of-arrays) stops for the optimize pipeline.
+
+A request is validated once as pydantic ``AddressInput`` models and then
+converted to a ``StopSet``: ids and coordinates as NumPy arrays, text fields
+as parallel lists. The geocoder fills coordinates in place, the solver reads
+``coords`` directly and the response builder gathers rows by route order, so
+no stage re-validates or copies per-stop models.
+
+NumPy is imported here, so import this module lazily from routers (app.main
+stays NumPy-free at startup).
+"""
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.models.address import AddressInput, AddressWithCoordinates
+
+
+class StopSet:
+    """Validated stops as parallel arrays; row i of every field is stop i"""
+
+    __slots__ = ("ids", "coords", "source_index", "names", "streets", "cities", "postal_codes", "phones")
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        coords: np.ndarray,
+        names: List[str],
+        streets: List[str],
+        cities: List[str],
+        postal_codes: List[Optional[str]],
+        phones: List[Optional[str]],
+        source_index: Optional[np.ndarray] = None,
+    ):
+        self.ids = ids
+        self.coords = coords  # (n, 2) float64 lat/lng, NaN until geocoded
+        self.names = names
+        self.streets = streets
+        self.cities = cities
+        self.postal_codes = postal_codes
+        self.phones = phones
+        # Position of each stop in the original request, kept through take()
+        self.source_index = np.arange(len(ids)) if source_index is None else source_index
+
+    @classmethod
+    def from_addresses(cls, addresses: Sequence[AddressInput]) -> "StopSet":
+        n = len(addresses)
+        coords = np.full((n, 2), np.nan)
+        for i, a in enumerate(addresses):
+            # Same rule as the geocoder always used: 0/None means "look it up"
+            if a.latitude and a.longitude:
+                coords[i] = (a.latitude, a.longitude)
+        return cls(
+            ids=np.fromiter((a.id for a in addresses), dtype=np.int64, count=n),
+            coords=coords,
+            names=[a.name for a in addresses],
+            streets=[a.street for a in addresses],
+            cities=[a.city for a in addresses],
+            postal_codes=[a.postal_code for a in addresses],
+            phones=[a.phone for a in addresses],
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        ids: Sequence[int],
+        names: List[str],
+        streets: List[str],
+        cities: List[str],
+        postal_codes: Optional[List[Optional[str]]] = None,
+        phones: Optional[List[Optional[str]]] = None,
+        latitudes: Optional[Sequence[Optional[float]]] = None,
+        longitudes: Optional[Sequence[Optional[float]]] = None,
+    ) -> "StopSet":
+        """From already validated parallel columns (e.g. ColumnarOptimizationRequest)"""
+        n = len(ids)
+        coords = np.full((n, 2), np.nan)
+        if latitudes is not None and longitudes is not None:
+            coords[:, 0] = np.array(latitudes, dtype=np.float64)  # None -> NaN
+            coords[:, 1] = np.array(longitudes, dtype=np.float64)
+            # Same rule as from_addresses: a 0 in either column means "look it up"
+            coords[(coords == 0).any(axis=1)] = np.nan
+        return cls(
+            ids=np.asarray(ids, dtype=np.int64),
+            coords=coords,
+            names=names,
+            streets=streets,
+            cities=cities,
+            postal_codes=postal_codes if postal_codes is not None else [None] * n,
+            phones=phones if phones is not None else [None] * n,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def located(self) -> np.ndarray:
+        """Boolean mask of stops that have coordinates"""
+        return ~np.isnan(self.coords).any(axis=1)
+
+    def missing(self) -> List[int]:
+        return np.flatnonzero(~self.located).tolist()
+
+    def take(self, positions: Sequence[int]) -> "StopSet":
+        """Subset (or reorder) by row positions"""
+        idx = np.asarray(positions, dtype=np.intp)
+        rows = idx.tolist()
+        return StopSet(
+            ids=self.ids[idx],
+            coords=self.coords[idx],
+            names=[self.names[i] for i in rows],
+            streets=[self.streets[i] for i in rows],
+            cities=[self.cities[i] for i in rows],
+            postal_codes=[self.postal_codes[i] for i in rows],
+            phones=[self.phones[i] for i in rows],
+            source_index=self.source_index[idx],
+        )
+
+    def coord_tuples(self) -> List[Tuple[float, float]]:
+        return [(lat, lng) for lat, lng in self.coords.tolist()]
+
+    def to_columns(self) -> dict:
+        """Parallel lists shaped like ColumnarOptimizationRequest (missing coordinates as None)"""
+        lats, lngs = (
+            [None if v != v else v for v in column.tolist()] for column in self.coords.T
+        )
+        return {
+            "ids": self.ids.tolist(),
+            "names": self.names,
+            "streets": self.streets,
+            "cities": self.cities,
+            "postal_codes": self.postal_codes,
+            "phones": self.phones,
+            "latitudes": lats,
+            "longitudes": lngs,
+        }
+
+    def to_addresses(self) -> List[AddressWithCoordinates]:
+        """Per-stop models for callers that still want them (rows are already validated)"""
+        return [
+            AddressWithCoordinates.model_construct(
+                id=int(self.ids[i]), name=self.names[i], street=self.streets[i], city=self.cities[i],
+                postal_code=self.postal_codes[i], phone=self.phones[i],
+                latitude=lat, longitude=lng, geocoding_confidence=0.95, geocoding_provider="nominatim",
+            )
+            for i, (lat, lng) in enumerate(self.coords.tolist())
+        ]
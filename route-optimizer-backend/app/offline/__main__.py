@@ -0,0 +1,40 @@
+"""Run the offline Nominatim and OSRM stand-ins: ``python -m app.offline``"""
+import argparse
+import signal
+import threading
+from app.offline.servers import start_offline_services
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Nominatim/OSRM stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--nominatim-port", type=int, default=8088)
+    parser.add_argument("--osrm-port", type=int, default=5005)
+    parser.add_argument(
+        "--latency", default="none",
+        help="none | constant:MS | uniform:LOW:HIGH | normal:MEAN:STD | lognormal:MEDIAN:SIGMA",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="Fraction of geocode queries with no match")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    nominatim, osrm = start_offline_services(
+        args.host, args.nominatim_port, args.osrm_port,
+        args.latency, args.error_rate, args.not_found_rate, args.seed,
+    )
+    print(f"NOMINATIM_URL={nominatim.url}", flush=True)
+    print(f"OSRM_BASE_URL={osrm.url}", flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    nominatim.stop()
+    osrm.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Deterministic geometry model behind the offline Nominatim and OSRM stand-ins.
+
+Geocoding hashes the query to a point around a known Indian city, and road
+distances are haversine scaled by a detour factor, so the same request always
+gets the same answer on every machine.
+"""
+import hashlib
+from typing import List, Tuple, Optional, Dict, Any
+from app.services.distance_calculator import DistanceCalculator
+
+ROAD_FACTOR = 1.3       # Road distance / straight-line distance
+ROAD_SPEED_KMH = 25.0   # Average urban driving speed
+CITY_SPREAD_DEG = 0.08  # How far geocoded points scatter around a city centre
+
+CITIES = {
+    "delhi": (28.6139, 77.2090),
+    "new delhi": (28.6139, 77.2090),
+    "mumbai": (19.0760, 72.8777),
+    "bengaluru": (12.9716, 77.5946),
+    "bangalore": (12.9716, 77.5946),
+    "hyderabad": (17.3850, 78.4867),
+    "chennai": (13.0827, 80.2707),
+    "pune": (18.5204, 73.8567),
+    "kolkata": (22.5726, 88.3639),
+    "ahmedabad": (23.0225, 72.5714),
+    "jaipur": (26.9124, 75.7873),
+    "gurgaon": (28.4595, 77.0266),
+    "noida": (28.5355, 77.3910),
+}
+DEFAULT_CITY = "delhi"
+
+Coord = Tuple[float, float]
+
+
+def _unit_hash(text: str, salt: str) -> float:
+    digest = hashlib.sha256(f"{salt}:{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def geocode(query: str, not_found_rate: float = 0.0) -> Optional[Dict[str, Any]]:
+    """Nominatim-style place for a free-text query, or None when 'not found'"""
+    normalized = " ".join(query.lower().split())
+    if not normalized or _unit_hash(normalized, "miss") < not_found_rate:
+        return None
+    city = next((c for c in sorted(CITIES, key=len, reverse=True) if c in normalized), DEFAULT_CITY)
+    c_lat, c_lng = CITIES[city]
+    lat = c_lat + (_unit_hash(normalized, "lat") - 0.5) * 2 * CITY_SPREAD_DEG
+    lng = c_lng + (_unit_hash(normalized, "lng") - 0.5) * 2 * CITY_SPREAD_DEG
+    return {
+        "place_id": int(_unit_hash(normalized, "id") * 10 ** 9),
+        "lat": f"{lat:.7f}",
+        "lon": f"{lng:.7f}",
+        "display_name": f"{query}, {city.title()}, India",
+        "class": "place",
+        "type": "house",
+        "importance": 0.5,
+        "boundingbox": [f"{lat - 0.0005:.7f}", f"{lat + 0.0005:.7f}", f"{lng - 0.0005:.7f}", f"{lng + 0.0005:.7f}"],
+    }
+
+
+def road_distance_m(a: Coord, b: Coord) -> float:
+    return round(DistanceCalculator.haversine_distance(a[0], a[1], b[0], b[1]) * 1000 * ROAD_FACTOR, 1)
+
+
+def road_duration_s(distance_m: float) -> float:
+    return round(distance_m / (ROAD_SPEED_KMH / 3.6), 1)
+
+
+def table(
+    coords: List[Coord],
+    sources: Optional[List[int]] = None,
+    destinations: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """OSRM /table body: distances (m) and durations (s) between the selected points"""
+    sources = sources if sources is not None else list(range(len(coords)))
+    destinations = destinations if destinations is not None else list(range(len(coords)))
+    distances = [[road_distance_m(coords[i], coords[j]) for j in destinations] for i in sources]
+    return {
+        "code": "Ok",
+        "distances": distances,
+        "durations": [[road_duration_s(d) for d in row] for row in distances],
+        "sources": [{"location": [coords[i][1], coords[i][0]]} for i in sources],
+        "destinations": [{"location": [coords[j][1], coords[j][0]]} for j in destinations],
+    }
+
+
+def route(coords: List[Coord]) -> Dict[str, Any]:
+    """OSRM /route body with an L-shaped (north-south, then east-west) leg geometry"""
+    points = [[coords[0][1], coords[0][0]]]
+    legs = []
+    for a, b in zip(coords, coords[1:]):
+        points.append([a[1], b[0]])
+        points.append([b[1], b[0]])
+        distance = road_distance_m(a, b)
+        legs.append({"distance": distance, "duration": road_duration_s(distance), "steps": [], "summary": ""})
+    total = round(sum(leg["distance"] for leg in legs), 1)
+    return {
+        "code": "Ok",
+        "routes": [{
+            "geometry": {"type": "LineString", "coordinates": points},
+            "legs": legs,
+            "distance": total,
+            "duration": round(sum(leg["duration"] for leg in legs), 1),
+            "weight": total,
+            "weight_name": "distance",
+        }],
+        "waypoints": [{"location": [c[1], c[0]]} for c in coords],
+    }
@@ -0,0 +1,251 @@
+"""Fake Nominatim and OSRM HTTP servers for offline load testing and benchmarks.
+
+Both run on the standard library ``ThreadingHTTPServer``, either in-process
+(``start_offline_services``) or as a separate process
+(``python -m app.offline`` / ``launch_subprocess``). Point the app at them with
+
+    NOMINATIM_URL=http://127.0.0.1:<port>
+    OSRM_BASE_URL=http://127.0.0.1:<port>
+"""
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Dict, Any, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+from app.offline import geometry
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyModel:
+    """Per-request delay in milliseconds
+
+    Spec strings: ``constant:MS``, ``uniform:LOW:HIGH``, ``normal:MEAN:STD``,
+    ``lognormal:MEDIAN:SIGMA``; ``none`` means no delay.
+    """
+
+    KINDS = ("none", "constant", "uniform", "normal", "lognormal")
+
+    def __init__(self, kind: str = "none", params: Tuple[float, ...] = (), seed: int = 0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = tuple(params)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 0) -> "LatencyModel":
+        kind, *params = spec.split(":")
+        return cls(kind, tuple(float(p) for p in params), seed)
+
+    def sample_ms(self) -> float:
+        with self._lock:
+            if self.kind == "constant":
+                value = self.params[0]
+            elif self.kind == "uniform":
+                value = self._rng.uniform(self.params[0], self.params[1])
+            elif self.kind == "normal":
+                value = self._rng.gauss(self.params[0], self.params[1])
+            elif self.kind == "lognormal":
+                value = self._rng.lognormvariate(0.0, self.params[1]) * self.params[0]
+            else:
+                value = 0.0
+        return max(0.0, value)
+
+
+class FaultModel:
+    """Seeded latency and error injection shared by a server's handler threads"""
+
+    def __init__(self, latency: Optional[LatencyModel] = None, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self._rng = random.Random(seed + 1)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def next(self) -> Tuple[float, bool]:
+        """(delay seconds, inject error) for the next request"""
+        with self._lock:
+            fail = self._rng.random() < self.error_rate
+            self.requests += 1
+            self.errors += fail
+        return self.latency.sample_ms() / 1000.0, fail
+
+
+class _OfflineHandler(BaseHTTPRequestHandler):
+    server_version = "OfflineStandIn/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path in ("/", "/status"):
+            return self._send_json(200, {"status": "ok"})
+        delay, fail = self.server.faults.next()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self._send_json(503, {"code": "ServiceUnavailable", "message": "Injected error"})
+        try:
+            status, payload = self.handle_api(url.path, parse_qs(url.query))
+        except (ValueError, IndexError) as e:
+            status, payload = 400, {"code": "InvalidQuery", "message": str(e)}
+        self._send_json(status, payload)
+
+    def handle_api(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, Any]:
+        raise NotImplementedError
+
+
+class NominatimHandler(_OfflineHandler):
+    """GET /search?q=...&format=json&limit=N"""
+
+    def handle_api(self, path, query):
+        if path.rstrip("/") != "/search":
+            return 404, {"error": "Unknown endpoint"}
+        q = query.get("q", [""])[0]
+        place = geometry.geocode(q, self.server.not_found_rate)
+        return 200, [place] if place else []
+
+
+class OSRMHandler(_OfflineHandler):
+    """GET /table/v1/driving/{lng,lat;...} and /route/v1/driving/{lng,lat;...}"""
+
+    @staticmethod
+    def _coords(segment: str) -> List[Tuple[float, float]]:
+        coords = []
+        for pair in unquote(segment).split(";"):
+            lng, lat = pair.split(",")
+            coords.append((float(lat), float(lng)))
+        return coords
+
+    @staticmethod
+    def _indices(query, name) -> Optional[List[int]]:
+        value = query.get(name, [None])[0]
+        if value is None or value == "all":
+            return None
+        return [int(i) for i in value.split(";")]
+
+    def handle_api(self, path, query):
+        parts = path.strip("/").split("/")
+        if len(parts) != 4 or parts[1] != "v1":
+            return 400, {"code": "InvalidUrl", "message": "Expected /{service}/v1/{profile}/{coordinates}"}
+        service, coords = parts[0], self._coords(parts[3])
+        if service == "table":
+            return 200, geometry.table(coords, self._indices(query, "sources"), self._indices(query, "destinations"))
+        if service == "route":
+            if len(coords) < 2:
+                return 400, {"code": "InvalidQuery", "message": "At least 2 coordinates required"}
+            return 200, geometry.route(coords)
+        return 400, {"code": "InvalidService", "message": f"Unknown service {service}"}
+
+
+class OfflineServer:
+    """A stand-in HTTP server running on a daemon thread"""
+
+    def __init__(
+        self,
+        handler: type,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        faults: Optional[FaultModel] = None,
+        not_found_rate: float = 0.0,
+    ):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.faults = faults or FaultModel()
+        self.httpd.not_found_rate = not_found_rate
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def faults(self) -> FaultModel:
+        return self.httpd.faults
+
+    def start(self) -> "OfflineServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+def start_offline_services(
+    host: str = "127.0.0.1",
+    nominatim_port: int = 0,
+    osrm_port: int = 0,
+    latency: str = "none",
+    error_rate: float = 0.0,
+    not_found_rate: float = 0.0,
+    seed: int = 0,
+) -> Tuple[OfflineServer, OfflineServer]:
+    """Start fake Nominatim and OSRM in this process; port 0 picks a free port"""
+    nominatim = OfflineServer(
+        NominatimHandler, host, nominatim_port,
+        FaultModel(LatencyModel.parse(latency, seed), error_rate, seed), not_found_rate,
+    ).start()
+    osrm = OfflineServer(
+        OSRMHandler, host, osrm_port,
+        FaultModel(LatencyModel.parse(latency, seed + 7), error_rate, seed + 7),
+    ).start()
+    logger.info(f"Offline services: nominatim={nominatim.url} osrm={osrm.url}")
+    return nominatim, osrm
+
+
+def launch_subprocess(
+    nominatim_port: int,
+    osrm_port: int,
+    host: str = "127.0.0.1",
+    latency: str = "none",
+    error_rate: float = 0.0,
+    seed: int = 0,
+    ready_timeout: float = 10.0,
+) -> subprocess.Popen:
+    """Run ``python -m app.offline`` in a child process and wait until it answers"""
+    import requests
+
+    proc = subprocess.Popen([
+        sys.executable, "-m", "app.offline",
+        "--host", host,
+        "--nominatim-port", str(nominatim_port),
+        "--osrm-port", str(osrm_port),
+        "--latency", latency,
+        "--error-rate", str(error_rate),
+        "--seed", str(seed),
+    ])
+    deadline = time.time() + ready_timeout
+    for port in (nominatim_port, osrm_port):
+        while True:
+            try:
+                requests.get(f"http://{host}:{port}/status", timeout=0.5)
+                break
+            except requests.RequestException:
+                if proc.poll() is not None or time.time() > deadline:
+                    proc.kill()
+                    raise RuntimeError("Offline services failed to start")
+                time.sleep(0.05)
+    return proc
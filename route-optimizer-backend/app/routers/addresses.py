@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Query, HTTPException, Depends, status
+from sqlalchemy.orm import Session
+from app.database.connection import get_db
+from app.database.crud import CRUDUser, CRUDAddress
+from app.models.address import AddressBookUpsert
+from app.services.geocoder import geocoder
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api/addresses", tags=["Addresses"])
+
+def _authenticate(db: Session, api_key: str):
+    user = CRUDUser.get_by_api_key(db, api_key)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+    return user
+
+@router.put("")
+def upsert_addresses(
+    request: AddressBookUpsert,
+    api_key: str = Query(..., description="API key for authentication"),
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk insert or update address book entries, keyed by each address's `id`
+
+    Addresses without coordinates are geocoded once here; later optimizations
+    by id reuse the stored coordinates. Addresses that cannot be geocoded are
+    not stored and are listed in `geocode_failed_ids`.
+    """
+    # Plain def: geocoding blocks, so FastAPI runs this in the threadpool
+    user = _authenticate(db, api_key)
+
+    from app.models.stop_set import StopSet
+    stops = StopSet.from_addresses(request.addresses)
+    located, failed_idx = geocoder.geocode_stops(stops)
+
+    rows = [
+        {
+            "external_id": ext_id, "name": name, "street": street, "city": city,
+            "postal_code": postal_code, "phone": phone, "latitude": lat, "longitude": lng,
+        }
+        for ext_id, name, street, city, postal_code, phone, (lat, lng) in zip(
+            located.ids.tolist(), located.names, located.streets, located.cities,
+            located.postal_codes, located.phones, located.coords.tolist()
+        )
+    ]
+    inserted, updated = CRUDAddress.upsert_many(db, user.id, rows) if rows else (0, 0)
+    logger.info(f"Address book upsert for user {user.id}: {inserted} inserted, {updated} updated")
+
+    return {
+        "status": "success",
+        "inserted": inserted,
+        "updated": updated,
+        "geocode_failed_ids": stops.ids[failed_idx].tolist()
+    }
+
+@router.get("")
+def list_addresses(
+    api_key: str = Query(..., description="API key for authentication"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of addresses to return"),
+    offset: int = Query(0, ge=0, description="Number of addresses to skip"),
+    db: Session = Depends(get_db)
+):
+    """Get a page of the address book, ordered by id"""
+    user = _authenticate(db, api_key)
+    addresses = CRUDAddress.get_user_addresses(db, user.id, limit=limit, offset=offset)
+
+    return {
+        "status": "success",
+        "addresses": [
+            {
+                "id": a.external_id,
+                "name": a.name,
+                "street": a.street,
+                "city": a.city,
+                "postal_code": a.postal_code,
+                "phone": a.phone,
+                "latitude": a.latitude,
+                "longitude": a.longitude
+            }
+            for a in addresses
+        ]
+    }
+
+@router.delete("/{address_id}")
+def delete_address(
+    address_id: int,
+    api_key: str = Query(..., description="API key for authentication"),
+    db: Session = Depends(get_db)
+):
+    """Delete an address book entry"""
+    user = _authenticate(db, api_key)
+    if not CRUDAddress.delete(db, user.id, address_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Address not found"
+        )
+
+    return {
+        "status": "success",
+        "message": f"Address {address_id} deleted successfully"
+    }
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from datetime import datetime
+from app.utils.loop_monitor import loop_monitor
 
 router = APIRouter()
 
@@ -16,3 +17,12 @@ async def readiness_check():
         "status": "ready",
         "timestamp": datetime.utcnow().isoformat()
     }
+
+@router.get("/loop")
+async def loop_lag():
+    """Event-loop lag of this worker process"""
+    return {
+        "status": "ok",
+        "lag": loop_monitor.stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Query, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from app.database.connection import get_db
-from app.database.crud import CRUDUser, CRUDRoute, CRUDOptimization
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import get_async_db
+from app.database.async_crud import AsyncCRUDUser, AsyncCRUDRoute, AsyncCRUDOptimization, AsyncCRUDStats
+from app.utils.pagination import InvalidCursor
+from datetime import date, datetime, timedelta
 from typing import Optional
 import logging
 
@@ -12,23 +14,29 @@ router = APIRouter(prefix="/api/history", tags=["History"])
 async def get_user_routes(
     api_key: str = Query(..., description="API key for authentication"),
     limit: int = Query(100, ge=1, le=1000, description="Number of routes to return"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get user's optimization history
+    Get user's optimization history, newest first
     
+    Pages are `limit` routes long; pass `next_cursor` back as `cursor` for the
+    next page (it is null on the last page).
     Requires API key authentication via query parameter
     """
     # Authenticate user
-    user = CRUDUser.get_by_api_key(db, api_key)
+    user = await AsyncCRUDUser.get_by_api_key(db, api_key)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key"
         )
     
-    # Get user's routes
-    routes = CRUDRoute.get_user_routes(db, user.id, limit=limit)
+    # Get one page of the user's routes
+    try:
+        routes, next_cursor = await AsyncCRUDRoute.get_user_route_page(db, user.id, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     # Format response
     route_list = [
@@ -45,13 +53,14 @@ async def get_user_routes(
     return {
         "status": "success",
         "total_routes": len(route_list),
-        "routes": route_list
+        "routes": route_list,
+        "next_cursor": next_cursor
     }
 
 @router.get("/analytics")
 async def get_user_analytics(
     api_key: str = Query(..., description="API key for authentication"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get user's analytics dashboard data
@@ -60,15 +69,15 @@ async def get_user_analytics(
     Requires API key authentication via query parameter
     """
     # Authenticate user
-    user = CRUDUser.get_by_api_key(db, api_key)
+    user = await AsyncCRUDUser.get_by_api_key(db, api_key)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key"
         )
     
-    # Get user statistics
-    stats = CRUDRoute.get_user_stats(db, user.id)
+    # Get user statistics (from the per-month rollups, not the routes table)
+    stats = await AsyncCRUDStats.get_user_stats(db, user.id)
     
     return {
         "status": "success",
@@ -79,11 +88,52 @@ async def get_user_analytics(
         "analytics": stats
     }
 
+@router.get("/timeseries")
+async def get_user_timeseries(
+    api_key: str = Query(..., description="API key for authentication"),
+    period: str = Query("month", pattern="^(day|month)$", description="Bucket size"),
+    start: Optional[date] = Query(None, description="First day (default: 12 months or 30 days back)"),
+    end: Optional[date] = Query(None, description="Last day (default: today)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get per-day or per-month route and optimization totals
+
+    Periods without activity are omitted.
+    Requires API key authentication via query parameter
+    """
+    # Authenticate user
+    user = await AsyncCRUDUser.get_by_api_key(db, api_key)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+    
+    end = end or datetime.utcnow().date()
+    if start is None and period == "day":
+        start = end - timedelta(days=29)
+    elif start is None:
+        months = end.year * 12 + end.month - 1 - 11  # this month and the 11 before it
+        start = date(months // 12, months % 12 + 1, 1)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start is after end")
+    if period == "month":
+        start = start.replace(day=1)  # month buckets are keyed by their first day
+    
+    return {
+        "status": "success",
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": await AsyncCRUDStats.get_timeseries(db, user.id, period, start, end)
+    }
+
 @router.delete("/routes/{route_id}")
 async def delete_route(
     route_id: str,
     api_key: str = Query(..., description="API key for authentication"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete a route from history
@@ -91,7 +141,7 @@ async def delete_route(
     Requires API key authentication and route ownership
     """
     # Authenticate user
-    user = CRUDUser.get_by_api_key(db, api_key)
+    user = await AsyncCRUDUser.get_by_api_key(db, api_key)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -99,7 +149,7 @@ async def delete_route(
         )
     
     # Delete route (with ownership check)
-    success = CRUDRoute.delete(db, route_id, user.id)
+    success = await AsyncCRUDRoute.delete(db, route_id, user.id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -110,3 +160,35 @@ async def delete_route(
         "status": "success",
         "message": f"Route {route_id} deleted successfully"
     }
+
+@router.get("/telemetry/{request_id}")
+async def get_solver_telemetry(
+    request_id: str,
+    api_key: str = Query(..., description="API key for authentication"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get the solver's objective-over-time trace for an optimization
+    
+    Only recorded for requests made with `?telemetry=true`
+    """
+    # Authenticate user
+    user = await AsyncCRUDUser.get_by_api_key(db, api_key)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+    
+    trace = await AsyncCRUDOptimization.get_solver_trace(db, request_id, user.id)
+    if trace is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No telemetry recorded for this request"
+        )
+    
+    return {
+        "status": "success",
+        "request_id": request_id,
+        "telemetry": trace
+    }
@@ -1,23 +1,113 @@
-from fastapi import APIRouter, HTTPException
-from app.models.optimization_result import OptimizationRequest, OptimizationResponse
-from app.models.route import Route, RouteStop, OptimizationMetrics
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from app.models.optimization_result import (
+    AddressBookOptimizationRequest, ColumnarOptimizationRequest, OptimizationRequest, OptimizationResponse
+)
+from app.routers.upload import read_upload_stops
 from app.services.geocoder import geocoder
 from app.services.route_optimizer import route_optimizer
-from app.services.distance_calculator import DistanceCalculator
+from app.services.response_builder import build_columnar_payload, build_optimization_payload
+from app.services.solver_telemetry import SolveTelemetry
+from app.database.connection import SessionLocal, get_db, wait_for_schema
+from app.database.crud import CRUDUser, CRUDAddress, CRUDOptimization
+from app.utils.profiler import client_request_id, request_id as request_id_for
+from app.utils.tracing import stage
+from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Iterator, Optional
+import time
 import uuid
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+MSGPACK = "application/msgpack"
+# Minimum gap between geocode progress events on /upload?progress=true
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+def _telemetry_user_id(api_key: str) -> Optional[int]:
+    wait_for_schema()
+    db = SessionLocal()
+    try:
+        user = CRUDUser.get_by_api_key(db, api_key)
+        return user.id if user else None
+    finally:
+        db.close()
+
+async def _telemetry_owner(telemetry: bool, api_key: Optional[str]) -> Optional[int]:
+    """User the solver trace will be stored under, checked before solving (None without telemetry)"""
+    if not telemetry:
+        return None
+    if not api_key:
+        raise HTTPException(status_code=400, detail="telemetry requires api_key")
+    user_id = await run_in_threadpool(_telemetry_user_id, api_key)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return user_id
+
+def _save_telemetry(request_id: str, user_id: int, addresses_count: int,
+                    comp_time: int, telemetry: SolveTelemetry):
+    """Store the solver trace in optimization_history; never fails the request. Blocking"""
+    db = SessionLocal()
+    try:
+        CRUDOptimization.create(
+            db,
+            request_id=request_id,
+            user_id=user_id,
+            addresses_count=addresses_count,
+            computation_time_ms=comp_time,
+            quality_score=telemetry.improvement_percent(),
+            solver_trace=telemetry.to_dict()
+        )
+    except Exception as e:
+        logger.warning(f"[{request_id}] Telemetry not saved: {str(e)}")
+    finally:
+        db.close()
+
+async def _record_telemetry(request_id: str, user_id: Optional[int], addresses_count: int,
+                            comp_time: int, trace: Optional[SolveTelemetry]):
+    if trace is not None:
+        await run_in_threadpool(_save_telemetry, request_id, user_id, addresses_count, comp_time, trace)
+
+def _solve_stops(request_id: str, stops, telemetry: bool):
+    """Geocode and solve validated stops: (located stops, route, distance km, time ms, trace or None)"""
+    logger.info(f"[{request_id}] Geocoding...")
+    with stage("geocode"):
+        geocoded, failed_idx = geocoder.geocode_stops(stops)
+    
+    if len(geocoded) < 2:
+        raise HTTPException(status_code=400, detail="Failed geocoding")
+    
+    return (geocoded,) + _solve_located(request_id, geocoded, telemetry)
+
+def _solve_located(request_id: str, geocoded, telemetry: bool):
+    """Solve stops that all have coordinates: (route, distance km, time ms, trace or None)"""
+    logger.info(f"[{request_id}] Optimizing...")
+    trace = SolveTelemetry() if telemetry else None
+    opt_route, total_dist, comp_time = route_optimizer.optimize(geocoded, telemetry=trace, tag=request_id)
+    return opt_route, total_dist, comp_time, trace
+
 @router.post("", response_model=OptimizationResponse)
-async def optimize_route(request: OptimizationRequest):
+async def optimize_route(
+    request: OptimizationRequest,
+    http_request: Request,
+    telemetry: bool = Query(False, description="Record the solver trace (needs api_key)"),
+    api_key: Optional[str] = Query(None, description="API key the trace is stored under")
+):
     """Optimize delivery route - main endpoint"""
-    request_id = str(uuid.uuid4())
+    # Server-generated (it keys the telemetry row); also the profile id unless X-Request-Id names it
+    request_id = request_id_for(http_request)
+    client_id = client_request_id(http_request)
     
     try:
-        logger.info(f"[{request_id}] Request: {len(request.addresses)} addresses")
+        telemetry_user = await _telemetry_owner(telemetry, api_key)
+        
+        logger.info(f"[{request_id}] Request: {len(request.addresses)} addresses"
+                    + (f" (X-Request-Id {client_id})" if client_id else ""))
         
         # Validate
         if len(request.addresses) < 2:
@@ -25,82 +115,244 @@ async def optimize_route(request: OptimizationRequest):
         if len(request.addresses) > 1000:
             raise HTTPException(status_code=400, detail="Max 1000 addresses")
         
-        # Geocode
-        logger.info(f"[{request_id}] Geocoding...")
-        geocoded, failed_idx = geocoder.geocode_addresses(request.addresses)
-        
-        if len(geocoded) < 2:
-            raise HTTPException(status_code=400, detail="Failed geocoding")
-        
-        # Optimize
-        logger.info(f"[{request_id}] Optimizing...")
-        opt_route, total_dist, comp_time = route_optimizer.optimize(geocoded)
+        # Validated once above; from here on stops travel as arrays, not per-stop models.
+        # Imported here: StopSet pulls in NumPy, which worker startup avoids
+        from app.models.stop_set import StopSet
+        stops = StopSet.from_addresses(request.addresses)
+        geocoded, opt_route, total_dist, comp_time, trace = _solve_stops(request_id, stops, telemetry)
+        await _record_telemetry(request_id, telemetry_user, len(geocoded), comp_time, trace)
         
         # Build response
-        coords = [(a.latitude, a.longitude) for a in geocoded]
-        stops = []
-        cum_dist, cum_time = 0, 0
-        
-        for idx, addr_idx in enumerate(opt_route[:-1]):
-            next_idx = opt_route[idx + 1]
-            addr = geocoded[addr_idx]
-            
-            dist = DistanceCalculator.haversine_distance(
-                coords[addr_idx][0], coords[addr_idx][1],
-                coords[next_idx][0], coords[next_idx][1]
+        with stage("build_response"):
+            payload = build_optimization_payload(
+                request_id, geocoded, opt_route, total_dist, comp_time
             )
-            time_min = dist / 30 * 60
-            cum_dist += dist
-            cum_time += time_min
-            
-            stops.append(RouteStop(
-                sequence=idx,
-                address_id=addr.id,
-                address_name=addr.name,
-                street=addr.street,
-                city=addr.city,
-                latitude=addr.latitude,
-                longitude=addr.longitude,
-                distance_from_previous_km=dist,
-                time_from_previous_min=time_min,
-                cumulative_distance_km=cum_dist,
-                cumulative_time_min=cum_time
-            ))
         
-        # Worst case = 30% worse than optimal
-        worst_case = total_dist * 1.3
-        saved_km = worst_case - total_dist
-        saved_cost = saved_km * 12
+        logger.info(f"[{request_id}] Success! Saved ₹{payload['metrics']['cost_saved_inr']:.0f}")
+        # Serialize here rather than in FastAPI so the cost shows up as its own stage.
+        # The payload is built from validated stops, so it goes straight to orjson
+        # bytes without another pass through OptimizationResponse
+        with stage("serialize"):
+            return ORJSONResponse(content=payload)
         
-        metrics = OptimizationMetrics(
-            distance_saved_km=max(0, saved_km),
-            distance_saved_percent=max(0, (saved_km/worst_case*100)) if worst_case > 0 else 0,
-            cost_saved_inr=max(0, saved_cost),
-            cost_saved_percent=max(0, (saved_cost/(worst_case*12)*100)) if worst_case > 0 else 0,
-            time_saved_min=max(0, saved_km/30*60)
-        )
-        
-        route = Route(
-            route_id=request_id,
-            stops=stops,
-            total_distance_km=total_dist,
-            total_time_min=cum_time,
-            total_cost_inr=total_dist * 12,
-            computation_time_ms=comp_time
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] Error: {str(e)}")
+        return OptimizationResponse(
+            request_id=request_id,
+            status="error",
+            error_message=str(e),
+            timestamp=datetime.utcnow(),
+            computation_time_ms=0
         )
-        
-        resp = OptimizationResponse(
+
+@router.post("/by-id")
+def optimize_by_id(
+    request: AddressBookOptimizationRequest,
+    api_key: str = Query(..., description="API key whose address book the ids refer to"),
+    telemetry: bool = Query(False, description="Record the solver trace"),
+    db: Session = Depends(get_db)
+):
+    """Optimize stops from the address book (see /api/addresses) by id
+
+    Stored coordinates are used as they are: no geocoding and no per-address
+    validation. The response is the same as /api/optimize.
+    """
+    # Plain def: the lookups and the solve block, so FastAPI runs this in the threadpool
+    request_id = str(uuid.uuid4())
+    user = CRUDUser.get_by_api_key(db, api_key)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    ids = request.address_ids
+    with stage("load_addresses"):
+        found = CRUDAddress.get_by_external_ids(db, user.id, ids)
+    unknown = [i for i in ids if i not in found]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown address ids: {unknown[:20]}")
+    logger.info(f"[{request_id}] Request: {len(ids)} address book ids")
+    
+    from app.models.stop_set import StopSet
+    names, streets, cities, postal_codes, phones, lats, lngs = (list(c) for c in zip(*(found[i] for i in ids)))
+    stops = StopSet.from_columns(ids, names, streets, cities, postal_codes, phones, lats, lngs)
+    try:
+        opt_route, total_dist, comp_time, trace = _solve_located(request_id, stops, telemetry)
+        if trace is not None:
+            _save_telemetry(request_id, user.id, len(stops), comp_time, trace)
+        with stage("build_response"):
+            payload = build_optimization_payload(request_id, stops, opt_route, total_dist, comp_time)
+    except Exception as e:
+        logger.error(f"[{request_id}] Error: {str(e)}")
+        return OptimizationResponse(
             request_id=request_id,
-            status="success",
-            route=route,
-            metrics=metrics,
+            status="error",
+            error_message=str(e),
             timestamp=datetime.utcnow(),
-            computation_time_ms=comp_time
+            computation_time_ms=0
         )
-        
-        logger.info(f"[{request_id}] Success! Saved ₹{saved_cost:.0f}")
-        return resp
-        
+    with stage("serialize"):
+        return ORJSONResponse(content=payload)
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+def _parse_columnar(body: bytes, content_type: str) -> ColumnarOptimizationRequest:
+    """Validate a JSON or MessagePack columnar body straight from bytes"""
+    try:
+        if content_type.startswith(MSGPACK):
+            msgpack = _msgpack()
+            if msgpack is None:
+                raise HTTPException(status_code=415, detail="MessagePack support is not installed")
+            return ColumnarOptimizationRequest.model_validate(msgpack.unpackb(body))
+        # pydantic-core parses and validates in one pass, no intermediate dicts
+        return ColumnarOptimizationRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False, include_input=False))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed body: {str(e)}")
+
+@router.post("/columnar")
+async def optimize_columnar(
+    request: Request,
+    telemetry: bool = Query(False, description="Record the solver trace (needs api_key)"),
+    api_key: Optional[str] = Query(None, description="API key the trace is stored under")
+):
+    """Optimize from parallel arrays and answer with parallel arrays
+
+    Body: ColumnarOptimizationRequest as JSON or, with
+    `Content-Type: application/msgpack`, MessagePack. Send
+    `Accept: application/msgpack` for a MessagePack response.
+    """
+    request_id = str(uuid.uuid4())
+    telemetry_user = await _telemetry_owner(telemetry, api_key)
+    want_msgpack = MSGPACK in request.headers.get("accept", "")
+    if want_msgpack and _msgpack() is None:
+        raise HTTPException(status_code=406, detail="MessagePack support is not installed")
+    
+    with stage("parse"):
+        columns = _parse_columnar(await request.body(), request.headers.get("content-type", ""))
+    logger.info(f"[{request_id}] Columnar request: {len(columns.ids)} addresses")
+    
+    from app.models.stop_set import StopSet
+    stops = StopSet.from_columns(
+        columns.ids, columns.names, columns.streets, columns.cities,
+        columns.postal_codes, columns.phones, columns.latitudes, columns.longitudes
+    )
+    try:
+        geocoded, opt_route, total_dist, comp_time, trace = _solve_stops(request_id, stops, telemetry)
+        await _record_telemetry(request_id, telemetry_user, len(geocoded), comp_time, trace)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] Error: {str(e)}")
+        return ORJSONResponse(content={
+            "request_id": request_id, "status": "error", "error_message": str(e), "computation_time_ms": 0
+        })
+    
+    with stage("build_response"):
+        payload = build_columnar_payload(request_id, geocoded, opt_route, total_dist, comp_time)
+    with stage("serialize"):
+        if want_msgpack:
+            return Response(content=_msgpack().packb(payload), media_type=MSGPACK)
+        return ORJSONResponse(content=payload)
+
+def _upload_events(request_id: str, source, filename: Optional[str],
+                   telemetry_user: Optional[int]) -> Iterator[dict]:
+    """Parse, geocode and solve an uploaded file, yielding a progress event per stage
+
+    The last event is ``{"stage": "result", "result": ...}`` with the
+    /api/optimize response plus an ``upload`` summary. Blocking: iterate it
+    from a worker thread. With telemetry_user, the solver trace is stored
+    under that user.
+    """
+    with stage("parse"):
+        stops, errors, total, fmt = read_upload_stops(source, filename)
+    logger.info(f"[{request_id}] Upload: {total} rows, {len(stops)} valid ({fmt})")
+    if len(stops) < 2:
+        raise HTTPException(status_code=400, detail="Min 2 addresses")
+    if len(stops) > 1000:
+        raise HTTPException(status_code=400, detail="Max 1000 addresses")
+    yield {"stage": "parse", "format": fmt, "total_rows": total, "parsed_successfully": len(stops),
+           "failed": total - len(stops), "errors": errors}
+    
+    # Rows that came with coordinates are never looked up
+    last, looked_up = time.monotonic(), 0
+    with stage("geocode"):
+        for done, pending in geocoder.iter_geocode_stops(stops):
+            looked_up = pending
+            if done < pending and time.monotonic() - last >= PROGRESS_INTERVAL_SECONDS:
+                last = time.monotonic()
+                yield {"stage": "geocode", "done": done, "total": pending}
+        geocoded, failed_idx = geocoder.split_located(stops)
+    yield {"stage": "geocode", "done": looked_up, "total": looked_up, "failed": len(failed_idx)}
+    if len(geocoded) < 2:
+        raise HTTPException(status_code=400, detail="Failed geocoding")
+    
+    yield {"stage": "solve", "stops": len(geocoded)}
+    opt_route, total_dist, comp_time, trace = _solve_located(request_id, geocoded, telemetry_user is not None)
+    if trace is not None:
+        _save_telemetry(request_id, telemetry_user, len(geocoded), comp_time, trace)
+    
+    with stage("build_response"):
+        payload = build_optimization_payload(request_id, geocoded, opt_route, total_dist, comp_time)
+    payload["upload"] = {
+        "filename": filename,
+        "format": fmt,
+        "total_rows": total,
+        "parsed_successfully": len(stops),
+        "failed": total - len(stops),
+        "errors": errors,
+        "geocode_failed_ids": stops.ids[failed_idx].tolist(),
+    }
+    yield {"stage": "result", "result": payload}
+
+def _final_result(events: Iterator[dict]) -> dict:
+    event = None
+    for event in events:
+        pass
+    return event["result"]
+
+def _ndjson_events(first: dict, events: Iterator[dict]) -> Iterator[bytes]:
+    yield orjson.dumps(first) + b"\n"
+    try:
+        for event in events:
+            yield orjson.dumps(event) + b"\n"
+    except HTTPException as e:
+        # Too late for a status code: the stream has started
+        yield orjson.dumps({"stage": "error", "status_code": e.status_code, "detail": e.detail}) + b"\n"
+    except Exception as e:
+        logger.error(f"Upload pipeline error: {str(e)}")
+        yield orjson.dumps({"stage": "error", "status_code": 500, "detail": str(e)}) + b"\n"
+
+@router.post("/upload")
+async def optimize_upload(
+    file: UploadFile = File(...),
+    progress: bool = Query(False, description="Stream NDJSON stage events, ending with the result"),
+    telemetry: bool = Query(False, description="Record the solver trace (needs api_key)"),
+    api_key: Optional[str] = Query(None, description="API key the trace is stored under")
+):
+    """Optimize straight from a CSV, Parquet or Arrow address file
+
+    One request instead of /api/upload/csv followed by /api/optimize: the file
+    is parsed into stops server-side, stops without coordinates are geocoded,
+    and the route comes back in the /api/optimize response shape.
+    """
+    request_id = str(uuid.uuid4())
+    telemetry_user = await _telemetry_owner(telemetry, api_key)
+    events = _upload_events(request_id, file.file, file.filename, telemetry_user)
+    try:
+        if progress:
+            # Parse errors become a 4xx or an error body, not a broken stream
+            first = await run_in_threadpool(next, events, None)
+            if first is None:
+                raise RuntimeError("Upload produced no events")
+            return StreamingResponse(_ndjson_events(first, events), media_type="application/x-ndjson")
+        return ORJSONResponse(content=await run_in_threadpool(_final_result, events))
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from app.utils.profiler import profile_store, is_admin
+
+router = APIRouter(prefix="/api/profiles", tags=["Profiling"])
+
+@router.get("/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|collapsed)$", description="json or collapsed (flamegraph input)"),
+    x_admin_key: Optional[str] = Header(None)
+):
+    """
+    Get a stored request profile
+    
+    Requires the admin key in the X-Admin-Key header
+    """
+    if not is_admin(x_admin_key):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin key"
+        )
+    
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    if format == "collapsed":
+        return PlainTextResponse(profile["collapsed"])
+    return profile
@@ -1,24 +1,428 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-import pandas as pd
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from io import StringIO
+from typing import IO, TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
 import logging
-from geopy.geocoders import Nominatim
+import os
+import shutil
+import tempfile
+import orjson
+from app.config import settings
+from app.services.geocoder import geocoder
+
+if TYPE_CHECKING:
+    import numpy as np
+    from app.models.stop_set import StopSet
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Simple geocoder for text uploads
-geocoder = Nominatim(user_agent="route_optimizer")
+REQUIRED_COLUMNS = ['id', 'name', 'street', 'city']
+# Read from Parquet/Arrow uploads; any other column in the file is skipped
+ARROW_COLUMNS = REQUIRED_COLUMNS + ['postal_code', 'latitude', 'longitude']
+TEXT_COLUMNS = ('name', 'street', 'city', 'postal_code')
+# Same rules as AddressInput: these are trimmed, and no text may exceed its limit
+STRIPPED_COLUMNS = ('street', 'city')
+MAX_LENGTHS = {'name': 255, 'street': 255, 'city': 100, 'postal_code': 20}
+COLUMNAR_EXTENSIONS = ('.parquet', '.arrow', '.feather', '.ipc')
+# Used when a row has no coordinates (column absent or cell empty)
+DEFAULT_LAT, DEFAULT_LNG = 20.5937, 78.9629
+
+def _validate_columns(columns: Dict[str, "np.ndarray"], n: int, blank: Optional[Dict[str, "np.ndarray"]] = None,
+                      too_long: Optional[Dict[str, "np.ndarray"]] = None):
+    """Check address columns as whole arrays: (good mask, ids, lats, lngs, reasons)
+
+    `columns` maps column name to a NumPy array (object or numeric); street and
+    city are replaced by their trimmed values. `blank` may hold precomputed
+    null-or-whitespace masks for name/street/city, in which case street and
+    city must already be trimmed; `too_long` likewise may hold precomputed
+    MAX_LENGTHS masks. Empty or absent coordinates come back as NaN; rows that
+    are not good have a reason.
+    Works on plain NumPy arrays: pandas Series temporaries form reference
+    cycles that would pile up between garbage collections on large files.
+    """
+    import numpy as np
+    import pandas as pd
+    bad = np.zeros(n, dtype=bool)
+    reasons = np.empty(n, dtype=object)
+    
+    def flag(mask, reason):
+        mask = mask & ~bad
+        reasons[mask] = reason
+        bad[mask] = True
+    
+    def numeric(col):
+        return pd.to_numeric(columns[col], errors='coerce').astype(np.float64)
+    
+    ids = numeric('id')
+    flag(np.isnan(ids) | (ids % 1 != 0), "invalid id")
+    if blank is None:
+        for col in STRIPPED_COLUMNS:
+            columns[col] = np.array([v.strip() if isinstance(v, str) else v for v in columns[col].tolist()], dtype=object)
+    for col in ('name', 'street', 'city'):
+        if blank is not None:
+            flag(blank[col], f"empty {col}")
+        else:
+            flag(pd.isna(columns[col]) | (np.char.strip(columns[col].astype(str)) == ''), f"empty {col}")
+    for col, limit in MAX_LENGTHS.items():
+        if too_long is not None and col in too_long:
+            flag(too_long[col], f"{col} longer than {limit} characters")
+        elif col in columns:
+            lengths = np.fromiter((len(v) if isinstance(v, str) else 0 for v in columns[col].tolist()),
+                                  dtype=np.int64, count=n)
+            flag(lengths > limit, f"{col} longer than {limit} characters")
+    coords = []
+    for col, limit in (('latitude', 90), ('longitude', 180)):
+        if col in columns:
+            values = numeric(col)
+            flag(np.isnan(values) & ~pd.isna(columns[col]), f"invalid {col}")
+            flag(np.abs(values) > limit, f"{col} out of range")
+            coords.append(values)
+        else:
+            coords.append(np.full(n, np.nan))
+    return ~bad, ids, coords[0], coords[1], reasons
+
+def _row_errors(good, reasons, first_row: int) -> List[str]:
+    import numpy as np
+    bad = ~good
+    rows = (np.flatnonzero(bad) + first_row).tolist()
+    return [f"Row {row}: {reason}" for row, reason in zip(rows, reasons[bad].tolist())]
+
+def _convert_chunk(df, first_row: int) -> Tuple[List[dict], List[str]]:
+    """Validate and convert one DataFrame chunk column-wise (no per-row pandas access)
+
+    `first_row` is the chunk's first line number in the file, for error messages.
+    """
+    import numpy as np
+    import pandas as pd
+    n = len(df)
+    columns = {col: df[col].to_numpy(dtype=object) for col in df.columns}
+    good, ids, lats, lngs, reasons = _validate_columns(columns, n)
+    # Empty cells fall back like absent columns
+    lats = np.where(np.isnan(lats), DEFAULT_LAT, lats)
+    lngs = np.where(np.isnan(lngs), DEFAULT_LNG, lngs)
+    postal = columns.get('postal_code', np.full(n, None, dtype=object))
+    
+    addresses = [
+        {'id': i, 'name': nm, 'street': st, 'city': c, 'postal_code': p, 'lat': lat, 'lng': lng}
+        for i, nm, st, c, p, lat, lng in zip(
+            ids[good].astype(np.int64).tolist(),
+            columns['name'][good].tolist(),
+            columns['street'][good].tolist(),
+            columns['city'][good].tolist(),
+            [None if pd.isna(p) else p for p in postal[good].tolist()],
+            lats[good].tolist(),
+            lngs[good].tolist(),
+        )
+    ]
+    return addresses, _row_errors(good, reasons, first_row)
+
+def _iter_csv_frames(source: Union[IO, str], chunk_rows: Optional[int] = None):
+    """Read a CSV file object as string DataFrames: yields (chunk, line number of its first row)"""
+    import pandas as pd  # deferred: pandas alone costs ~0.4s of worker startup
+    try:
+        reader = pd.read_csv(source, dtype=str, chunksize=chunk_rows or settings.UPLOAD_CSV_CHUNK_ROWS,
+                             skipinitialspace=True, encoding='utf-8')
+        first = next(reader, None)
+    except pd.errors.EmptyDataError:
+        raise HTTPException(status_code=400, detail="Empty CSV")
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {str(e)}")
+    if first is None:
+        return
+    missing = [c for c in REQUIRED_COLUMNS if c not in first.columns]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing columns: {missing}"
+        )
+    
+    next_row = 2  # line 1 is the header
+    chunk = first
+    while chunk is not None:
+        yield chunk, next_row
+        next_row += len(chunk)
+        chunk = next(reader, None)
+
+def iter_csv_chunks(source: Union[IO, str], chunk_rows: Optional[int] = None) -> Iterator[Tuple[List[dict], List[str], int]]:
+    """Parse a CSV file object chunk by chunk: yields (addresses, errors, row_count)
+
+    Only one chunk of rows is in memory at a time, so large exports do not
+    grow worker RSS with the file size. Cells are read as strings and
+    converted per column.
+    """
+    for chunk, first_row in _iter_csv_frames(source, chunk_rows):
+        addresses, errors = _convert_chunk(chunk, first_row)
+        yield addresses, errors, len(chunk)
+
+def _stop_part(columns, good, ids, lats, lngs) -> tuple:
+    """The good rows of one validated chunk, ready for _stops_from_parts"""
+    import numpy as np
+    if 'postal_code' in columns:
+        postal = [None if p is None or p != p else p for p in columns['postal_code'][good].tolist()]  # NaN/None -> None
+    else:
+        postal = [None] * int(good.sum())
+    return (
+        ids[good].astype(np.int64), lats[good], lngs[good],
+        columns['name'][good].tolist(), columns['street'][good].tolist(), columns['city'][good].tolist(),
+        postal,
+    )
+
+def _stops_from_parts(parts: List[tuple]) -> "StopSet":
+    """Concatenate chunk parts into one StopSet; missing (or 0) coordinates stay NaN for the geocoder"""
+    import numpy as np
+    from app.models.stop_set import StopSet
+    if not parts:
+        return StopSet.from_columns([], [], [], [])
+    ids, lats, lngs, names, streets, cities, postals = zip(*parts)
+    coords = np.column_stack([np.concatenate(lats), np.concatenate(lngs)])
+    coords[(coords == 0).any(axis=1)] = np.nan  # same rule as StopSet.from_columns
+    return StopSet(
+        ids=np.concatenate(ids),
+        coords=coords,
+        names=[v for part in names for v in part],
+        streets=[v for part in streets for v in part],
+        cities=[v for part in cities for v in part],
+        postal_codes=[v for part in postals for v in part],
+        phones=[None] * len(coords),
+    )
+
+def read_csv_stops(source: Union[IO, str], chunk_rows: Optional[int] = None) -> Tuple["StopSet", List[str], int]:
+    """Read a CSV address file straight into a StopSet: (stops, first 10 errors, row count)
+
+    Same chunking and row rules as iter_csv_chunks, but rows without
+    coordinates stay NaN (to be geocoded) instead of taking the default.
+    """
+    parts, errors, total = [], [], 0
+    for chunk, first_row in _iter_csv_frames(source, chunk_rows):
+        columns = {col: chunk[col].to_numpy(dtype=object) for col in chunk.columns}
+        good, ids, lats, lngs, reasons = _validate_columns(columns, len(chunk))
+        if len(errors) < 10:
+            errors.extend(_row_errors(good, reasons, first_row)[:10 - len(errors)])
+        parts.append(_stop_part(columns, good, ids, lats, lngs))
+        total += len(chunk)
+    return _stops_from_parts(parts), errors, total
+
+def parse_csv_file(source: Union[IO, str], filename: str = None) -> dict:
+    """Parse CSV upload content into the /api/upload/csv response body"""
+    addresses, errors, total = [], [], 0
+    for chunk_addresses, chunk_errors, rows in iter_csv_chunks(source):
+        addresses.extend(chunk_addresses)
+        errors.extend(chunk_errors[:10 - len(errors)] if len(errors) < 10 else [])
+        total += rows
+    
+    return {
+        "filename": filename,
+        "total_rows": total,
+        "parsed_successfully": len(addresses),
+        "failed": total - len(addresses),
+        "addresses": addresses,
+        "errors": errors  # First 10 errors
+    }
+
+def parse_csv_text(text: str, filename: str = None) -> dict:
+    return parse_csv_file(StringIO(text), filename)
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+def _open_arrow(path: str, chunk_rows: int):
+    """Memory-map a Parquet or Arrow IPC file: (format, column names, batches(columns))
+
+    `batches(columns)` yields record batches of at most `chunk_rows` rows.
+    Only the requested columns are read; the rest of the file is never paged in.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    source = pa.memory_map(path)
+    magic = source.read(6)
+    source.seek(0)
+    if magic[:4] == b"PAR1":
+        parquet = pq.ParquetFile(source)
+        names = parquet.schema_arrow.names
+        return "parquet", names, lambda columns: parquet.iter_batches(batch_size=chunk_rows, columns=columns)
+    if magic == b"ARROW1":
+        reader = pa.ipc.open_file(source)
+        batches = lambda: (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        reader = pa.ipc.open_stream(source)
+        batches = lambda: iter(reader)
+    
+    def sliced(columns):
+        # IPC batches can hold the whole file; slicing is zero-copy
+        for batch in batches():
+            for offset in range(0, batch.num_rows, chunk_rows):
+                part = batch.slice(offset, chunk_rows)
+                yield pa.RecordBatch.from_arrays([part.column(part.schema.get_field_index(c)) for c in columns], names=columns)
+    return "arrow", reader.schema.names, sliced
+
+def read_columnar_stops(path: str, chunk_rows: Optional[int] = None) -> Tuple["StopSet", List[str], int, str]:
+    """Read a Parquet or Arrow IPC address file into a StopSet: (stops, first 10 errors, row count, format)
+
+    Only ARROW_COLUMNS are read, a batch at a time, and validated with the same
+    rules as CSV rows. Empty or absent coordinates stay NaN, so the optimizer
+    geocodes those stops.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    try:
+        fmt, names, batches = _open_arrow(path, chunk_rows or settings.UPLOAD_CSV_CHUNK_ROWS)
+        missing = [c for c in REQUIRED_COLUMNS if c not in names]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing columns: {missing}")
+        wanted = [c for c in ARROW_COLUMNS if c in names]
+        
+        parts, errors, total = [], [], 0
+        for batch in batches(wanted):
+            columns, blank, too_long = {}, {}, {}
+            for col in wanted:
+                array = batch.column(batch.schema.get_field_index(col))
+                if col in TEXT_COLUMNS and not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+                    array = array.cast(pa.string())  # e.g. integer postal codes, dictionary-encoded names
+                if col in REQUIRED_COLUMNS[1:]:
+                    # Arrow kernels, much faster than np.char.strip on object arrays
+                    trimmed = pc.utf8_trim_whitespace(array)
+                    blank[col] = pc.equal(trimmed, "").fill_null(True).to_numpy(zero_copy_only=False)
+                    if col in STRIPPED_COLUMNS:
+                        array = trimmed
+                if col in MAX_LENGTHS:
+                    too_long[col] = pc.greater(pc.utf8_length(array), MAX_LENGTHS[col]).fill_null(False).to_numpy(zero_copy_only=False)
+                columns[col] = array.to_numpy(zero_copy_only=False)
+            n = batch.num_rows
+            good, ids, lats, lngs, reasons = _validate_columns(columns, n, blank, too_long)
+            if len(errors) < 10:
+                errors.extend(_row_errors(good, reasons, total + 1)[:10 - len(errors)])
+            parts.append(_stop_part(columns, good, ids, lats, lngs))
+            total += n
+    except pa.ArrowInvalid as e:
+        raise HTTPException(status_code=400, detail=f"Malformed Parquet/Arrow file: {str(e)}")
+    
+    return _stops_from_parts(parts), errors, total, fmt
+
+def _read_columnar_upload(source: IO) -> Tuple["StopSet", List[str], int, str]:
+    """read_columnar_stops for an upload, copied to a named temp file first so it can be memory-mapped"""
+    with tempfile.NamedTemporaryFile() as tmp:
+        shutil.copyfileobj(source, tmp)
+        tmp.flush()
+        return read_columnar_stops(tmp.name)
+
+def parse_columnar_file(source: IO, filename: str = None) -> dict:
+    """Parse a Parquet/Arrow upload into the /api/upload/columnar response body"""
+    stops, errors, total, fmt = _read_columnar_upload(source)
+    return {
+        "filename": filename,
+        "format": fmt,
+        "total_rows": total,
+        "parsed_successfully": len(stops),
+        "failed": total - len(stops),
+        "columns": stops.to_columns(),
+        "errors": errors
+    }
+
+def read_upload_stops(source: IO, filename: str = None) -> Tuple["StopSet", List[str], int, str]:
+    """Read a CSV, Parquet or Arrow upload (by extension) into a StopSet: (stops, errors, row count, format)"""
+    if os.path.splitext((filename or '').lower())[1] in COLUMNAR_EXTENSIONS:
+        if _pyarrow() is None:
+            raise HTTPException(status_code=415, detail="Parquet/Arrow support is not installed (pip install pyarrow)")
+        return _read_columnar_upload(source)
+    stops, errors, total = read_csv_stops(source)
+    return stops, errors, total, "csv"
+
+def iter_text_addresses(lines: List[str]) -> Iterator[Tuple[dict, Optional[str]]]:
+    """Geocode free-text lines through the shared geocoder: yields (address, error or None) per line
+
+    Same cache, rate limit and batch dedupe as the optimize path. Blocking:
+    run it in a worker thread. Unresolved lines keep the India-centre fallback.
+    """
+    for idx, (address_line, found) in enumerate(zip(lines, geocoder.geocode_queries(lines)), 1):
+        lat, lng = found or (DEFAULT_LAT, DEFAULT_LNG)
+        addr = {
+            'id': idx,
+            'name': f'Stop {idx}',
+            'street': address_line,
+            'city': 'India',
+            'postal_code': '',
+            'lat': lat,
+            'lng': lng,
+        }
+        yield addr, (None if found else f"Line {idx}: could not geocode")
+
+def geocode_text_lines(lines: List[str], filename: str = None) -> dict:
+    addresses, errors = [], []
+    for addr, error in iter_text_addresses(lines):
+        addresses.append(addr)
+        if error:
+            errors.append(error)
+    return {
+        "filename": filename,
+        "total_rows": len(lines),
+        "parsed_successfully": len(addresses) - len(errors),
+        "failed": len(errors),
+        "addresses": addresses,
+        "errors": errors[:10]
+    }
+
+def stream_text_ndjson(lines: List[str], filename: str = None) -> Iterator[bytes]:
+    """NDJSON body: one line per address as soon as it is geocoded, then a summary line"""
+    failed = 0
+    for addr, error in iter_text_addresses(lines):
+        if error:
+            failed += 1
+            yield orjson.dumps({"address": addr, "error": error}) + b"\n"
+        else:
+            yield orjson.dumps({"address": addr}) + b"\n"
+    yield orjson.dumps({"summary": {
+        "filename": filename, "total_rows": len(lines), "parsed_successfully": len(lines) - failed, "failed": failed
+    }}) + b"\n"
+
+def _prepend(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield from rest
+
+def stream_csv_ndjson(source: IO, filename: str = None) -> Iterator[bytes]:
+    """NDJSON body: one line per address or error as each chunk completes, then a summary line"""
+    total = parsed = 0
+    for addresses, errors, rows in iter_csv_chunks(source):
+        lines = [orjson.dumps({"address": a}) for a in addresses]
+        lines += [orjson.dumps({"error": e}) for e in errors]
+        total += rows
+        parsed += len(addresses)
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    yield orjson.dumps({"summary": {
+        "filename": filename, "total_rows": total, "parsed_successfully": parsed, "failed": total - parsed
+    }}) + b"\n"
 
 @router.post("/csv")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    file: UploadFile = File(...),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson streams rows as they are parsed or geocoded")
+):
     """Upload CSV or TXT with addresses"""
     try:
+        filename = (file.filename or '').lower()
+        content_type = (file.content_type or '').lower()
+        is_csv = filename.endswith('.csv') or content_type in ('text/csv', 'application/csv')
+        is_txt = not is_csv and (
+            filename.endswith('.txt') or filename.endswith('.text') or content_type.startswith('text/')
+        )
+        
+        if is_csv:
+            # The multipart parser has already spooled the upload to a temp file;
+            # parse it from there in chunks, off the event loop
+            if format == "ndjson":
+                chunks = stream_csv_ndjson(file.file, file.filename)
+                first = await run_in_threadpool(next, chunks)  # header errors become a 400, not a broken stream
+                return StreamingResponse(_prepend(first, chunks), media_type="application/x-ndjson")
+            return await run_in_threadpool(parse_csv_file, file.file, file.filename)
+        
         content = await file.read()
         text = content.decode('utf-8')
-        filename = (file.filename or '').lower()
-        is_txt = filename.endswith('.txt') or filename.endswith('.text') or (file.content_type or '').startswith('text/')
-        is_csv = filename.endswith('.csv')
         
         if is_txt:
             addresses = []
@@ -47,96 +451,32 @@ async def upload_csv(file: UploadFile = File(...)):
                 "errors": []
             }
         
-        if not is_csv:
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            if lines:
-                addresses = []
-                errors = []
-                for idx, address_line in enumerate(lines, 1):
-                    try:
-                        location = geocoder.geocode(address_line, timeout=5)
-                        if location:
-                            addr = {
-                                'id': idx,
-                                'name': f'Stop {idx}',
-                                'street': address_line,
-                                'city': 'India',
-                                'postal_code': '',
-                                'lat': location.latitude,
-                                'lng': location.longitude,
-                            }
-                        else:
-                            addr = {
-                                'id': idx,
-                                'name': f'Stop {idx}',
-                                'street': address_line,
-                                'city': 'India',
-                                'postal_code': '',
-                                'lat': 20.5937,
-                                'lng': 78.9629,
-                            }
-                        addresses.append(addr)
-                    except Exception as e:
-                        errors.append(f"Line {idx}: {str(e)}")
-                        addr = {
-                            'id': idx,
-                            'name': f'Stop {idx}',
-                            'street': address_line,
-                            'city': 'India',
-                            'postal_code': '',
-                            'lat': 20.5937,
-                            'lng': 78.9629,
-                        }
-                        addresses.append(addr)
-                return {
-                    "filename": file.filename,
-                    "total_rows": len(lines),
-                    "parsed_successfully": len(addresses),
-                    "failed": len(errors),
-                    "addresses": addresses,
-                    "errors": errors[:10]
-                }
-            raise HTTPException(status_code=400, detail="Unsupported file type or empty content")
-        
-        df = pd.read_csv(StringIO(text))
-        
-        required = ['id', 'name', 'street', 'city']
-        missing = [c for c in required if c not in df.columns]
-        if missing:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing columns: {missing}"
-            )
-        
-        addresses = []
-        errors = []
-        
-        for idx, row in df.iterrows():
-            try:
-                addr = {
-                    'id': int(row['id']),
-                    'name': str(row['name']),
-                    'street': str(row['street']),
-                    'city': str(row['city']),
-                    'postal_code': row.get('postal_code', None),
-                    'lat': float(row['latitude']) if 'latitude' in row else 20.5937,
-                    'lng': float(row['longitude']) if 'longitude' in row else 78.9629,
-                }
-                addresses.append(addr)
-            except Exception as e:
-                errors.append(f"Row {idx + 2}: {str(e)}")
-        
-        return {
-            "filename": file.filename,
-            "total_rows": len(df),
-            "parsed_successfully": len(addresses),
-            "failed": len(errors),
-            "addresses": addresses,
-            "errors": errors[:10]  # First 10 errors
-        }
+        # Anything else: one free-text address per line, geocoded off the event loop
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        if lines:
+            if format == "ndjson":
+                return StreamingResponse(stream_text_ndjson(lines, file.filename), media_type="application/x-ndjson")
+            return await run_in_threadpool(geocode_text_lines, lines, file.filename)
+        raise HTTPException(status_code=400, detail="Unsupported file type or empty content")
     
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/columnar")
+async def upload_columnar(file: UploadFile = File(...)):
+    """Upload a Parquet or Arrow IPC (Feather v2) address file
+
+    Answers with the stops as parallel arrays, ready for /api/optimize/columnar.
+    """
+    if _pyarrow() is None:
+        raise HTTPException(status_code=415, detail="Parquet/Arrow support is not installed (pip install pyarrow)")
+    try:
+        return ORJSONResponse(content=await run_in_threadpool(parse_columnar_file, file.file, file.filename))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
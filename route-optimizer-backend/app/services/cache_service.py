@@ -1,7 +1,9 @@
 import json
+import threading
 import redis
 from app.config import settings
-from typing import Optional, List
+from app.utils.metrics import record_cache
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,17 +14,30 @@ class CacheService:
     GEOCODE_PREFIX = "geocode:"
     ROUTE_PREFIX = "route:"
     
-    def __init__(self):
-        """Initialize Redis connection"""
+    def __init__(self, background: bool = False):
+        """Initialize Redis connection
+        
+        Args:
+            background: Connect in a daemon thread instead of blocking on the
+                ping; the cache acts as unavailable until it succeeds
+        """
         self.redis_available = False
+        self.redis_client = None
+        if background:
+            threading.Thread(target=self._connect, name="redis-connect", daemon=True).start()
+        else:
+            self._connect()
+    
+    def _connect(self):
         try:
-            self.redis_client = redis.from_url(
+            client = redis.from_url(
                 settings.REDIS_URL,
                 decode_responses=True,
                 socket_connect_timeout=5
             )
             # Test connection
-            self.redis_client.ping()
+            client.ping()
+            self.redis_client = client
             self.redis_available = True
             logger.info("Redis cache initialized successfully")
         except Exception as e:
@@ -46,6 +61,7 @@ class CacheService:
         try:
             key = f"{self.GEOCODE_PREFIX}{address}"
             cached = self.redis_client.get(key)
+            record_cache("redis_geocode", bool(cached))
             if cached:
                 return json.loads(cached)
         except Exception as e:
@@ -90,6 +106,7 @@ class CacheService:
         try:
             key = f"{self.ROUTE_PREFIX}{route_key}"
             cached = self.redis_client.get(key)
+            record_cache("redis_route", bool(cached))
             if cached:
                 return json.loads(cached)
         except Exception as e:
@@ -140,4 +157,5 @@ class CacheService:
         return self.redis_available
 
 # Global cache service instance
-cache_service = CacheService()
+# Connects in the background so worker startup never waits on Redis
+cache_service = CacheService(background=True)
@@ -0,0 +1,223 @@
+"""Sparse k-nearest-neighbour cost model for very large instances.
+
+Good tours almost never use long arcs, so instead of an N x N matrix we keep,
+per stop, only its k nearest neighbours (found with a k-d partition) in
+CSR form: ``indptr`` (n + 1), ``indices`` and ``weights`` (n * k). Memory is
+O(n * k): 20k stops with k = 12 is under 2 MB. Any other arc is priced on
+demand with a haversine x road-factor estimate, and local search only
+considers moves that introduce candidate arcs.
+"""
+import math
+import time
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def _haversine_block(lat1, lng1, cos1, lat2, lng2, cos2) -> np.ndarray:
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class CandidateGraph:
+    """k nearest neighbours per stop in CSR form, plus an on-demand arc estimate"""
+
+    def __init__(self, coords: Sequence[Tuple[float, float]], indptr: np.ndarray, indices: np.ndarray,
+                 weights: np.ndarray, road_factor: float):
+        self.n = len(coords)
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.road_factor = road_factor
+        self._lat = [math.radians(c[0]) for c in coords]
+        self._lng = [math.radians(c[1]) for c in coords]
+        self._cos = [math.cos(v) for v in self._lat]
+        # Python-list views: the local search reads these per move
+        self._ptr = indptr.tolist()
+        self._nbr = indices.tolist()
+        self._w = weights.tolist()
+
+    @classmethod
+    def build(cls, coords: Sequence[Tuple[float, float]], k: int = 12, road_factor: float = 1.3,
+              leaf_size: int = 64) -> "CandidateGraph":
+        """Exact k nearest neighbours of every stop, searched leaf by leaf of a k-d partition
+
+        A uniform grid degenerates on clustered data (one city cell holding
+        thousands of stops), so stops are split at the median of the wider axis
+        until leaves hold at most `leaf_size`. Each leaf then only measures
+        against the leaves whose bounding boxes are within its k-th distance.
+        """
+        n = len(coords)
+        if n < 2:
+            empty = np.zeros(0, dtype=np.int32)
+            return cls(coords, np.zeros(n + 1, dtype=np.int64), empty, empty.astype(np.uint32), road_factor)
+        k = min(k, n - 1)
+        pts = np.asarray(coords, dtype=np.float64)
+        lat, lng = np.radians(pts[:, 0]), np.radians(pts[:, 1])
+        cos_lat = np.cos(lat)
+        # Plane for partitioning: longitude scaled by the mean latitude. A unit
+        # of it is shortest in metres at the highest latitude, which bounds the search
+        mean_cos = math.cos(math.radians(float(pts[:, 0].mean())))
+        xy = np.column_stack([pts[:, 1] * mean_cos, pts[:, 0]])
+        shrink = min(1.0, math.cos(math.radians(float(np.abs(pts[:, 0]).max()))) / mean_cos)
+        metres_per_unit = 111_000.0 * shrink * 0.99
+
+        leaves = _kd_leaves(xy, max(leaf_size, k + 1))
+        lo = np.array([xy[leaf].min(axis=0) for leaf in leaves])
+        hi = np.array([xy[leaf].max(axis=0) for leaf in leaves])
+        indices = np.empty((n, k), dtype=np.int32)
+        weights = np.empty((n, k), dtype=np.uint32)
+        for li, members in enumerate(leaves):
+            # Box-to-box gaps from this leaf to every leaf, in plane units
+            gap = np.maximum(0.0, np.maximum(lo - hi[li], lo[li] - hi))
+            box_dist = np.hypot(gap[:, 0], gap[:, 1])
+            order = np.argsort(box_dist)
+            # Nearest leaves until there are more than k candidates give an upper bound...
+            count = np.cumsum([len(leaves[j]) for j in order])
+            take = int(np.searchsorted(count, k + 1)) + 1
+            while True:
+                cand = np.concatenate([leaves[j] for j in order[:take]])
+                d = _haversine_block(lat[members, None], lng[members, None], cos_lat[members, None],
+                                     lat[None, cand], lng[None, cand], cos_lat[None, cand])
+                d[cand[None, :] == members[:, None]] = np.inf
+                kth = float(np.partition(d, k - 1, axis=1)[:, k - 1].max())
+                # ...and every leaf whose box is within that bound must be searched
+                needed = int(np.searchsorted(box_dist[order], kth / metres_per_unit, side="right"))
+                if needed <= take:
+                    break
+                take = needed
+            nearest = np.argsort(d, axis=1)[:, :k]
+            indices[members] = cand[nearest]
+            weights[members] = np.rint(np.take_along_axis(d, nearest, axis=1) * road_factor)
+        indptr = np.arange(0, n * k + 1, k, dtype=np.int64)
+        return cls(coords, indptr, indices.ravel(), weights.ravel(), road_factor)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+
+    def neighbors(self, i: int) -> List[int]:
+        """Candidates of i, nearest first"""
+        return self._nbr[self._ptr[i]:self._ptr[i + 1]]
+
+    def estimate(self, i: int, j: int) -> float:
+        """Haversine x road factor, for arcs outside the candidate graph"""
+        a = (math.sin((self._lat[j] - self._lat[i]) / 2) ** 2
+             + self._cos[i] * self._cos[j] * math.sin((self._lng[j] - self._lng[i]) / 2) ** 2)
+        return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a))) * self.road_factor
+
+    def cost(self, i: int, j: int) -> float:
+        if i == j:
+            return 0.0
+        lo, hi = self._ptr[i], self._ptr[i + 1]
+        for p in range(lo, hi):
+            if self._nbr[p] == j:
+                return float(self._w[p])
+        return self.estimate(i, j)
+
+    def nearest_neighbor_route(self, nodes: Sequence[int], start: int) -> List[int]:
+        """Closed nearest-neighbour tour over `nodes` from `start`
+
+        The next stop is the nearest unvisited candidate; only when all
+        candidates are used is the remaining set scanned (vectorised).
+        """
+        unvisited = np.zeros(self.n, dtype=bool)
+        unvisited[list(nodes)] = True
+        unvisited[start] = False
+        lat, lng, cos_lat = (np.asarray(a) for a in (self._lat, self._lng, self._cos))
+        route, cur = [start], start
+        for _ in range(int(unvisited.sum())):
+            nxt = next((c for c in self.neighbors(cur) if unvisited[c]), None)
+            if nxt is None:
+                rest = np.flatnonzero(unvisited)
+                d = _haversine_block(lat[cur], lng[cur], cos_lat[cur], lat[rest], lng[rest], cos_lat[rest])
+                nxt = int(rest[np.argmin(d)])
+            unvisited[nxt] = False
+            route.append(nxt)
+            cur = nxt
+        route.append(start)
+        return route
+
+    def route_cost(self, route: Sequence[int]) -> float:
+        return sum(self.cost(a, b) for a, b in zip(route, route[1:]))
+
+
+def _kd_leaves(xy: np.ndarray, leaf_size: int) -> List[np.ndarray]:
+    """Index arrays of a median-split k-d partition with at most `leaf_size` points per leaf"""
+    leaves, stack = [], [np.arange(len(xy))]
+    while stack:
+        idx = stack.pop()
+        if len(idx) <= leaf_size:
+            leaves.append(idx)
+            continue
+        span = xy[idx].max(axis=0) - xy[idx].min(axis=0)
+        axis = int(span[1] > span[0])
+        # Split by rank, not value, so duplicate coordinates still halve the leaf
+        ranked = idx[np.argsort(xy[idx, axis], kind="stable")]
+        half = len(ranked) // 2
+        stack.extend([ranked[:half], ranked[half:]])
+    return leaves
+
+
+def two_opt(graph: CandidateGraph, route: List[int], deadline: Optional[float] = None) -> List[int]:
+    """2-opt over a closed route, trying only moves that add a candidate arc
+
+    Classic neighbour-list 2-opt with don't-look bits: for stop a and its
+    tour successor b, a move replacing (a, b) and (c, d) with (a, c) and
+    (b, d) is only tried for candidates c of a closer than b. The route's
+    first stop (the depot) stays first.
+    """
+    if len(route) < 5:
+        return route
+    depot = route[0]
+    tour = np.asarray(route[:-1], dtype=np.int64)
+    m = len(tour)
+    pos = {int(node): p for p, node in enumerate(tour.tolist())}
+    queue = list(tour.tolist())
+    active = set(queue)
+    checks = 0
+    while queue:
+        a = queue.pop()
+        active.discard(a)
+        improved = False
+        for direction in (1, -1):
+            pa = pos[a]
+            b = int(tour[(pa + direction) % m])
+            d_ab = graph.cost(a, b)
+            for c in graph.neighbors(a):
+                if c not in pos:
+                    continue  # not on this route (multi-vehicle)
+                d_ac = graph.cost(a, c)
+                if d_ac >= d_ab:
+                    break
+                pc = pos[c]
+                d = int(tour[(pc + direction) % m])
+                if c == b or d == a:
+                    continue
+                delta = d_ac + graph.cost(b, d) - d_ab - graph.cost(c, d)
+                if delta < -1e-7:
+                    # Reverse b..c (forward) or c..b (backward), whichever segment is shorter
+                    i, j = (pa + 1, pc) if direction == 1 else (pc, pa - 1)
+                    length = (j - i) % m + 1
+                    if length > m // 2:
+                        i, j = j + 1, i - 1
+                        length = m - length
+                    idx = (i + np.arange(length)) % m
+                    tour[idx] = tour[idx[::-1]]
+                    for p in idx.tolist():
+                        pos[int(tour[p])] = p
+                    for node in (a, b, c, d):
+                        if node not in active:
+                            active.add(node)
+                            queue.append(node)
+                    improved = True
+                    break
+            if improved:
+                break
+        checks += 1
+        if deadline is not None and checks % 256 == 0 and time.time() > deadline:
+            break
+    start = pos[depot]
+    ordered = np.roll(tour, -start).tolist()
+    return ordered + [depot]
@@ -1,58 +1,120 @@
-from geopy.geocoders import Nominatim
+from app.config import settings
 from app.models.address import AddressInput, AddressWithCoordinates
-from typing import List, Optional, Tuple
+from app.utils.metrics import GEOCODE_RATE_LIMIT_WAIT_SECONDS, record_cache
+from app.utils.tracing import stage
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from urllib.parse import urlparse
 import logging
+import threading
 import time
 
+if TYPE_CHECKING:
+    from geopy.geocoders import Nominatim
+    from app.models.stop_set import StopSet
+
 logger = logging.getLogger(__name__)
 
+def build_nominatim(user_agent: str, timeout: int = 10, url: Optional[str] = None) -> "Nominatim":
+    """Nominatim client for the configured base URL (public server or offline stand-in)"""
+    # geopy (and the aiohttp it pulls in) is only imported once a geocoder is needed
+    from geopy.geocoders import Nominatim
+    parsed = urlparse(url or settings.NOMINATIM_URL)
+    return Nominatim(
+        user_agent=user_agent,
+        timeout=timeout,
+        domain=parsed.netloc + parsed.path.rstrip("/"),
+        scheme=parsed.scheme or "https"
+    )
+
 class GeocoderService:
     """Service for geocoding addresses using Nominatim"""
     
-    def __init__(self, user_agent="route_optimizer_1.0"):
-        self.geolocator = Nominatim(user_agent=user_agent, timeout=10)
+    def __init__(self, user_agent="route_optimizer_1.0", nominatim_url: Optional[str] = None,
+                 min_delay_seconds: Optional[float] = None):
+        self.user_agent = user_agent
+        self.nominatim_url = nominatim_url
+        self._geolocator = None
+        self.min_delay_seconds = (
+            settings.GEOCODE_MIN_DELAY_SECONDS if min_delay_seconds is None else min_delay_seconds
+        )
         self.cache = {}
+        self._rate_lock = threading.Lock()
     
-    def geocode_address(self, addr: AddressInput) -> Optional[AddressWithCoordinates]:
-        """Convert address to coordinates"""
-        
-        # Return if already has coordinates
-        if addr.latitude and addr.longitude:
-            return AddressWithCoordinates(**addr.model_dump())
-        
-        # Check cache
-        key = f"{addr.street.lower()},{addr.city.lower()}"
-        if key in self.cache:
-            lat, lng = self.cache[key]
-            data = addr.model_dump(exclude={"latitude", "longitude"})
-            return AddressWithCoordinates(
-                latitude=lat, longitude=lng, **data
-            )
+    @property
+    def geolocator(self) -> "Nominatim":
+        """Nominatim client, built on first use"""
+        if self._geolocator is None:
+            self._geolocator = build_nominatim(self.user_agent, timeout=10, url=self.nominatim_url)
+        return self._geolocator
+    
+    @geolocator.setter
+    def geolocator(self, value):
+        self._geolocator = value
+    
+    def _lookup(self, street: str, city: str, postal_code: Optional[str]) -> Optional[Tuple[float, float]]:
+        """(lat, lng) for an address from the memory cache or Nominatim"""
+        query = f"{street}, {city}"
+        if postal_code:
+            query += f", {postal_code}"
+        return self._resolve(f"{street.lower()},{city.lower()}", query)
+    
+    def _resolve(self, key: str, query: str) -> Optional[Tuple[float, float]]:
+        hit = key in self.cache
+        record_cache("geocode_memory", hit)
+        if hit:
+            return self.cache[key]
         
         try:
-            time.sleep(1)  # Nominatim rate limit
-            full_addr = f"{addr.street}, {addr.city}"
-            if addr.postal_code:
-                full_addr += f", {addr.postal_code}"
-            
-            loc = self.geolocator.geocode(full_addr)
+            # One Nominatim request at a time per process, whichever thread asks
+            with self._rate_lock:
+                if self.min_delay_seconds:
+                    slept = time.perf_counter()
+                    time.sleep(self.min_delay_seconds)  # Nominatim rate limit
+                    GEOCODE_RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - slept)
+                with stage("geocode.lookup"):
+                    loc = self.geolocator.geocode(query)
             if not loc:
                 logger.warning(f"No geocode: {key}")
                 return None
             
             self.cache[key] = (loc.latitude, loc.longitude)
             logger.info(f"Geocoded: {key}")
-            
-            data = addr.model_dump(exclude={"latitude", "longitude"})
-            return AddressWithCoordinates(
-                latitude=loc.latitude,
-                longitude=loc.longitude,
-                **data
-            )
+            return self.cache[key]
         except Exception as e:
             logger.error(f"Geocode error: {str(e)}")
             return None
     
+    def geocode_query(self, query: str) -> Optional[Tuple[float, float]]:
+        """(lat, lng) for a free-text address line"""
+        query = " ".join(query.split())
+        return self._resolve(query.lower(), query)
+    
+    def geocode_queries(self, queries: List[str]) -> Iterator[Optional[Tuple[float, float]]]:
+        """Yield (lat, lng) or None per query, in order, as each is resolved
+
+        Blocking (rate limited): call from a worker thread. Repeated queries in
+        the batch are looked up once, failures included.
+        """
+        seen: Dict[str, Optional[Tuple[float, float]]] = {}
+        for query in queries:
+            key = " ".join(query.split()).lower()
+            if key not in seen:
+                seen[key] = self.geocode_query(query)
+            yield seen[key]
+    
+    def geocode_address(self, addr: AddressInput) -> Optional[AddressWithCoordinates]:
+        """Convert address to coordinates"""
+        
+        # Return if already has coordinates
+        if addr.latitude and addr.longitude:
+            return AddressWithCoordinates(**addr.model_dump())
+        
+        found = self._lookup(addr.street, addr.city, addr.postal_code)
+        if not found:
+            return None
+        data = addr.model_dump(exclude={"latitude", "longitude"})
+        return AddressWithCoordinates(latitude=found[0], longitude=found[1], **data)
+    
     def geocode_addresses(
         self, addresses: List[AddressInput]
     ) -> Tuple[List[AddressWithCoordinates], List[int]]:
@@ -65,5 +127,27 @@ class GeocoderService:
             else:
                 failed.append(idx)
         return geocoded, failed
+    
+    def iter_geocode_stops(self, stops: "StopSet") -> Iterator[Tuple[int, int]]:
+        """Fill missing coordinates in place, yielding (done, total) after each lookup"""
+        missing = stops.missing()
+        for done, i in enumerate(missing, 1):
+            found = self._lookup(stops.streets[i], stops.cities[i], stops.postal_codes[i])
+            if found:
+                stops.coords[i] = found
+            yield done, len(missing)
+    
+    @staticmethod
+    def split_located(stops: "StopSet") -> Tuple["StopSet", List[int]]:
+        """The stops that have coordinates, and the positions of those that do not"""
+        located = stops.located
+        failed = [i for i, ok in enumerate(located.tolist()) if not ok]
+        return (stops.take(located.nonzero()[0]) if failed else stops), failed
+    
+    def geocode_stops(self, stops: "StopSet") -> Tuple["StopSet", List[int]]:
+        """Fill missing coordinates in place; return the located stops and failed positions"""
+        for _ in self.iter_geocode_stops(stops):
+            pass
+        return self.split_located(stops)
 
 geocoder = GeocoderService()
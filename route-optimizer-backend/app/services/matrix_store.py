@@ -0,0 +1,216 @@
+"""Cross-process store for distance/duration matrices.
+
+Every gunicorn/uvicorn worker on a host shares one directory (tmpfs
+``/dev/shm`` by default). A matrix is written once as a ``.npy`` file and the
+other workers attach it with ``np.load(mmap_mode="r")``, i.e. zero-copy from
+the page cache. An index guarded by ``flock`` tracks size and per-pid
+reference counts; recency is each file's mtime, bumped on every hit. Lookups
+therefore take no lock and never rewrite the index. The least recently used
+unreferenced matrices are evicted once the store exceeds ``max_bytes``.
+
+Files are used rather than ``multiprocessing.shared_memory`` segments because
+the latter are unlinked by the resource tracker of whichever process created
+them, which breaks sharing between unrelated workers.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Optional, List, Tuple
+import numpy as np
+from app.config import settings
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+def default_store_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+    return os.path.join(base, "route-optimizer-matrices")
+
+
+def matrix_fingerprint(kind: str, coords: List[Tuple[float, float]], precision: int = 6) -> str:
+    """Stable key for a matrix over `coords` (rounded so float noise does not split entries)"""
+    payload = json.dumps([kind, [(round(a, precision), round(b, precision)) for a, b in coords]],
+                         separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedMatrixStore:
+    """Fingerprint-keyed matrices shared between worker processes on one host"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or settings.MATRIX_STORE_DIR or default_store_dir()
+        self.max_bytes = settings.MATRIX_STORE_MAX_BYTES if max_bytes is None else max_bytes
+        self._index_path = os.path.join(self.directory, "index.json")
+        self._lock_path = os.path.join(self.directory, "index.lock")
+        self._ready = False
+
+    def _ensure_dir(self):
+        if not self._ready:
+            os.makedirs(self.directory, exist_ok=True)
+            self._ready = True
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    @contextmanager
+    def _locked_index(self, shared: bool = False):
+        """Cross-process access to the index: exclusive (written back on exit if
+        changed) or, with shared=True, read-only alongside other readers"""
+        self._ensure_dir()
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self._index_path) as f:
+                        before = f.read()
+                    index = json.loads(before)
+                except (FileNotFoundError, ValueError):
+                    before, index = "", {}
+                yield index
+                after = json.dumps(index)
+                if not shared and after != before:
+                    tmp = f"{self._index_path}.{os.getpid()}.tmp"
+                    with open(tmp, "w") as f:
+                        f.write(after)
+                    os.replace(tmp, self._index_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _touch(self, key: str):
+        """Mark `key` as just used (ns precision: coarse kernel timestamps would tie)"""
+        now = time.time_ns()
+        try:
+            os.utime(self._path(key), ns=(now, now))
+        except FileNotFoundError:
+            pass  # evicted meanwhile; our mapping stays valid
+
+    def _last_used(self, key: str) -> int:
+        try:
+            return os.stat(self._path(key)).st_mtime_ns
+        except FileNotFoundError:
+            return -1  # already gone: evict first
+
+    def _attach(self, key: str) -> Optional[np.ndarray]:
+        try:
+            return np.load(self._path(key), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Read-only zero-copy view of a stored matrix, or None (takes no lock)
+
+        put() publishes a file only once it is complete and indexed, so an
+        existing file is a valid entry.
+        """
+        matrix = self._attach(key)
+        if matrix is not None:
+            self._touch(key)
+        record_cache("matrix_store", matrix is not None)
+        return matrix
+
+    def put(self, key: str, matrix: np.ndarray) -> np.ndarray:
+        """Store a matrix (no-op if another worker stored it first) and return the shared view"""
+        matrix = np.ascontiguousarray(matrix)
+        if matrix.nbytes > self.max_bytes:
+            return matrix  # would evict everything else; keep it private to this worker
+        if os.path.exists(self._path(key)):
+            shared = self._attach(key)
+            if shared is not None:
+                return shared
+        self._ensure_dir()
+        tmp = os.path.join(self.directory, f".{key}.{os.getpid()}.tmp.npy")
+        np.save(tmp, matrix)
+        with self._locked_index() as index:
+            if key not in index:
+                os.replace(tmp, self._path(key))
+                self._touch(key)
+                index[key] = {"bytes": matrix.nbytes, "refs": {}}
+                self._evict(index, keep=key)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        shared = self._attach(key)
+        return shared if shared is not None else matrix
+
+    def get_or_build(self, key: str, build: Callable[[], np.ndarray]) -> np.ndarray:
+        matrix = self.get(key)
+        if matrix is None:
+            matrix = self.put(key, build())
+        return matrix
+
+    def _evict(self, index: Dict[str, Any], keep: Optional[str] = None):
+        """Drop least recently used unreferenced entries until under max_bytes (index lock held)"""
+        for entry in index.values():
+            entry["refs"] = {pid: n for pid, n in entry["refs"].items() if n > 0 and _pid_alive(int(pid))}
+        for key in [k for k in index if not index[k]["refs"] and not os.path.exists(self._path(k))]:
+            del index[key]  # file removed underneath the index
+        total = sum(e["bytes"] for e in index.values())
+        for key in sorted(index, key=self._last_used):
+            if total <= self.max_bytes:
+                break
+            if key == keep or index[key]["refs"]:
+                continue
+            total -= index.pop(key)["bytes"]
+            try:
+                # Workers that already mapped it keep a valid mapping until they drop it
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _adjust_ref(self, key: str, delta: int):
+        pid = str(os.getpid())
+        with self._locked_index() as index:
+            entry = index.get(key)
+            if entry:
+                entry["refs"][pid] = max(0, entry["refs"].get(pid, 0) + delta)
+                if not entry["refs"][pid]:
+                    del entry["refs"][pid]
+
+    @contextmanager
+    def hold(self, key: Optional[str]):
+        """Hold a reference so `key` is not evicted while in use (no-op for None)"""
+        if key is None:
+            yield
+            return
+        self._adjust_ref(key, 1)
+        try:
+            yield
+        finally:
+            self._adjust_ref(key, -1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._locked_index(shared=True) as index:
+            return {
+                "directory": self.directory,
+                "entries": len(index),
+                "bytes": sum(e["bytes"] for e in index.values()),
+                "max_bytes": self.max_bytes,
+                "referenced": sum(1 for e in index.values() if e["refs"]),
+            }
+
+    def clear(self):
+        with self._locked_index() as index:
+            for key in list(index):
+                index.pop(key)
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+
+
+matrix_store = SharedMatrixStore()
@@ -5,14 +5,33 @@ from typing import List, Tuple, Dict, Any, Optional
 import numpy as np
 import requests
 from app.services.cache_service import cache_service
+from app.services.matrix_store import matrix_store, matrix_fingerprint
+from app.services import large_matrix
+from app.services.candidate_graph import CandidateGraph, two_opt
 from app.services.distance_calculator import DistanceCalculator
+from app.services.portfolio_solver import portfolio_solver
+from app.services.solver_telemetry import SolveTelemetry
+from app.config import settings
+from app.utils.metrics import SOLVER_QUEUE_DEPTH
+from app.utils.tracing import stage
 
 class OptimizationEngine:
-    def __init__(self, osrm_base: str = "https://router.project-osrm.org", request_timeout: int = 10):
-        self.osrm_base = osrm_base.rstrip("/")
+    def __init__(self, osrm_base: Optional[str] = None, request_timeout: int = 10):
+        self.osrm_base = (osrm_base or settings.OSRM_BASE_URL).rstrip("/")
         self.request_timeout = request_timeout
         self.distance_calc = DistanceCalculator()
-        self._ortools_available = self._check_ortools()
+        self._ortools_checked: Optional[bool] = None
+
+    @property
+    def _ortools_available(self) -> bool:
+        # Probed on first use rather than at import so worker startup stays cheap
+        if self._ortools_checked is None:
+            self._ortools_checked = self._check_ortools()
+        return self._ortools_checked
+
+    @_ortools_available.setter
+    def _ortools_available(self, value: bool):
+        self._ortools_checked = value
 
     def _check_ortools(self) -> bool:
         try:
@@ -28,18 +47,89 @@ class OptimizationEngine:
         data = json.dumps(payload, sort_keys=True, separators=(",", ":"))
         return hashlib.sha256(data.encode("utf-8")).hexdigest()
 
-    def _osrm_table(self, coords: List[Tuple[float, float]]) -> Dict[str, List[List[float]]]:
+    def _osrm_table(self, coords: List[Tuple[float, float]]) -> Dict[str, Any]:
+        """Distance/duration matrices, from the host-wide matrix store, Redis or OSRM
+
+        With the matrix store enabled both come back as read-only arrays shared
+        with the other workers; index them like the lists they replace.
+        """
+        shared_key = matrix_fingerprint(f"osrm:{self.osrm_base}", coords)
+        if settings.MATRIX_STORE_ENABLED:
+            shared = matrix_store.get(shared_key)
+            if shared is not None:
+                return {"distances": shared[0], "durations": shared[1], "matrix_key": shared_key}
         key = f"osrm:table:{self._hash_key({'coords': coords})}"
-        cached = cache_service.get_route(key)
-        if cached:
-            return cached
-        url = f"{self.osrm_base}/table/v1/driving/{self._coords_to_str(coords)}?annotations=distance,duration"
+        result = cache_service.get_route(key)
+        if not result:
+            url = f"{self.osrm_base}/table/v1/driving/{self._coords_to_str(coords)}?annotations=distance,duration"
+            r = requests.get(url, timeout=self.request_timeout)
+            r.raise_for_status()
+            data = r.json()
+            result = {"distances": data.get("distances", []), "durations": data.get("durations", [])}
+            cache_service.set_route(key, result, ttl=3600)
+        if settings.MATRIX_STORE_ENABLED:
+            # Unreachable pairs (null) become NaN
+            stacked = np.array([result["distances"], result["durations"]], dtype=np.float64)
+            shared = matrix_store.put(shared_key, stacked)
+            return {"distances": shared[0], "durations": shared[1], "matrix_key": shared_key}
+        return result
+
+    def _osrm_table_block(
+        self, coords: List[Tuple[float, float]], sources: List[int], destinations: List[int]
+    ) -> List[List[Optional[float]]]:
+        params = (
+            f"sources={';'.join(map(str, sources))}&destinations={';'.join(map(str, destinations))}"
+            "&annotations=distance"
+        )
+        url = f"{self.osrm_base}/table/v1/driving/{self._coords_to_str(coords)}?{params}"
         r = requests.get(url, timeout=self.request_timeout)
         r.raise_for_status()
-        data = r.json()
-        result = {"distances": data.get("distances", []), "durations": data.get("durations", [])}
-        cache_service.set_route(key, result, ttl=3600)
-        return result
+        return r.json().get("distances", [])
+
+    def _large_distance_matrix(self, coords: List[Tuple[float, float]]) -> np.ndarray:
+        """OSRM distances into a disk-backed uint32/float32 matrix, fetched in tiles"""
+        matrix = large_matrix.allocate(len(coords))
+        return large_matrix.fill_from_table(matrix, coords, self._osrm_table_block)
+
+    def _solve_large(
+        self,
+        coords: List[Tuple[float, float]],
+        distances: np.ndarray,
+        vehicles: int,
+        depot_index: int,
+        time_limit_seconds: int,
+    ) -> List[List[int]]:
+        """Cluster per vehicle, then refine each small enough cluster with GLS on its submatrix"""
+        routes = self._cluster_routes(coords, vehicles, depot_index)
+        if not self._ortools_available:
+            return routes
+        budget = max(1, time_limit_seconds // max(1, len(routes)))
+        refined = []
+        for r in routes:
+            nodes = r[:-1]
+            if len(nodes) < 3 or len(nodes) > settings.LARGE_GLS_MAX_STOPS:
+                refined.append(r)
+                continue
+            sub_routes = self._guided_local_search_vrp(large_matrix.submatrix(distances, nodes), 1, 0, budget)
+            refined.append([nodes[i] for i in sub_routes[0]] if sub_routes else r)
+        return refined
+
+    def _solve_sparse(
+        self,
+        coords: List[Tuple[float, float]],
+        vehicles: int,
+        depot_index: int,
+        time_limit_seconds: int,
+    ) -> Tuple[List[List[int]], CandidateGraph]:
+        """Cluster per vehicle, then nearest neighbour + 2-opt over the k-nearest-neighbour candidate graph"""
+        with stage("matrix"):
+            graph = CandidateGraph.build(coords, settings.CANDIDATE_K, settings.SPARSE_ROAD_FACTOR)
+        deadline = time.time() + max(1, time_limit_seconds)
+        routes = []
+        for cl in self._cluster_assign(coords, vehicles):
+            route = graph.nearest_neighbor_route(cl, depot_index)
+            routes.append(two_opt(graph, route, deadline))
+        return routes, graph
 
     def _osrm_route(self, ordered_coords: List[Tuple[float, float]]) -> Optional[Dict[str, Any]]:
         url = f"{self.osrm_base}/route/v1/driving/{self._coords_to_str(ordered_coords)}?overview=full&geometries=geojson"
@@ -63,8 +153,12 @@ class OptimizationEngine:
         vehicles: int,
         depot_index: int,
         time_limit_seconds: int,
+        telemetry: Optional[SolveTelemetry] = None,
     ) -> List[List[int]]:
         from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+        if isinstance(distances, np.ndarray):
+            # The callback runs per arc evaluation; list indexing is several times faster
+            distances = distances.tolist()
         n = len(distances)
         manager = pywrapcp.RoutingIndexManager(n, vehicles, depot_index)
         routing = pywrapcp.RoutingModel(manager)
@@ -79,10 +173,14 @@ class OptimizationEngine:
         search.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
         search.time_limit.seconds = max(1, time_limit_seconds)
         search.log_search = False
-        search.use_multi_armed_bandit = True
+        search.use_multi_armed_bandit_concatenate_operators = True
         search.lns_time_limit.seconds = 1
-        search.number_of_search_workers = 8
+        if telemetry is not None:
+            telemetry.strategy = "PATH_CHEAPEST_ARC+GUIDED_LOCAL_SEARCH"
+            telemetry.attach(routing)
         assignment = routing.SolveWithParameters(search)
+        if telemetry is not None:
+            telemetry.finish(routing, max(1, time_limit_seconds))
         if assignment is None:
             return []
         routes: List[List[int]] = []
@@ -169,52 +267,106 @@ class OptimizationEngine:
             result[assign[i]].append(i)
         return result
 
+    def _cluster_routes(
+        self, coords: List[Tuple[float, float]], vehicles: int, depot_index: int
+    ) -> List[List[int]]:
+        routes = []
+        for cl in self._cluster_assign(coords, vehicles):
+            if depot_index not in cl:
+                cl = [depot_index] + cl
+            sub_coords = [coords[i] for i in cl]
+            order = self._grid_nearest_neighbor(sub_coords, 0)
+            routes.append([cl[i] for i in order])
+        return routes
+
     def optimize(
         self,
         addresses: List[Tuple[float, float]],
         vehicles: int = 1,
         depot_index: int = 0,
         time_limit_seconds: int = 2,
+        portfolio: Optional[bool] = None,
+        telemetry: Optional[SolveTelemetry] = None,
+        tag: Optional[str] = None,
     ) -> Dict[str, Any]:
         start = time.time()
+        if portfolio is None:
+            portfolio = settings.PORTFOLIO_ENABLED
         coords = list(addresses)
         key = f"route:{self._hash_key({'coords': coords, 'vehicles': vehicles, 'depot': depot_index})}"
         cached = cache_service.get_route(key)
         if cached:
             cached["computation_time_ms"] = int((time.time() - start) * 1000)
             return cached
-        table = self._osrm_table(coords)
+        # Large instances: memmap matrix, clustered solve, no per-route OSRM geometry.
+        # Sparse instances: no matrix at all, only k-nearest-neighbour candidate arcs
+        sparse = len(coords) >= settings.SPARSE_INSTANCE_THRESHOLD
+        large = sparse or len(coords) >= settings.LARGE_INSTANCE_THRESHOLD
+        if sparse:
+            table = {"distances": None}
+        else:
+            with stage("osrm_table"):
+                table = {"distances": self._large_distance_matrix(coords)} if large else self._osrm_table(coords)
         distances = table["distances"]
-        if self._ortools_available:
-            routes = self._guided_local_search_vrp(distances, vehicles, depot_index, time_limit_seconds)
-            if not routes:
-                clusters = self._cluster_assign(coords, vehicles)
-                routes = []
-                for cl in clusters:
-                    if depot_index not in cl:
-                        cl = [depot_index] + cl
-                    sub_coords = [coords[i] for i in cl]
-                    order = self._grid_nearest_neighbor(sub_coords, 0)
-                    routes.append([cl[i] for i in order])
+        strategy = None
+        SOLVER_QUEUE_DEPTH.inc()
+        try:
+            with stage("solve"), matrix_store.hold(table.get("matrix_key")):
+                if sparse:
+                    routes, graph = self._solve_sparse(coords, vehicles, depot_index, time_limit_seconds)
+                    strategy = "sparse_candidates"
+                    if telemetry is not None:
+                        telemetry.finish(reason="heuristic")
+                elif large:
+                    routes = self._solve_large(coords, distances, vehicles, depot_index, time_limit_seconds)
+                    strategy = "large_instance"
+                    if telemetry is not None:
+                        telemetry.finish(reason="heuristic")
+                elif self._ortools_available:
+                    routes = []
+                    if portfolio:
+                        outcome = portfolio_solver.solve(
+                            distances, vehicles, depot_index,
+                            min(time_limit_seconds, settings.PORTFOLIO_TIME_LIMIT), tag=tag
+                        )
+                        if outcome:
+                            routes = outcome["routes"]
+                            strategy = outcome["strategy"]
+                            if telemetry is not None and outcome.get("telemetry"):
+                                telemetry.load(outcome["telemetry"])
+                    if not routes:
+                        routes = self._guided_local_search_vrp(
+                            distances, vehicles, depot_index, time_limit_seconds, telemetry
+                        )
+                    if not routes:
+                        routes = self._cluster_routes(coords, vehicles, depot_index)
+                        if telemetry is not None:
+                            telemetry.finish(reason="heuristic")
+                else:
+                    routes = self._cluster_routes(coords, vehicles, depot_index)
+                    if telemetry is not None:
+                        telemetry.finish(reason="heuristic")
+        finally:
+            SOLVER_QUEUE_DEPTH.dec()
+        if sparse:
+            total_m = sum(graph.route_cost(r) for r in routes)
+        elif isinstance(distances, np.ndarray):
+            total_m = sum(large_matrix.route_cost_m(distances, r) for r in routes)
         else:
-            clusters = self._cluster_assign(coords, vehicles)
-            routes = []
-            for cl in clusters:
-                if depot_index not in cl:
-                    cl = [depot_index] + cl
-                sub_coords = [coords[i] for i in cl]
-                order = self._grid_nearest_neighbor(sub_coords, 0)
-                routes.append([cl[i] for i in order])
-        total_m = 0.0
-        for r in routes:
-            for i in range(len(r) - 1):
-                total_m += distances[r[i]][r[i + 1]]
-        total_km = round((total_m / 1000.0), 2)
+            total_m = 0.0
+            for r in routes:
+                for i in range(len(r) - 1):
+                    total_m += distances[r[i]][r[i + 1]]
+        total_km = round(float(total_m) / 1000.0, 2)
         polyline: List[List[Tuple[float, float]]]
         polyline = []
         for r in routes:
             ordered = [coords[i] for i in r]
-            res = self._osrm_route(ordered)
+            if large:
+                polyline.append(ordered)
+                continue
+            with stage("osrm_route"):
+                res = self._osrm_route(ordered)
             if res and res.get("geometry"):
                 pts = res["geometry"]["coordinates"]
                 polyline.append([(p[1], p[0]) for p in pts])
@@ -228,6 +380,8 @@ class OptimizationEngine:
             "total_time_min": self.distance_calc.distance_to_time(total_km),
             "computation_time_ms": int((time.time() - start) * 1000),
         }
+        if strategy:
+            result["strategy"] = strategy
         cache_service.set_route(key, result, ttl=600)
         return result
 
@@ -0,0 +1,205 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import List, Tuple, Dict, Any, Optional
+from app.config import settings
+from app.services.solver_telemetry import SolveTelemetry
+
+logger = logging.getLogger(__name__)
+
+# (first solution strategy, local search metaheuristic) pairs tried in parallel.
+# Ordered by how often they win on our delivery instances, so smaller pools
+# still get the strongest combinations.
+DEFAULT_STRATEGIES: List[Tuple[str, str]] = [
+    ("PATH_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ("SAVINGS", "GUIDED_LOCAL_SEARCH"),
+    ("PATH_CHEAPEST_ARC", "SIMULATED_ANNEALING"),
+    ("CHRISTOFIDES", "TABU_SEARCH"),
+    ("PARALLEL_CHEAPEST_INSERTION", "GUIDED_LOCAL_SEARCH"),
+    ("LOCAL_CHEAPEST_INSERTION", "TABU_SEARCH"),
+    ("SAVINGS", "SIMULATED_ANNEALING"),
+    ("GLOBAL_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+]
+
+# Headroom for a worker to hand its result back after its own time limit hits
+RESULT_GRACE_SECONDS = 1.0
+
+
+def _solve_strategy(
+    distances: List[List[int]],
+    vehicles: int,
+    depot_index: int,
+    first_solution: str,
+    metaheuristic: str,
+    deadline: float,
+) -> Optional[Dict[str, Any]]:
+    """Run one OR-Tools search configuration until the shared deadline.
+
+    Executed inside a worker process, so it only takes picklable arguments.
+    `deadline` is a wall-clock timestamp shared by every worker of a solve.
+    """
+    from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+
+    remaining_ms = int((deadline - time.time()) * 1000)
+    if remaining_ms <= 0:
+        return None
+    start = time.time()
+    n = len(distances)
+    manager = pywrapcp.RoutingIndexManager(n, vehicles, depot_index)
+    routing = pywrapcp.RoutingModel(manager)
+
+    def transit_cb(from_index, to_index):
+        return distances[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+
+    transit_cb_idx = routing.RegisterTransitCallback(transit_cb)
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_cb_idx)
+    telemetry = SolveTelemetry(strategy=f"{first_solution}+{metaheuristic}")
+    telemetry.attach(routing)
+    search = pywrapcp.DefaultRoutingSearchParameters()
+    search.first_solution_strategy = getattr(routing_enums_pb2.FirstSolutionStrategy, first_solution)
+    search.local_search_metaheuristic = getattr(routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic)
+    search.time_limit.FromMilliseconds(remaining_ms)
+    search.log_search = False
+    assignment = routing.SolveWithParameters(search)
+    telemetry.finish(routing, remaining_ms / 1000)
+    if assignment is None:
+        return None
+    routes: List[List[int]] = []
+    for v in range(vehicles):
+        idx = routing.Start(v)
+        route = []
+        while not routing.IsEnd(idx):
+            route.append(manager.IndexToNode(idx))
+            idx = assignment.Value(routing.NextVar(idx))
+        route.append(manager.IndexToNode(idx))
+        routes.append(route)
+    return {
+        "routes": routes,
+        "objective": assignment.ObjectiveValue(),
+        "solve_time_ms": int((time.time() - start) * 1000),
+        "telemetry": telemetry.to_dict(),
+    }
+
+
+class PortfolioSolver:
+    """Race several OR-Tools search strategies in worker processes and keep the best"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        strategies: Optional[List[Tuple[str, str]]] = None,
+    ):
+        self.max_workers = max(1, min(max_workers or settings.PORTFOLIO_WORKERS, os.cpu_count() or 1))
+        self.strategies = list(strategies or DEFAULT_STRATEGIES)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._available: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        # Probed on first use rather than at import so worker startup stays cheap
+        if self._available is None:
+            self._available = self._check_ortools()
+        return self._available
+
+    @available.setter
+    def available(self, value: bool):
+        self._available = value
+
+    def _check_ortools(self) -> bool:
+        try:
+            from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+            return True
+        except ImportError:
+            logger.warning("OR-Tools not available, portfolio solving disabled")
+            return False
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Spawned (not forked) workers: forking a threaded server process is unsafe.
+        # The pool is kept warm so only the first solve pays the startup cost.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def shutdown(self):
+        """Stop the worker pool (it is recreated on the next solve)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def solve(
+        self,
+        distances: List[List[float]],
+        vehicles: int = 1,
+        depot_index: int = 0,
+        time_limit_seconds: float = 2,
+        tag: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Solve with every strategy in parallel under one deadline
+
+        Args:
+            distances: Square cost matrix (metres)
+            vehicles: Number of vehicles
+            depot_index: Start/end node of every vehicle
+            time_limit_seconds: Shared wall-clock budget for the whole portfolio
+            tag: Optional label (e.g. customer id) included in the winner log line
+
+        Returns:
+            dict with routes, objective, strategy and per-strategy objectives,
+            or None if no strategy produced a solution
+        """
+        if not self.available:
+            return None
+        if hasattr(distances, "astype"):  # NumPy array, e.g. from the shared matrix store
+            matrix = distances.astype("int64").tolist()
+        else:
+            matrix = [[int(d) for d in row] for row in distances]
+        strategies = self.strategies[:self.max_workers]
+        deadline = time.time() + max(0.1, time_limit_seconds)
+        try:
+            executor = self._get_executor()
+            futures = {
+                executor.submit(_solve_strategy, matrix, vehicles, depot_index, first, meta, deadline): (first, meta)
+                for first, meta in strategies
+            }
+        except Exception as e:
+            logger.error(f"Portfolio submit failed: {str(e)}")
+            self.shutdown()
+            return None
+
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.time()) + RESULT_GRACE_SECONDS)
+        for f in not_done:
+            f.cancel()
+
+        best = None
+        objectives: Dict[str, int] = {}
+        for f in done:
+            first, meta = futures[f]
+            label = f"{first}+{meta}"
+            try:
+                res = f.result()
+            except Exception as e:
+                logger.warning(f"Portfolio strategy {label} failed: {str(e)}")
+                continue
+            if res is None:
+                continue
+            objectives[label] = res["objective"]
+            if best is None or res["objective"] < best["objective"]:
+                best = dict(res, strategy=label)
+
+        if best is None:
+            logger.warning("Portfolio produced no solution")
+            return None
+        best["objectives"] = objectives
+        logger.info(
+            f"Portfolio winner{f' [{tag}]' if tag else ''}: {best['strategy']} "
+            f"objective={best['objective']} n={len(matrix)} vehicles={vehicles} "
+            f"finished={len(objectives)}/{len(strategies)}"
+        )
+        return best
+
+portfolio_solver = PortfolioSolver()
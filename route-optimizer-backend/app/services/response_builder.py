@@ -0,0 +1,140 @@
+from app.models.optimization_result import OptimizationResponse
+from app.services.distance_calculator import DistanceCalculator
+from datetime import datetime
+from typing import Any, Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.models.stop_set import StopSet
+
+def leg_distances_km(coords, route: List[int]):
+    """Haversine km of each consecutive leg of `route`, in one vectorised pass"""
+    import numpy as np
+    lat, lng = np.radians(coords[route]).T
+    dlat, dlng = np.diff(lat), np.diff(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlng / 2) ** 2
+    return DistanceCalculator.EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def savings_metrics(total_dist: float) -> Dict[str, float]:
+    """OptimizationMetrics fields, as a dict"""
+    # Worst case = 30% worse than optimal
+    worst_case = total_dist * 1.3
+    saved_km = worst_case - total_dist
+    saved_cost = saved_km * 12
+
+    return {
+        "distance_saved_km": max(0, saved_km),
+        "distance_saved_percent": max(0, (saved_km/worst_case*100)) if worst_case > 0 else 0,
+        "cost_saved_inr": max(0, saved_cost),
+        "cost_saved_percent": max(0, (saved_cost/(worst_case*12)*100)) if worst_case > 0 else 0,
+        "time_saved_min": max(0, saved_km/30*60),
+    }
+
+def build_optimization_payload(
+    request_id: str,
+    stops: "StopSet",
+    opt_route: List[int],
+    total_dist: float,
+    comp_time: int
+) -> Dict[str, Any]:
+    """The /api/optimize response as plain dicts, shaped like OptimizationResponse
+
+    Trusted fast path: every value is produced here from already validated
+    stops, so no model is built or validated. Serialize with ORJSONResponse.
+    """
+    legs = leg_distances_km(stops.coords, opt_route)
+    leg_times = legs / 30 * 60
+    cum_dists = legs.cumsum().tolist()
+    cum_times = leg_times.cumsum().tolist()
+    legs, leg_times = legs.tolist(), leg_times.tolist()
+    ids = stops.ids.tolist()
+    coords = stops.coords.tolist()
+    names, streets, cities = stops.names, stops.streets, stops.cities
+
+    route_stops = [
+        {
+            "sequence": idx,
+            "address_id": ids[addr_idx],
+            "address_name": names[addr_idx],
+            "street": streets[addr_idx],
+            "city": cities[addr_idx],
+            "latitude": coords[addr_idx][0],
+            "longitude": coords[addr_idx][1],
+            "distance_from_previous_km": legs[idx],
+            "time_from_previous_min": leg_times[idx],
+            "cumulative_distance_km": cum_dists[idx],
+            "cumulative_time_min": cum_times[idx],
+        }
+        for idx, addr_idx in enumerate(opt_route[:-1])
+    ]
+    cum_time = cum_times[-1] if cum_times else 0
+
+    metrics = savings_metrics(total_dist)
+    now = datetime.utcnow()
+    route = {
+        "route_id": request_id,
+        "stops": route_stops,
+        "total_distance_km": total_dist,
+        "total_time_min": cum_time,
+        "total_cost_inr": total_dist * 12,
+        "optimization_algorithm": "or-tools",
+        "computation_time_ms": comp_time,
+        "created_at": now,
+    }
+
+    return {
+        "request_id": request_id,
+        "status": "success",
+        "route": route,
+        "metrics": metrics,
+        "error_message": None,
+        "timestamp": now,
+        "computation_time_ms": comp_time,
+    }
+
+def build_columnar_payload(
+    request_id: str,
+    stops: "StopSet",
+    opt_route: List[int],
+    total_dist: float,
+    comp_time: int
+) -> Dict[str, Any]:
+    """The optimize result as parallel arrays, one entry per visited stop
+
+    Row i describes the i-th stop of the route (depot first, return leg not
+    repeated), with the same per-stop values as RouteStop. ``positions`` maps
+    rows back to the request's columns.
+    """
+    legs = leg_distances_km(stops.coords, opt_route)
+    leg_times = legs / 30 * 60
+    order = opt_route[:-1]
+    cum_times = leg_times.cumsum()
+    return {
+        "request_id": request_id,
+        "status": "success",
+        "positions": stops.source_index[order].tolist(),
+        "ids": stops.ids[order].tolist(),
+        "latitudes": stops.coords[order, 0].tolist(),
+        "longitudes": stops.coords[order, 1].tolist(),
+        "distance_from_previous_km": legs.tolist(),
+        "time_from_previous_min": leg_times.tolist(),
+        "cumulative_distance_km": legs.cumsum().tolist(),
+        "cumulative_time_min": cum_times.tolist(),
+        "total_distance_km": total_dist,
+        "total_time_min": float(cum_times[-1]) if len(cum_times) else 0,
+        "total_cost_inr": total_dist * 12,
+        "metrics": savings_metrics(total_dist),
+        "timestamp": datetime.utcnow().isoformat(),
+        "computation_time_ms": comp_time,
+    }
+
+def build_optimization_response(
+    request_id: str,
+    stops: "StopSet",
+    opt_route: List[int],
+    total_dist: float,
+    comp_time: int
+) -> OptimizationResponse:
+    """Turn a solved route into the validated /api/optimize response model"""
+    return OptimizationResponse.model_validate(
+        build_optimization_payload(request_id, stops, opt_route, total_dist, comp_time)
+    )
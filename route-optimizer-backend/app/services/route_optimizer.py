@@ -1,31 +1,59 @@
 from app.models.address import AddressWithCoordinates
 from app.services.distance_calculator import DistanceCalculator
-from typing import List, Tuple
+from app.services.portfolio_solver import portfolio_solver
+from app.services.solver_telemetry import SolveTelemetry
+from app.config import settings
+from app.utils.metrics import SOLVER_QUEUE_DEPTH
+from app.utils.tracing import stage
+from typing import List, Tuple, Optional, Union, TYPE_CHECKING
 import logging
 import time
 from itertools import permutations
 
+if TYPE_CHECKING:
+    from app.models.stop_set import StopSet
+
 logger = logging.getLogger(__name__)
 
+Stops = Union[List[AddressWithCoordinates], "StopSet"]
+
+def _coords_of(addresses: Stops) -> List[Tuple[float, float]]:
+    """(lat, lng) per stop, from a StopSet's coordinate array or a list of address models"""
+    if hasattr(addresses, "coord_tuples"):
+        return addresses.coord_tuples()
+    return [(a.latitude, a.longitude) for a in addresses]
+
 class RouteOptimizer:
     """Optimize routes using nearest neighbor algorithm with OR-Tools fallback"""
     
-    def __init__(self, timeout_seconds: int = 30):
+    def __init__(self, timeout_seconds: int = 30, use_portfolio: Optional[bool] = None):
         self.timeout_seconds = timeout_seconds
+        self.use_portfolio = settings.PORTFOLIO_ENABLED if use_portfolio is None else use_portfolio
         self.distance_calc = DistanceCalculator()
-        self._ortools_available = self._check_ortools()
+        self._ortools_checked: Optional[bool] = None
+    
+    @property
+    def _ortools_available(self) -> bool:
+        # Probed on first use rather than at import so worker startup stays cheap
+        if self._ortools_checked is None:
+            self._ortools_checked = self._check_ortools()
+        return self._ortools_checked
+    
+    @_ortools_available.setter
+    def _ortools_available(self, value: bool):
+        self._ortools_checked = value
     
     def _check_ortools(self) -> bool:
         """Check if OR-Tools routing is available"""
         try:
-            from ortools.routing import routing_enums_pb2, routing_index_manager, routing_model
+            from ortools.constraint_solver import pywrapcp, routing_enums_pb2
             return True
         except ImportError:
             logger.warning("OR-Tools routing not available, using nearest neighbor algorithm")
             return False
     
     def _nearest_neighbor_route(
-        self, addresses: List[AddressWithCoordinates], depot_index: int = 0
+        self, addresses: Stops, depot_index: int = 0
     ) -> List[int]:
         """Simple nearest neighbor algorithm for route optimization"""
         n = len(addresses)
@@ -34,7 +62,7 @@ class RouteOptimizer:
         current = depot_index
         unvisited.remove(depot_index)
         
-        coords = [(a.latitude, a.longitude) for a in addresses]
+        coords = _coords_of(addresses)
         
         while unvisited:
             # Find nearest unvisited
@@ -55,47 +83,52 @@ class RouteOptimizer:
     
     def _ortools_route(
         self,
-        addresses: List[AddressWithCoordinates],
-        depot_index: int = 0
+        addresses: Stops,
+        depot_index: int = 0,
+        telemetry: Optional[SolveTelemetry] = None
     ) -> List[int]:
         """Optimize using Google OR-Tools"""
         try:
-            from ortools.routing import routing_enums_pb2, routing_index_manager, routing_model
+            from ortools.constraint_solver import pywrapcp, routing_enums_pb2
         except ImportError:
             raise ImportError("OR-Tools routing not available")
         
-        coords = [(a.latitude, a.longitude) for a in addresses]
+        coords = _coords_of(addresses)
         
         # Create manager
-        manager = routing_index_manager.RoutingIndexManager(
+        manager = pywrapcp.RoutingIndexManager(
             len(coords), 1, depot_index
         )
         
         # Create model
-        routing = routing_model.RoutingModel(manager)
+        routing = pywrapcp.RoutingModel(manager)
+        
+        # Distances in meters, computed once: the callback runs per arc evaluation
+        distances = [
+            [int(self.distance_calc.haversine_distance(c1[0], c1[1], c2[0], c2[1]) * 1000) for c2 in coords]
+            for c1 in coords
+        ]
         
         # Distance callback
         def distance_callback(from_idx, to_idx):
-            from_node = manager.IndexToNode(from_idx)
-            to_node = manager.IndexToNode(to_idx)
-            dist_km = self.distance_calc.haversine_distance(
-                coords[from_node][0], coords[from_node][1],
-                coords[to_node][0], coords[to_node][1]
-            )
-            return int(dist_km * 1000)  # meters
+            return distances[manager.IndexToNode(from_idx)][manager.IndexToNode(to_idx)]
         
         callback_idx = routing.RegisterTransitCallback(distance_callback)
         routing.SetArcCostEvaluatorOfAllVehicles(callback_idx)
         
         # Search parameters
-        params = routing.DefaultRoutingSearchParameters()
+        params = pywrapcp.DefaultRoutingSearchParameters()
         params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
         params.time_limit.seconds = self.timeout_seconds
         
+        if telemetry is not None:
+            telemetry.strategy = "PATH_CHEAPEST_ARC"
+            telemetry.attach(routing)
+        
         # Solve
-        assignment = routing.SolveFromAssignmentWithParameters(
-            initial_routes=None, parameters=params
-        )
+        assignment = routing.SolveWithParameters(params)
+        if telemetry is not None:
+            telemetry.finish(routing, self.timeout_seconds)
         
         if not assignment:
             raise Exception("Optimization failed")
@@ -110,13 +143,56 @@ class RouteOptimizer:
         
         return route
     
+    def _portfolio_route(
+        self,
+        addresses: Stops,
+        depot_index: int = 0,
+        telemetry: Optional[SolveTelemetry] = None,
+        tag: Optional[str] = None
+    ) -> List[int]:
+        """Optimize by racing several OR-Tools strategies in parallel"""
+        coords = _coords_of(addresses)
+        
+        def build_matrix():
+            return [
+                [
+                    int(self.distance_calc.haversine_distance(c1[0], c1[1], c2[0], c2[1]) * 1000)
+                    for c2 in coords
+                ]
+                for c1 in coords
+            ]
+        
+        with stage("matrix"):
+            if settings.MATRIX_STORE_ENABLED:
+                # Imported here: pulls in NumPy, which worker startup avoids
+                from app.services.matrix_store import matrix_store, matrix_fingerprint
+                import numpy as np
+                matrix = matrix_store.get_or_build(
+                    matrix_fingerprint("haversine_m", coords),
+                    lambda: np.array(build_matrix(), dtype=np.int64)
+                )
+            else:
+                matrix = build_matrix()
+        time_limit = min(self.timeout_seconds, settings.PORTFOLIO_TIME_LIMIT)
+        outcome = portfolio_solver.solve(matrix, 1, depot_index, time_limit, tag=tag)
+        if not outcome:
+            raise Exception("Portfolio optimization failed")
+        if telemetry is not None and outcome.get("telemetry"):
+            telemetry.load(outcome["telemetry"])
+        return outcome["routes"][0]
+    
     def optimize(
         self,
-        addresses: List[AddressWithCoordinates],
-        depot_index: int = 0
+        addresses: Stops,
+        depot_index: int = 0,
+        telemetry: Optional[SolveTelemetry] = None,
+        tag: Optional[str] = None
     ) -> Tuple[List[int], float, int]:
         """Optimize route order
         
+        Pass a SolveTelemetry to record the solver's objective-over-time trace.
+        `tag` (e.g. the request id) labels the portfolio's log lines.
+        
         Returns: (route, distance_km, computation_time_ms)
         """
         if len(addresses) < 2:
@@ -124,22 +200,38 @@ class RouteOptimizer:
         
         start = time.time()
         
-        coords = [(a.latitude, a.longitude) for a in addresses]
+        coords = _coords_of(addresses)
         
         # Try OR-Tools first, fallback to nearest neighbor
+        SOLVER_QUEUE_DEPTH.inc()
         try:
-            if self._ortools_available:
-                route = self._ortools_route(addresses, depot_index)
-            else:
-                route = self._nearest_neighbor_route(addresses, depot_index)
+            with stage("solve"):
+                if self.use_portfolio and portfolio_solver.available:
+                    route = self._portfolio_route(addresses, depot_index, telemetry, tag)
+                elif self._ortools_available:
+                    route = self._ortools_route(addresses, depot_index, telemetry)
+                else:
+                    route = self._nearest_neighbor_route(addresses, depot_index)
         except Exception as e:
             logger.warning(f"Primary optimization failed, using nearest neighbor: {str(e)}")
-            route = self._nearest_neighbor_route(addresses, depot_index)
+            with stage("solve.fallback"):
+                route = self._nearest_neighbor_route(addresses, depot_index)
+            if telemetry is not None:
+                telemetry.load({"strategy": "nearest_neighbor"})
+        finally:
+            SOLVER_QUEUE_DEPTH.dec()
         
         # Calculate distance
-        total_dist = self.distance_calc.calculate_route_distance(
-            [coords[i] for i in route]
-        )
+        with stage("route_cost"):
+            total_dist = self.distance_calc.calculate_route_distance(
+                [coords[i] for i in route]
+            )
+        
+        if telemetry is not None and telemetry.stop_reason is None:
+            # Nearest neighbour has no search trace: one solution, no improvements
+            telemetry.strategy = telemetry.strategy or "nearest_neighbor"
+            telemetry.record_solution(int(total_dist * 1000))
+            telemetry.finish(reason="heuristic")
         
         time_ms = int((time.time() - start) * 1000)
         
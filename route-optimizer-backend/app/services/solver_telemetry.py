@@ -0,0 +1,119 @@
+import time
+from typing import List, Optional, Dict, Any
+
+# Cap on stored improvement points; a long GLS run can improve thousands of times
+MAX_IMPROVEMENTS = 64
+
+class SolveTelemetry:
+    """Objective-over-time trace of one solver run
+
+    Attach to an OR-Tools model with `attach(routing)` before solving and call
+    `finish(routing, time_limit_seconds)` afterwards. `to_dict()` is the
+    compact form stored in optimization_history.solver_trace.
+    """
+
+    def __init__(self, strategy: Optional[str] = None):
+        self.strategy = strategy
+        self.start = time.perf_counter()
+        self.first_solution_ms: Optional[float] = None
+        self.improvements: List[List[float]] = []
+        self.solutions = 0
+        self.stop_reason: Optional[str] = None
+        self.wall_ms: Optional[float] = None
+        self.branches: Optional[int] = None
+        self.failures: Optional[int] = None
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+    def record_solution(self, objective: float):
+        elapsed = self._elapsed_ms()
+        self.solutions += 1
+        if self.first_solution_ms is None:
+            self.first_solution_ms = elapsed
+        if not self.improvements or objective < self.improvements[-1][1]:
+            self.improvements.append([elapsed, objective])
+
+    def attach(self, routing):
+        """Register an at-solution callback on an OR-Tools RoutingModel"""
+        # CostVar() must be looked up per call: the model replaces it when it closes
+        routing.AddAtSolutionCallback(lambda: self.record_solution(routing.CostVar().Max()))
+
+    def finish(self, routing=None, time_limit_seconds: Optional[float] = None, reason: Optional[str] = None):
+        """Freeze wall time and derive why the search stopped"""
+        self.wall_ms = self._elapsed_ms()
+        if reason:
+            self.stop_reason = reason
+            return self
+        if routing is None:
+            return self
+        solver = routing.solver()
+        self.branches = solver.Branches()
+        self.failures = solver.Failures()
+        status = routing.status()
+        names = {
+            getattr(type(routing), n): n[len("ROUTING_"):].lower()
+            for n in dir(type(routing)) if n.startswith("ROUTING_")
+        }
+        name = names.get(status, str(status))
+        if name == "success" and time_limit_seconds and self.wall_ms >= time_limit_seconds * 1000 * 0.95:
+            self.stop_reason = "time_limit"
+        elif name == "success":
+            self.stop_reason = "local_optimum"
+        else:
+            self.stop_reason = name
+        return self
+
+    @property
+    def first_objective(self) -> Optional[float]:
+        return self.improvements[0][1] if self.improvements else None
+
+    @property
+    def final_objective(self) -> Optional[float]:
+        return self.improvements[-1][1] if self.improvements else None
+
+    def improvement_percent(self) -> float:
+        """How much the search improved on its first solution"""
+        first, final = self.first_objective, self.final_objective
+        if not first:
+            return 0.0
+        return round((first - final) / first * 100, 3)
+
+    def _sampled_improvements(self) -> List[List[float]]:
+        points = self.improvements
+        if len(points) <= MAX_IMPROVEMENTS:
+            return points
+        step = (len(points) - 1) / (MAX_IMPROVEMENTS - 1)
+        return [points[round(i * step)] for i in range(MAX_IMPROVEMENTS)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "v": 1,
+            "first_ms": self.first_solution_ms,
+            "wall_ms": self.wall_ms,
+            "solutions": self.solutions,
+            "stop": self.stop_reason,
+            "improvements": self._sampled_improvements(),
+        }
+        if self.strategy:
+            data["strategy"] = self.strategy
+        if self.branches is not None:
+            data["branches"] = self.branches
+            data["failures"] = self.failures
+        return data
+
+    def load(self, data: Dict[str, Any]) -> "SolveTelemetry":
+        """Overwrite this trace with a stored/transferred one (e.g. from a portfolio worker)"""
+        self.strategy = data.get("strategy")
+        self.first_solution_ms = data.get("first_ms")
+        self.wall_ms = data.get("wall_ms")
+        self.solutions = data.get("solutions", 0)
+        self.stop_reason = data.get("stop")
+        self.improvements = [list(p) for p in data.get("improvements", [])]
+        self.branches = data.get("branches")
+        self.failures = data.get("failures")
+        return self
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SolveTelemetry":
+        return cls().load(data)
@@ -0,0 +1,52 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Optional, Dict
+
+logger = logging.getLogger(__name__)
+
+class LoopLagMonitor:
+    """Measure event-loop lag by how late a periodic sleep wakes up
+
+    Any synchronous work on the loop (blocking I/O, CPU-bound solving inside
+    `async def`) shows up directly as lag for every other request.
+    """
+
+    def __init__(self, interval_seconds: float = 0.1, window: int = 600):
+        self.interval = interval_seconds
+        self.samples = deque(maxlen=window)
+        self.max_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.interval) * 1000)
+            self.samples.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def start(self):
+        """Start sampling on the running loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        """Lag over the sample window (last `window` intervals)"""
+        samples = sorted(self.samples)
+        if not samples:
+            return {"samples": 0, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "samples": len(samples),
+            "mean_ms": round(sum(samples) / len(samples), 3),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+            "max_ms": round(self.max_lag_ms, 3),
+        }
+
+loop_monitor = LoopLagMonitor()
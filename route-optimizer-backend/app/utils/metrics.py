@@ -0,0 +1,219 @@
+"""Minimal in-process Prometheus metrics (text exposition format 0.0.4).
+
+Kept dependency-free on purpose: a handful of counters, gauges and histograms
+rendered by ``GET /metrics``. Each worker process exposes its own values.
+"""
+import threading
+from typing import Dict, Tuple, List, Optional, Callable
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: LabelValues, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, description, labelnames=()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, description, labelnames=(), collect: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = dict(self._values)
+        if self._collect:
+            items.update(self._collect())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in sorted(items.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += 1
+            row[-1] += value
+
+    def count(self, **labels) -> float:
+        row = self._values.get(self._key(labels))
+        return row[-2] if row else 0.0
+
+    def sum(self, **labels) -> float:
+        row = self._values.get(self._key(labels))
+        return row[-1] if row else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for key, row in items:
+            for bound, count in zip(self.buckets, row):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, {'le': _fmt(bound)})} {_fmt(count)}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, {'le': '+Inf'})} {_fmt(row[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_fmt(row[-2])}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(row[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "route_optimizer_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+))
+STAGE_SECONDS = registry.register(Histogram(
+    "route_optimizer_stage_duration_seconds", "Time spent per pipeline stage", ("stage",)
+))
+CACHE_REQUESTS = registry.register(Counter(
+    "route_optimizer_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+))
+
+
+def _cache_hit_ratios() -> Dict[LabelValues, float]:
+    # One snapshot under the counter's lock: a cache's first inc() may land mid-scrape
+    with CACHE_REQUESTS._lock:
+        counts = dict(CACHE_REQUESTS._values)
+    ratios = {}
+    for cache in {cache for cache, _ in counts}:
+        hits = counts.get((cache, "hit"), 0.0)
+        total = hits + counts.get((cache, "miss"), 0.0)
+        ratios[(cache,)] = round(hits / total, 6) if total else 0.0
+    return ratios
+
+
+CACHE_HIT_RATIO = registry.register(Gauge(
+    "route_optimizer_cache_hit_ratio", "Hit ratio per cache since process start", ("cache",), collect=_cache_hit_ratios
+))
+GEOCODE_RATE_LIMIT_WAIT_SECONDS = registry.register(Histogram(
+    "route_optimizer_geocode_rate_limit_wait_seconds", "Time spent waiting on the geocoder rate limit",
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+))
+SOLVER_QUEUE_DEPTH = registry.register(Gauge(
+    "route_optimizer_solver_queue_depth", "Solves waiting or running in this worker"
+))
+
+# Connection pools reported by DB_POOL_CONNECTIONS, by engine name (see app.database.connection)
+_db_pools: Dict[str, object] = {}
+
+
+def register_pool(name: str, pool):
+    _db_pools[name] = pool
+
+
+def _db_pool_stats() -> Dict[LabelValues, float]:
+    stats = {}
+    for name, pool in list(_db_pools.items()):
+        if not hasattr(pool, "checkedout"):
+            continue  # StaticPool/NullPool keep no counts
+        stats[(name, "size")] = pool.size()
+        stats[(name, "checked_out")] = pool.checkedout()
+        stats[(name, "checked_in")] = pool.checkedin()
+        stats[(name, "overflow")] = max(pool.overflow(), 0)  # negative while below pool_size
+    return stats
+
+
+DB_POOL_CONNECTIONS = registry.register(Gauge(
+    "route_optimizer_db_pool_connections", "Database connections per engine and state", ("engine", "state"),
+    collect=_db_pool_stats
+))
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
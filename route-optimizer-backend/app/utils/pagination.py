@@ -0,0 +1,31 @@
+"""Opaque keyset-pagination cursors.
+
+A cursor encodes the sort key of the last row of a page (for route history,
+``(optimization_date, id)``) as URL-safe base64 JSON. Clients pass it back
+unchanged to get the next page. The next query seeks straight past that key
+through the index, so page N costs the same as page 1, unlike OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(when: datetime, row_id: int) -> str:
+    raw = json.dumps([when.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        when, row_id = json.loads(raw)
+        if not isinstance(row_id, int):
+            raise TypeError(row_id)
+        return datetime.fromisoformat(when), row_id
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,267 @@
+"""Opt-in profiling of single requests.
+
+A request to a profiled path carrying ``X-Profile: 1`` and a valid
+``X-Admin-Key`` runs under a stack-sampling thread and tracemalloc. The
+result (collapsed stacks for flamegraph.pl / speedscope plus the top
+allocation sites) is kept in ``profile_store`` under the id returned in the
+``X-Profile-Id`` response header: the client's ``X-Request-Id`` when it sent
+one, else the handler's ``request_id`` (see ``request_id``). Profiles are written to ``PROFILE_DIR`` (by default a
+directory in the temp dir), so any worker on the host can serve them.
+
+The middleware is only installed when ``ADMIN_API_KEY`` is set, so normal
+deployments pay nothing. Sampling covers every busy thread in the process,
+so concurrent requests show up in the profile too.
+"""
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILED_PATHS = {"/api/optimize", "/api/upload/csv"}
+TOP_ALLOCATIONS = 25
+
+# Leaf frames of threads that are parked, not working
+_IDLE_LEAVES = {
+    ("selectors.py", "select"), ("selectors.py", "poll"),
+    ("threading.py", "wait"), ("queue.py", "get"),
+}
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """Sample the stacks of all busy threads every `interval` seconds"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: `frame;frame;frame count` per line"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, limit: int = TOP_ALLOCATIONS) -> List[Dict[str, Any]]:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    return [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+class RequestProfiler:
+    """Sampling profiler + tracemalloc around one request"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.sampler = StackSampler(interval or settings.PROFILE_SAMPLE_INTERVAL)
+        self._owns_tracemalloc = False
+        self.start_time = 0.0
+        self.result: Dict[str, Any] = {}
+
+    def start(self):
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.start_time = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self) -> Dict[str, Any]:
+        self.sampler.stop()
+        duration_ms = (time.perf_counter() - self.start_time) * 1000
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        self.result = {
+            "duration_ms": round(duration_ms, 2),
+            "interval_ms": self.sampler.interval * 1000,
+            "samples": self.sampler.samples,
+            "collapsed": self.sampler.collapsed(),
+            "peak_traced_kb": round(peak / 1024, 1),
+            "allocations": top_allocations(snapshot),
+        }
+        return self.result
+
+
+def default_profile_dir() -> str:
+    return os.path.join(tempfile.gettempdir(), "route-optimizer-profiles")
+
+
+class ProfileStore:
+    """Most recent profiles in memory, optionally mirrored to a directory shared by all workers"""
+
+    def __init__(self, max_items: int = 50, directory: Optional[str] = None):
+        self.max_items = max_items
+        self.directory = directory
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, profile: Dict[str, Any]):
+        with self._lock:
+            self._items[profile_id] = profile
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+                    json.dump(profile, f)
+                with open(os.path.join(self.directory, f"{profile_id}.collapsed"), "w") as f:
+                    f.write(profile["collapsed"])
+                self._prune()
+            except OSError as e:
+                logger.warning(f"Could not write profile {profile_id}: {str(e)}")
+
+    def _prune(self):
+        """Keep the newest max_items profiles on disk (across all workers)"""
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+        if len(paths) <= self.max_items:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_items]:
+            for stale in (path, path[:-len(".json")] + ".collapsed"):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass  # another worker pruned it first
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not _SAFE_ID.match(profile_id):
+            return None
+        with self._lock:
+            if profile_id in self._items:
+                return self._items[profile_id]
+        if self.directory:
+            path = os.path.join(self.directory, f"{profile_id}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    return json.load(f)
+        return None
+
+
+profile_store = ProfileStore(settings.PROFILE_MAX_STORED, settings.PROFILE_DIR or default_profile_dir())
+
+# tracemalloc and the sampler are process-wide: profile one request at a time
+_profiling = threading.Lock()
+
+
+def is_admin(key: Optional[str]) -> bool:
+    return bool(settings.ADMIN_API_KEY and key) and hmac.compare_digest(key, settings.ADMIN_API_KEY)
+
+
+def request_id(request: Request) -> str:
+    """This request's server-generated id (a uuid), e.g. the request_id in /api/optimize's body
+
+    Stored on request.state, so the profiler and the handler agree on it. It
+    keys optimization_history rows, so it never comes from the client.
+    """
+    rid = getattr(request.state, "request_id", None)
+    if rid is None:
+        rid = request.state.request_id = str(uuid.uuid4())
+    return rid
+
+
+def client_request_id(request: Request) -> Optional[str]:
+    """The client's X-Request-Id if it is a safe name: for log correlation and profile names only"""
+    header = request.headers.get("x-request-id", "")
+    return header if _SAFE_ID.match(header) else None
+
+
+async def profiling_middleware(request: Request, call_next):
+    """Profile requests that ask for it with X-Profile + X-Admin-Key"""
+    if "x-profile" not in request.headers or request.url.path.rstrip("/") not in PROFILED_PATHS:
+        return await call_next(request)
+    if not is_admin(request.headers.get("x-admin-key")):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires a valid X-Admin-Key"})
+    if not _profiling.acquire(blocking=False):
+        response = await call_next(request)
+        response.headers["X-Profile-Status"] = "busy"
+        return response
+
+    profile_id = client_request_id(request) or request_id(request)
+    profiler = RequestProfiler()
+    try:
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            profile = profiler.stop()
+    finally:
+        _profiling.release()
+
+    profile.update({
+        "profile_id": profile_id,
+        "request_id": request_id(request),
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        "created_at": datetime.utcnow().isoformat(),
+    })
+    profile_store.save(profile_id, profile)
+    logger.info(
+        f"Profiled {request.method} {request.url.path} as {profile_id}: "
+        f"{profile['duration_ms']:.0f}ms, {profile['samples']} samples"
+    )
+    response.headers["X-Profile-Id"] = profile_id
+    return response
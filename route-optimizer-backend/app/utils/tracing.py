@@ -0,0 +1,57 @@
+"""Per-request stage timing.
+
+``with stage("geocode"):`` times a block, adds it to the current request's
+trace (emitted as a ``Server-Timing`` header by the middleware in main.py)
+and to the ``route_optimizer_stage_duration_seconds`` histogram. Outside a
+request (scripts, tests) only the histogram is updated.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Tuple, Optional
+from app.utils.metrics import STAGE_SECONDS
+
+
+class RequestTrace:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, duration_ms: float):
+        self.stages.append((name, duration_ms))
+
+    def server_timing(self) -> str:
+        """Server-Timing header value; repeated stages (e.g. per-vehicle) are summed"""
+        totals = {}
+        for name, ms in self.stages:
+            totals[name] = totals.get(name, 0.0) + ms
+        parts = [f"{name};dur={ms:.2f}" for name, ms in totals.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def begin_trace() -> RequestTrace:
+    trace = RequestTrace()
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(name, elapsed * 1000)
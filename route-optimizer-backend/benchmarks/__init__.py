@@ -0,0 +1,4 @@
+"""Benchmark suite for the route optimizers.
+
+Run with ``python -m benchmarks --help`` from the backend directory.
+"""
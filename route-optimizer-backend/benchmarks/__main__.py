@@ -0,0 +1,94 @@
+"""Command line entry point: ``python -m benchmarks``
+
+Examples:
+    python -m benchmarks --sizes 10,100 --output bench.json
+    python -m benchmarks --full --engines engine.cluster,route_optimizer.nearest_neighbor
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from benchmarks.instances import DISTRIBUTIONS, SIZES, VEHICLE_COUNTS, DEFAULT_SEED, corpus
+from benchmarks.runner import run_benchmarks
+
+BEST_KNOWN_PATH = Path(__file__).parent / "best_known.json"
+DEFAULT_SIZES = [n for n in SIZES if n <= 1000]
+
+
+def _csv(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        )
+        return out.stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _print_row(row):
+    if "skipped" in row:
+        return
+    limit = f"{row['time_limit_s']}s" if row["time_limit_s"] else "-"
+    status = row.get("error") or f"{row['wall_ms']:>10.1f} ms  obj={row['objective_m']:.0f} m"
+    print(f"{row['engine']:<34} {row['instance']:<28} {limit:>4}  {status}", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the route optimizers")
+    parser.add_argument("--distributions", type=_csv(str), default=DISTRIBUTIONS)
+    parser.add_argument("--sizes", type=_csv(int), default=DEFAULT_SIZES)
+    parser.add_argument("--vehicles", type=_csv(int), default=VEHICLE_COUNTS)
+    parser.add_argument("--full", action="store_true", help="Every size up to 5000 stops")
+    parser.add_argument("--engines", type=_csv(str), default=None, help="Comma separated engine paths")
+    parser.add_argument("--time-limits", type=_csv(int), default=[1, 2, 5])
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--best-known", type=Path, default=BEST_KNOWN_PATH)
+    parser.add_argument("--update-best-known", action="store_true")
+    parser.add_argument("--output", type=Path, default=None, help="JSON output path (default stdout)")
+    args = parser.parse_args(argv)
+
+    sizes = SIZES if args.full else args.sizes
+    instances = corpus(args.distributions, sizes, args.vehicles, args.seed)
+    best_known = json.loads(args.best_known.read_text()) if args.best_known.exists() else {}
+
+    report = run_benchmarks(
+        instances,
+        engines=args.engines,
+        time_limits=args.time_limits,
+        repeats=args.repeats,
+        measure_memory=not args.no_memory,
+        best_known=best_known,
+        progress=_print_row if args.output else None,
+    )
+    report["meta"] = {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "instances": len(instances),
+    }
+
+    if args.update_best_known:
+        args.best_known.write_text(json.dumps(report["best_known"], indent=2, sort_keys=True) + "\n")
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(payload)
+        print(f"Wrote {len(report['results'])} results to {args.output}")
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Seeded benchmark instances.
+
+Every instance is fully determined by (distribution, stops, vehicles, seed), so
+the same corpus is regenerated bit-for-bit on every machine and commit.
+"""
+import random
+from typing import List, Tuple, Dict, Any, Optional
+
+DISTRIBUTIONS = ["uniform", "clustered", "grid", "india"]
+SIZES = [10, 50, 100, 500, 1000, 2000, 5000]
+VEHICLE_COUNTS = [1, 5]
+DEFAULT_SEED = 20240101
+
+# Delhi NCR bounding box (~55 x 45 km), used by the synthetic distributions
+BBOX = (28.40, 76.84, 28.88, 77.35)
+
+# Delivery hubs with a rough share of order volume, for the India distribution.
+# Stops are drawn around a hub with a city-sized spread (degrees).
+INDIA_HUBS = [
+    ("Delhi", 28.6139, 77.2090, 0.30, 0.12),
+    ("Mumbai", 19.0760, 72.8777, 0.22, 0.08),
+    ("Bengaluru", 12.9716, 77.5946, 0.18, 0.09),
+    ("Hyderabad", 17.3850, 78.4867, 0.10, 0.09),
+    ("Chennai", 13.0827, 80.2707, 0.08, 0.07),
+    ("Pune", 18.5204, 73.8567, 0.07, 0.06),
+    ("Kolkata", 22.5726, 88.3639, 0.05, 0.06),
+]
+
+Coords = List[Tuple[float, float]]
+
+
+def _uniform(rng: random.Random, n: int) -> Coords:
+    min_lat, min_lng, max_lat, max_lng = BBOX
+    return [(rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)) for _ in range(n)]
+
+
+def _clustered(rng: random.Random, n: int) -> Coords:
+    min_lat, min_lng, max_lat, max_lng = BBOX
+    k = max(2, min(12, n // 25))
+    centers = [(rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)) for _ in range(k)]
+    coords = []
+    for _ in range(n):
+        c_lat, c_lng = rng.choice(centers)
+        coords.append((rng.gauss(c_lat, 0.01), rng.gauss(c_lng, 0.01)))
+    return coords
+
+
+def _grid(rng: random.Random, n: int) -> Coords:
+    # Stops sit on a Manhattan-style street grid with ~250 m blocks
+    min_lat, min_lng, max_lat, max_lng = BBOX
+    block = 0.00225
+    rows = int((max_lat - min_lat) / block)
+    cols = int((max_lng - min_lng) / block)
+    coords = []
+    for _ in range(n):
+        r, c = rng.randrange(rows), rng.randrange(cols)
+        offset = rng.random() * block
+        if rng.random() < 0.5:
+            coords.append((min_lat + r * block, min_lng + c * block + offset))
+        else:
+            coords.append((min_lat + r * block + offset, min_lng + c * block))
+    return coords
+
+
+def _india(rng: random.Random, n: int) -> Coords:
+    # One hub per instance (a depot delivers locally), chosen by volume share,
+    # with a dense core and a long suburban tail.
+    weights = [h[3] for h in INDIA_HUBS]
+    _, lat, lng, _, spread = rng.choices(INDIA_HUBS, weights=weights)[0]
+    coords = []
+    for _ in range(n):
+        s = spread * (0.25 if rng.random() < 0.7 else 1.0)
+        coords.append((rng.gauss(lat, s), rng.gauss(lng, s)))
+    return coords
+
+
+GENERATORS = {
+    "uniform": _uniform,
+    "clustered": _clustered,
+    "grid": _grid,
+    "india": _india,
+}
+
+
+def instance_name(distribution: str, stops: int, vehicles: int, seed: int = DEFAULT_SEED) -> str:
+    return f"{distribution}-{stops}-v{vehicles}-s{seed}"
+
+
+def generate_instance(
+    distribution: str, stops: int, vehicles: int = 1, seed: int = DEFAULT_SEED
+) -> Dict[str, Any]:
+    """Build one instance; node 0 is the depot"""
+    if distribution not in GENERATORS:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    # Seed mixes in the shape so instances of different sizes are independent
+    rng = random.Random(f"{seed}:{distribution}:{stops}")
+    coords = [(round(lat, 6), round(lng, 6)) for lat, lng in GENERATORS[distribution](rng, stops)]
+    return {
+        "name": instance_name(distribution, stops, vehicles, seed),
+        "distribution": distribution,
+        "stops": stops,
+        "vehicles": vehicles,
+        "seed": seed,
+        "coords": coords,
+    }
+
+
+def corpus(
+    distributions: Optional[List[str]] = None,
+    sizes: Optional[List[int]] = None,
+    vehicle_counts: Optional[List[int]] = None,
+    seed: int = DEFAULT_SEED,
+) -> List[Dict[str, Any]]:
+    """Full cross product of distributions x sizes x vehicle counts"""
+    return [
+        generate_instance(d, n, v, seed)
+        for d in (distributions or DISTRIBUTIONS)
+        for n in (sizes or SIZES)
+        for v in (vehicle_counts or VEHICLE_COUNTS)
+        if v < n
+    ]
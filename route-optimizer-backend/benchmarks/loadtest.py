@@ -0,0 +1,336 @@
+"""Load generator for the full API: ``python -m benchmarks.loadtest``
+
+Drives /api/optimize, /api/upload/csv and /api/history/* with a weighted mix
+of request kinds and sizes from a fixed number of concurrent clients
+(closed loop), and reports RPS, p50/p95/p99 latency, error rates and the
+server's event-loop lag (sampled from /api/health/loop).
+
+With ``--workers 1,2,4`` it starts the offline Nominatim/OSRM stand-ins and a
+fresh uvicorn server per worker count against a throwaway SQLite database,
+producing a capacity curve. With ``--target URL`` it loads an already
+running server instead.
+
+    python -m benchmarks.loadtest --workers 1,2,4 --concurrency 32 --duration 30
+    python -m benchmarks.loadtest --target http://127.0.0.1:8000 --mix optimize:1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import httpx
+from benchmarks.instances import generate_instance
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "optimize:0.6,upload:0.2,history:0.2"
+DEFAULT_SIZES = "10:0.5,50:0.3,200:0.15,1000:0.05"
+LOADTEST_API_KEY = "loadtest-api-key"
+VARIANTS_PER_SIZE = 4
+
+
+def parse_weights(spec: str, cast=str) -> List[Tuple[Any, float]]:
+    """'a:0.6,b:0.4' -> [('a', 0.6), ('b', 0.4)]"""
+    pairs = []
+    for item in spec.split(","):
+        key, _, weight = item.partition(":")
+        pairs.append((cast(key), float(weight or 1)))
+    return pairs
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Workload:
+    """Seeded request mix; payloads are pre-built so generation cost stays off the clock"""
+
+    def __init__(
+        self,
+        mix: str = DEFAULT_MIX,
+        sizes: str = DEFAULT_SIZES,
+        geocode_fraction: float = 0.0,
+        api_key: str = LOADTEST_API_KEY,
+        seed: int = 0,
+    ):
+        self.mix = parse_weights(mix)
+        self.sizes = parse_weights(sizes, int)
+        self.api_key = api_key
+        self.optimize_payloads: Dict[int, List[bytes]] = {}
+        self.upload_payloads: Dict[int, List[bytes]] = {}
+        for n, _ in self.sizes:
+            opt, csv = [], []
+            for v in range(VARIANTS_PER_SIZE):
+                coords = generate_instance("india", n, seed=seed + v)["coords"]
+                opt.append(json.dumps({"addresses": [
+                    self._address(i, lat, lng, geocode_fraction, seed + v) for i, (lat, lng) in enumerate(coords)
+                ]}).encode())
+                rows = ["id,name,street,city,postal_code,latitude,longitude"]
+                rows += [f"{i},Stop {i},{i} MG Road,Delhi,110001,{lat},{lng}" for i, (lat, lng) in enumerate(coords)]
+                csv.append(("\n".join(rows) + "\n").encode())
+            self.optimize_payloads[n] = opt
+            self.upload_payloads[n] = csv
+
+    @staticmethod
+    def _address(i: int, lat: float, lng: float, geocode_fraction: float, seed: int) -> Dict[str, Any]:
+        addr = {"id": i, "name": f"Stop {i}", "street": f"{i} MG Road", "city": "Delhi"}
+        # Stable per (stop, variant) so repeated payloads hit the geocode cache like real repeat customers
+        if random.Random(f"{seed}:{i}").random() >= geocode_fraction:
+            addr.update(latitude=lat, longitude=lng)
+        return addr
+
+    def next_request(self, rng: random.Random) -> Tuple[str, str, str, Dict[str, Any]]:
+        """(kind, method, path, httpx request kwargs)"""
+        kind = rng.choices([k for k, _ in self.mix], weights=[w for _, w in self.mix])[0]
+        n = rng.choices([s for s, _ in self.sizes], weights=[w for _, w in self.sizes])[0]
+        if kind == "optimize":
+            body = rng.choice(self.optimize_payloads[n])
+            return kind, "POST", "/api/optimize", {
+                "content": body, "headers": {"Content-Type": "application/json"}
+            }
+        if kind == "upload":
+            body = rng.choice(self.upload_payloads[n])
+            return kind, "POST", "/api/upload/csv", {"files": {"file": ("addresses.csv", body, "text/csv")}}
+        if kind == "history":
+            path = rng.choice(["/api/history/routes", "/api/history/analytics"])
+            return kind, "GET", path, {"params": {"api_key": self.api_key}}
+        raise ValueError(f"Unknown request kind: {kind}")
+
+
+def summarize(records: List[Tuple[str, float, Optional[int]]], elapsed: float) -> Dict[str, Any]:
+    """Aggregate (kind, latency ms, status or None) records; 5xx and transport errors count as errors"""
+    def stats(rows):
+        latencies = sorted(r[1] for r in rows)
+        errors = sum(1 for r in rows if r[2] is None or r[2] >= 500)
+        statuses: Dict[str, int] = {}
+        for r in rows:
+            key = str(r[2]) if r[2] is not None else "transport_error"
+            statuses[key] = statuses.get(key, 0) + 1
+        return {
+            "requests": len(rows),
+            "rps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "statuses": statuses,
+        }
+
+    by_kind: Dict[str, list] = {}
+    for r in records:
+        by_kind.setdefault(r[0], []).append(r)
+    return {
+        "duration_s": round(elapsed, 2),
+        "overall": stats(records),
+        "by_kind": {k: stats(v) for k, v in sorted(by_kind.items())},
+    }
+
+
+async def run_load(
+    base_url: str,
+    workload: Workload,
+    concurrency: int = 16,
+    duration: float = 30.0,
+    warmup: float = 2.0,
+    timeout: float = 60.0,
+    seed: int = 0,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict[str, Any]:
+    """Closed-loop load: `concurrency` clients each send back-to-back requests"""
+    records: List[Tuple[str, float, Optional[int]]] = []
+    lag_samples: List[Dict[str, float]] = []
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits, transport=transport) as client:
+        start = time.perf_counter()
+        measure_from = start + warmup
+        deadline = measure_from + duration
+
+        async def worker(worker_id: int):
+            rng = random.Random(f"{seed}:{worker_id}")
+            while time.perf_counter() < deadline:
+                kind, method, path, kwargs = workload.next_request(rng)
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.request(method, path, **kwargs)
+                    status = resp.status_code
+                except httpx.HTTPError:
+                    status = None
+                if t0 >= measure_from:
+                    records.append((kind, (time.perf_counter() - t0) * 1000, status))
+
+        async def lag_probe():
+            while time.perf_counter() < deadline:
+                await asyncio.sleep(0.5)
+                try:
+                    resp = await client.get("/api/health/loop")
+                    if resp.status_code == 200:
+                        lag_samples.append(resp.json()["lag"])
+                except (httpx.HTTPError, ValueError, KeyError):
+                    pass
+
+        await asyncio.gather(lag_probe(), *(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - measure_from
+
+    report = summarize(records, elapsed)
+    report["concurrency"] = concurrency
+    report["event_loop_lag"] = {
+        "probes": len(lag_samples),
+        "mean_ms": round(sum(s["mean_ms"] for s in lag_samples) / len(lag_samples), 3) if lag_samples else None,
+        "p99_ms": max((s["p99_ms"] for s in lag_samples), default=None),
+        "max_ms": max((s["max_ms"] for s in lag_samples), default=None),
+    }
+    return report
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/api/health/live", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} not ready after {timeout}s")
+
+
+def _seed_database(database_url: str, api_key: str):
+    """Create the schema and a load-test user so history endpoints return 200"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database.models import Base
+    from app.database.crud import CRUDUser
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        if not CRUDUser.get_by_api_key(db, api_key):
+            CRUDUser.create(db, "Load Test Co", "Load Tester", "loadtest@example.com", "0000000000", api_key)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def sweep_workers(
+    worker_counts: List[int],
+    workload: Workload,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    latency: str = "none",
+    error_rate: float = 0.0,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Capacity curve: one fresh server per worker count, same load each time"""
+    from app.offline.servers import launch_subprocess
+
+    nominatim_port, osrm_port = _free_port(), _free_port()
+    stand_ins = launch_subprocess(nominatim_port, osrm_port, latency=latency, error_rate=error_rate, seed=seed)
+    tmpdir = tempfile.mkdtemp(prefix="loadtest-")
+    database_url = f"sqlite:///{tmpdir}/loadtest.db"
+    _seed_database(database_url, workload.api_key)
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        NOMINATIM_URL=f"http://127.0.0.1:{nominatim_port}",
+        OSRM_BASE_URL=f"http://127.0.0.1:{osrm_port}",
+        GEOCODE_MIN_DELAY_SECONDS="0",
+        DEBUG="False",
+    )
+    curve = []
+    try:
+        for workers in worker_counts:
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                 "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env,
+            )
+            try:
+                _wait_ready(url, server)
+                report = asyncio.run(run_load(url, workload, concurrency, duration, warmup, seed=seed))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            report["workers"] = workers
+            curve.append(report)
+            _print_report(report)
+    finally:
+        stand_ins.terminate()
+        stand_ins.wait(timeout=10)
+    return curve
+
+
+def _print_report(report: Dict[str, Any]):
+    o, lag = report["overall"], report["event_loop_lag"]
+    label = f"workers={report['workers']}" if "workers" in report else "target"
+    print(
+        f"{label:<12} rps={o['rps']:>8.1f}  p50={o['p50_ms']:>8.1f}ms  p95={o['p95_ms']:>8.1f}ms  "
+        f"p99={o['p99_ms']:>8.1f}ms  errors={o['error_rate'] * 100:5.2f}%  "
+        f"loop_lag_p99={lag['p99_ms'] if lag['p99_ms'] is not None else '-'}ms",
+        flush=True,
+    )
+    for kind, s in report["by_kind"].items():
+        print(f"  {kind:<10} n={s['requests']:<6} rps={s['rps']:>7.1f}  p50={s['p50_ms']:>8.1f}  "
+              f"p99={s['p99_ms']:>8.1f}  errors={s['error_rate'] * 100:5.2f}%  {s['statuses']}", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the RouteOptimizer API")
+    parser.add_argument("--target", default=None, help="Base URL of a running server (skips the worker sweep)")
+    parser.add_argument("--workers", type=lambda v: [int(w) for w in v.split(",")], default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Request kind weights, e.g. optimize:0.6,upload:0.2,history:0.2")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Stops per request weights, e.g. 10:0.5,1000:0.5")
+    parser.add_argument("--geocode-fraction", type=float, default=0.0, help="Share of stops sent without coordinates")
+    parser.add_argument("--api-key", default=LOADTEST_API_KEY)
+    parser.add_argument("--latency", default="none", help="Stand-in latency model (see python -m app.offline)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stand-in injected error rate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    workload = Workload(args.mix, args.sizes, args.geocode_fraction, args.api_key, args.seed)
+    if args.target:
+        report = asyncio.run(run_load(
+            args.target.rstrip("/"), workload, args.concurrency, args.duration, args.warmup, seed=args.seed
+        ))
+        _print_report(report)
+        result = {"target": args.target, "runs": [report]}
+    else:
+        curve = sweep_workers(
+            args.workers, workload, args.concurrency, args.duration, args.warmup,
+            args.latency, args.error_rate, args.seed,
+        )
+        result = {"capacity_curve": curve}
+    result["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2, default=str))
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""Performance regression gate: ``python -m benchmarks.regression``
+
+Runs a fixed set of hot-path micro benchmarks (matrix build, solve, response
+serialization, CSV upload parse, user stats query), compares medians against the committed
+baseline in ``benchmarks/baseline.json`` and exits non-zero when any case is
+slower than its noise-aware threshold.
+
+A case regresses when
+
+    current - expected > max(tolerance * expected, noise_k * (mad_base + mad_now), min_delta_ms)
+
+where ``expected`` is the baseline median scaled by the machine speed ratio
+measured by a fixed pure-Python calibration loop, so a baseline recorded on a
+laptop can gate a CI runner.
+
+    python -m benchmarks.regression                    # gate against baseline
+    python -m benchmarks.regression --update-baseline  # re-record after an intended change
+
+Suspected regressions are re-measured (``--confirm-runs``, default once) and
+only fail the gate if they are slow again.
+"""
+import argparse
+import gc
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional
+from benchmarks.instances import generate_instance
+from benchmarks.runner import haversine_matrix
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.15
+DEFAULT_NOISE_K = 3.0
+DEFAULT_MIN_DELTA_MS = 0.5
+
+
+class GateCase:
+    """A timed callable plus untimed setup, with optional per-case thresholds for noisy cases"""
+
+    def __init__(self, name: str, setup: Callable[[], Callable[[], Any]], tolerance: Optional[float] = None,
+                 min_delta_ms: Optional[float] = None):
+        self.name = name
+        self.setup = setup
+        self.tolerance = tolerance
+        self.min_delta_ms = min_delta_ms
+
+
+def _addresses(n: int):
+    from app.models.address import AddressWithCoordinates
+    coords = generate_instance("india", n)["coords"]
+    return [
+        AddressWithCoordinates(
+            id=i, name=f"Stop{i}", street=f"Street{i}", city="Delhi",
+            latitude=lat, longitude=lng
+        )
+        for i, (lat, lng) in enumerate(coords)
+    ]
+
+
+def _setup_matrix_build():
+    coords = generate_instance("india", 200)["coords"]
+    return lambda: haversine_matrix(coords)
+
+
+def _setup_route_distance():
+    from app.services.distance_calculator import DistanceCalculator
+    coords = generate_instance("india", 1000)["coords"]
+    return lambda: DistanceCalculator.calculate_route_distance(coords)
+
+
+def _setup_route_optimizer():
+    from app.services.route_optimizer import RouteOptimizer
+    optimizer = RouteOptimizer(timeout_seconds=1, use_portfolio=False)
+    # OR-Tools runs to a local optimum or its time limit; gate the deterministic path
+    optimizer._ortools_available = False
+    addresses = _addresses(200)
+    return lambda: optimizer.optimize(addresses)
+
+
+def _setup_engine():
+    from app.services.optimization_engine import OptimizationEngine
+
+    class OfflineEngine(OptimizationEngine):
+        # Haversine stand-in for OSRM so the gate never touches the network
+        def _osrm_table(self, coords):
+            return {"distances": haversine_matrix(coords), "durations": []}
+
+        def _osrm_route(self, ordered_coords):
+            return None
+
+    engine = OfflineEngine()
+    # GLS always runs to its time limit, so only the deterministic cluster path is gated
+    engine._ortools_available = False
+    coords = generate_instance("india", 200)["coords"]
+    return lambda: engine.optimize(coords, vehicles=3, portfolio=False)
+
+
+def _setup_response():
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.models.stop_set import StopSet
+    from app.services.response_builder import build_optimization_response
+    stops = StopSet.from_addresses(_addresses(1000))
+    route = list(range(1000)) + [0]
+
+    def run():
+        resp = build_optimization_response("bench", stops, route, 1234.5, 42)
+        return JSONResponse(jsonable_encoder(resp)).body
+    return run
+
+
+def _setup_fast_response():
+    from fastapi.responses import ORJSONResponse
+    from app.models.stop_set import StopSet
+    from app.services.response_builder import build_optimization_payload
+    stops = StopSet.from_addresses(_addresses(1000))
+    route = list(range(1000)) + [0]
+    return lambda: ORJSONResponse(build_optimization_payload("bench", stops, route, 1234.5, 42)).body
+
+
+def _setup_csv_parse():
+    from app.routers.upload import parse_csv_text
+    coords = generate_instance("india", 1000)["coords"]
+    lines = ["id,name,street,city,postal_code,latitude,longitude"]
+    lines += [
+        f"{i},Stop {i},{i} MG Road,Delhi,1100{i % 100:02d},{lat},{lng}"
+        for i, (lat, lng) in enumerate(coords)
+    ]
+    text = "\n".join(lines) + "\n"
+    return lambda: parse_csv_text(text, "bench.csv")
+
+
+
+def _setup_user_stats():
+    """100k routes (2 KB of route_data each) for one user, 10k for another, in SQLite"""
+    from datetime import timedelta
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import bulk
+    from app.database.crud import CRUDRoute
+    from app.database.models import Base
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime.utcnow()
+    route_data = "{" + '"stops": [' + ", ".join(["0"] * 700) + "]}"
+    bulk.insert_routes(db, [
+        {"route_id": f"u{user_id}-{i}", "user_id": user_id, "total_distance_km": 10.0 + i % 50,
+         "total_cost_inr": 120.0, "cost_saved_inr": 1.5, "route_data": route_data,
+         "optimization_date": now - timedelta(hours=i)}
+        for user_id, n in ((1, 100000), (2, 10000)) for i in range(n)
+    ])
+    return lambda: CRUDRoute.get_user_stats(db, 1)
+
+CASES = [
+    GateCase("distance_calculator.matrix_200", _setup_matrix_build),
+    GateCase("distance_calculator.route_distance_1000", _setup_route_distance),
+    GateCase("route_optimizer.optimize_200", _setup_route_optimizer),
+    GateCase("optimization_engine.optimize_200_cluster", _setup_engine),
+    GateCase("response.build_serialize_1000", _setup_response),
+    # ~2 ms: scheduler jitter alone is tens of percent
+    GateCase("response.fast_build_serialize_1000", _setup_fast_response, min_delta_ms=1.0),
+    GateCase("upload.parse_csv_1000", _setup_csv_parse),
+    # Bound by SQLite page reads, which swing with the page cache
+    GateCase("database.user_stats_100k", _setup_user_stats, tolerance=0.3),
+]
+
+
+def _calibration():
+    total = 0.0
+    for i in range(200000):
+        total += math.sqrt(i) * 1.0001
+    return total
+
+
+def time_callable(fn: Callable[[], Any], repeats: int, warmup: int = 1) -> List[float]:
+    """Wall times in ms, each run after a full collection with GC paused"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+    return times
+
+
+def summarize(times: List[float]) -> Dict[str, Any]:
+    median = statistics.median(times)
+    mad = statistics.median([abs(t - median) for t in times])
+    return {"median_ms": round(median, 3), "mad_ms": round(mad, 3), "runs": [round(t, 3) for t in times]}
+
+
+def run_gate_cases(repeats: int = 9, names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Measure the calibration loop and every selected case"""
+    cases = [c for c in CASES if not names or c.name in names]
+    measured = {}
+    # Sampled between the cases too, so it sees the machine conditions they ran under
+    calibration = time_callable(_calibration, 3)
+    for case in cases:
+        fn = case.setup()
+        measured[case.name] = summarize(time_callable(fn, repeats))
+        calibration += time_callable(_calibration, 3, warmup=0)
+    calibration += time_callable(_calibration, max(0, max(5, repeats) - len(calibration)), warmup=0)
+    return {
+        "calibration": summarize(calibration),
+        "cases": measured,
+    }
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+    noise_k: float = DEFAULT_NOISE_K,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+    normalize: bool = True,
+) -> List[Dict[str, Any]]:
+    """Classify each case as ok / regression / improved / new / missing"""
+    speed = 1.0
+    if normalize and baseline.get("calibration") and current.get("calibration"):
+        speed = current["calibration"]["median_ms"] / baseline["calibration"]["median_ms"]
+    overrides = {c.name: c.tolerance for c in CASES if c.tolerance is not None}
+    min_deltas = {c.name: c.min_delta_ms for c in CASES if c.min_delta_ms is not None}
+    base_cases = baseline.get("cases", {})
+    rows = []
+    for name in sorted(set(base_cases) | set(current["cases"])):
+        base, now = base_cases.get(name), current["cases"].get(name)
+        row = {"case": name}
+        if base is None:
+            row.update(status="new", current_ms=now["median_ms"])
+        elif now is None:
+            row.update(status="missing", baseline_ms=base["median_ms"])
+        else:
+            expected = base["median_ms"] * speed
+            delta = now["median_ms"] - expected
+            allowed = max(
+                overrides.get(name, tolerance) * expected,
+                noise_k * (base["mad_ms"] * speed + now["mad_ms"]),
+                min_deltas.get(name, min_delta_ms),
+            )
+            if delta > allowed:
+                status = "regression"
+            elif -delta > allowed:
+                status = "improved"
+            else:
+                status = "ok"
+            row.update(
+                status=status,
+                baseline_ms=base["median_ms"],
+                expected_ms=round(expected, 3),
+                current_ms=now["median_ms"],
+                change_percent=round(delta / expected * 100, 1) if expected else 0.0,
+                allowed_percent=round(allowed / expected * 100, 1) if expected else 0.0,
+            )
+        rows.append(row)
+    return rows
+
+
+def merge_baseline(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a subset run into an existing baseline
+
+    The merged file carries the new run's calibration, so the cases kept from
+    the old baseline are rescaled by the calibration ratio to stay comparable.
+    """
+    speed = 1.0
+    if baseline.get("calibration"):
+        speed = current["calibration"]["median_ms"] / baseline["calibration"]["median_ms"]
+    cases = {
+        name: {
+            "median_ms": round(case["median_ms"] * speed, 3),
+            "mad_ms": round(case["mad_ms"] * speed, 3),
+            "runs": [round(t * speed, 3) for t in case["runs"]],
+        }
+        for name, case in baseline.get("cases", {}).items()
+    }
+    cases.update(current["cases"])
+    return {**baseline, **current, "cases": cases}
+
+
+def format_table(rows: List[Dict[str, Any]], speed: Optional[float] = None) -> str:
+    def cell(value, fmt):
+        return format(value, fmt) if value is not None else format("-", ">10")
+
+    header = f"{'case':<42} {'baseline':>10} {'expected':>10} {'current':>10} {'change':>8} {'allowed':>8}  status"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        change = r.get("change_percent")
+        allowed = r.get("allowed_percent")
+        lines.append(
+            f"{r['case']:<42} {cell(r.get('baseline_ms'), '10.2f')} {cell(r.get('expected_ms'), '10.2f')} "
+            f"{cell(r.get('current_ms'), '10.2f')} "
+            f"{(f'{change:+.1f}%' if change is not None else '-'):>8} "
+            f"{(f'±{allowed:.1f}%' if allowed is not None else '-'):>8}  {r['status'].upper()}"
+        )
+    if speed is not None:
+        lines.append(f"(machine speed factor vs baseline: {speed:.2f}; times in ms)")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fail on optimizer performance regressions")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Record current timings as the baseline")
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--cases", type=lambda v: [c for c in v.split(",") if c], default=None)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Relative slowdown allowed")
+    parser.add_argument("--noise-k", type=float, default=DEFAULT_NOISE_K, help="MAD multiples treated as noise")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+    parser.add_argument("--no-normalize", action="store_true", help="Skip machine speed calibration")
+    parser.add_argument("--confirm-runs", type=int, default=1,
+                        help="Re-measure suspected regressions this many times before failing")
+    parser.add_argument("--output", type=Path, default=None, help="Write current run + comparison as JSON")
+    args = parser.parse_args(argv)
+
+    # Cached routes would turn the engine case into a Redis round trip
+    from app.services.cache_service import cache_service
+    cache_service.redis_available = False
+
+    current = run_gate_cases(args.repeats, args.cases)
+    current["meta"] = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+    }
+
+    if args.update_baseline:
+        if args.cases and args.baseline.exists():
+            current = merge_baseline(json.loads(args.baseline.read_text()), current)
+        args.baseline.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 2
+    baseline = json.loads(args.baseline.read_text())
+    if args.cases:
+        # Cases left out of a subset run are not missing
+        baseline["cases"] = {k: v for k, v in baseline.get("cases", {}).items() if k in args.cases}
+    normalize = not args.no_normalize
+    rows = compare(baseline, current, args.tolerance, args.noise_k, args.min_delta_ms, normalize)
+    for _ in range(args.confirm_runs):
+        # A noisy neighbour can slow one case down for a whole run; only a repeat slowdown counts
+        suspects = [r["case"] for r in rows if r["status"] == "regression"]
+        if not suspects:
+            break
+        print(f"Re-measuring suspected regression(s): {', '.join(suspects)}")
+        retry = run_gate_cases(args.repeats, suspects)
+        subset = dict(baseline, cases={k: v for k, v in baseline["cases"].items() if k in suspects})
+        retried = {r["case"]: r for r in compare(subset, retry, args.tolerance, args.noise_k,
+                                                 args.min_delta_ms, normalize)}
+        rows = [retried.get(r["case"], r) for r in rows]
+        current["cases"].update(retry["cases"])
+    speed = current["calibration"]["median_ms"] / baseline["calibration"]["median_ms"] if normalize else None
+    print(format_table(rows, speed))
+
+    if args.output:
+        args.output.write_text(json.dumps({"current": current, "comparison": rows}, indent=2))
+    regressions = [r["case"] for r in rows if r["status"] in ("regression", "missing")]
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\nPASS: no regressions above tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
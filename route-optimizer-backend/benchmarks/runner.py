@@ -0,0 +1,268 @@
+"""Run every optimizer path over benchmark instances and collect measurements."""
+import gc
+import statistics
+import time
+import tracemalloc
+from typing import List, Tuple, Dict, Any, Optional, Callable
+from app.models.address import AddressWithCoordinates
+from app.services.distance_calculator import DistanceCalculator
+from app.services.route_optimizer import RouteOptimizer
+from app.services.optimization_engine import OptimizationEngine
+from app.services import large_matrix
+
+Routes = List[List[int]]
+
+
+def haversine_matrix(coords: List[Tuple[float, float]]) -> List[List[int]]:
+    """Integer metre matrix, the same shape OptimizationEngine gets from OSRM"""
+    hav = DistanceCalculator.haversine_distance
+    return [[int(hav(a[0], a[1], b[0], b[1]) * 1000) for b in coords] for a in coords]
+
+
+def route_cost_m(coords: List[Tuple[float, float]], routes: Routes) -> float:
+    """Objective shared by all engines: haversine metres over every leg"""
+    hav = DistanceCalculator.haversine_distance
+    total = 0.0
+    for r in routes:
+        for i in range(len(r) - 1):
+            a, b = coords[r[i]], coords[r[i + 1]]
+            total += hav(a[0], a[1], b[0], b[1])
+    return round(total * 1000, 1)
+
+
+def routes_valid(routes: Routes, n: int, depot_index: int = 0) -> bool:
+    """Every non-depot stop is visited exactly once"""
+    visited = [i for r in routes for i in r if i != depot_index]
+    return sorted(visited) == [i for i in range(n) if i != depot_index]
+
+
+class EnginePath:
+    """One solver path under benchmark"""
+
+    def __init__(
+        self,
+        name: str,
+        solve: Callable[[Dict[str, Any], Optional[int]], Routes],
+        max_stops: int,
+        multi_vehicle: bool,
+        time_limited: bool,
+        prepare: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        available: bool = True,
+    ):
+        self.name = name
+        self.solve = solve
+        self.max_stops = max_stops
+        self.multi_vehicle = multi_vehicle
+        self.time_limited = time_limited
+        self.prepare = prepare
+        self.available = available
+
+    def skip_reason(self, instance: Dict[str, Any]) -> Optional[str]:
+        if not self.available:
+            return "unavailable"
+        if instance["vehicles"] > 1 and not self.multi_vehicle:
+            return "single-vehicle only"
+        if instance["stops"] > self.max_stops:
+            return f"above max_stops={self.max_stops}"
+        return None
+
+
+def _addresses(instance: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "addresses": [
+            AddressWithCoordinates(
+                id=i, name=f"Stop{i}", street=f"Street{i}", city="Bench",
+                latitude=lat, longitude=lng
+            )
+            for i, (lat, lng) in enumerate(instance["coords"])
+        ]
+    }
+
+
+def _matrix(instance: Dict[str, Any]) -> Dict[str, Any]:
+    return {"distances": haversine_matrix(instance["coords"])}
+
+
+def _memmap_matrix(instance: Dict[str, Any]) -> Dict[str, Any]:
+    matrix = large_matrix.allocate(len(instance["coords"]))
+    return {"distances": large_matrix.fill_haversine(matrix, instance["coords"])}
+
+
+def build_engine_paths() -> Dict[str, EnginePath]:
+    optimizer = RouteOptimizer()
+    engine = OptimizationEngine()
+
+    def ro_ortools(prepared, time_limit):
+        optimizer.timeout_seconds = time_limit
+        return [optimizer._ortools_route(prepared["addresses"], 0)]
+
+    def ro_nearest(prepared, time_limit):
+        return [optimizer._nearest_neighbor_route(prepared["addresses"], 0)]
+
+    def engine_gls(prepared, time_limit):
+        return engine._guided_local_search_vrp(
+            prepared["distances"], prepared["vehicles"], 0, time_limit
+        )
+
+    def engine_cluster(prepared, time_limit):
+        return engine._cluster_routes(prepared["coords"], prepared["vehicles"], 0)
+
+    def engine_large(prepared, time_limit):
+        return engine._solve_large(prepared["coords"], prepared["distances"], prepared["vehicles"], 0, time_limit)
+
+    def engine_sparse(prepared, time_limit):
+        return engine._solve_sparse(prepared["coords"], prepared["vehicles"], 0, time_limit)[0]
+
+    return {
+        "route_optimizer.ortools": EnginePath(
+            "route_optimizer.ortools", ro_ortools, max_stops=1000, multi_vehicle=False,
+            time_limited=True, prepare=_addresses, available=optimizer._ortools_available,
+        ),
+        "route_optimizer.nearest_neighbor": EnginePath(
+            "route_optimizer.nearest_neighbor", ro_nearest, max_stops=5000, multi_vehicle=False,
+            time_limited=False, prepare=_addresses,
+        ),
+        "engine.gls": EnginePath(
+            "engine.gls", engine_gls, max_stops=1000, multi_vehicle=True,
+            time_limited=True, prepare=_matrix, available=engine._ortools_available,
+        ),
+        "engine.cluster": EnginePath(
+            "engine.cluster", engine_cluster, max_stops=5000, multi_vehicle=True,
+            time_limited=False,
+        ),
+        "engine.large": EnginePath(
+            "engine.large", engine_large, max_stops=10000, multi_vehicle=True,
+            time_limited=True, prepare=_memmap_matrix,
+        ),
+        "engine.sparse": EnginePath(
+            "engine.sparse", engine_sparse, max_stops=20000, multi_vehicle=True,
+            time_limited=True,
+        ),
+    }
+
+
+def _measure_peak_kb(fn: Callable[[], Any]) -> int:
+    """Peak Python-heap allocation of fn (native solver memory is not seen)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return int(peak / 1024)
+
+
+def run_case(
+    path: EnginePath,
+    instance: Dict[str, Any],
+    time_limit: Optional[int],
+    repeats: int = 1,
+    measure_memory: bool = True,
+) -> Dict[str, Any]:
+    """Benchmark one (engine path, instance, time limit) combination"""
+    row = {
+        "engine": path.name,
+        "instance": instance["name"],
+        "distribution": instance["distribution"],
+        "stops": instance["stops"],
+        "vehicles": instance["vehicles"],
+        "time_limit_s": time_limit,
+    }
+    reason = path.skip_reason(instance)
+    if reason:
+        row["skipped"] = reason
+        return row
+
+    prepared = {"coords": instance["coords"], "vehicles": instance["vehicles"]}
+    prep_start = time.perf_counter()
+    if path.prepare:
+        prepared.update(path.prepare(instance))
+    row["prepare_ms"] = round((time.perf_counter() - prep_start) * 1000, 2)
+
+    times, routes = [], None
+    try:
+        for _ in range(max(1, repeats)):
+            start = time.perf_counter()
+            routes = path.solve(prepared, time_limit)
+            times.append((time.perf_counter() - start) * 1000)
+        if measure_memory:
+            row["peak_memory_kb"] = _measure_peak_kb(lambda: path.solve(prepared, time_limit))
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {str(e)}"
+        return row
+
+    row["wall_ms"] = round(statistics.median(times), 2)
+    row["wall_ms_runs"] = [round(t, 2) for t in times]
+    row["valid"] = bool(routes) and routes_valid(routes, instance["stops"])
+    row["objective_m"] = route_cost_m(instance["coords"], routes) if routes else None
+    return row
+
+
+def apply_gaps(results: List[Dict[str, Any]], best_known: Dict[str, float]) -> Dict[str, float]:
+    """Fill gap_percent on every row and return the updated best-known table"""
+    best = dict(best_known)
+    for row in results:
+        obj = row.get("objective_m")
+        if obj and row.get("valid"):
+            name = row["instance"]
+            best[name] = min(best.get(name, obj), obj)
+    for row in results:
+        obj = row.get("objective_m")
+        bk = best.get(row["instance"])
+        if obj and bk:
+            row["best_known_m"] = bk
+            row["gap_percent"] = round((obj - bk) / bk * 100, 3)
+    return best
+
+
+def quality_time_curves(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """Group rows into instance -> engine -> [(time budget, wall time, objective, gap)]"""
+    curves: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    for row in results:
+        if row.get("objective_m") is None:
+            continue
+        point = {
+            "time_limit_s": row["time_limit_s"],
+            "wall_ms": row["wall_ms"],
+            "objective_m": row["objective_m"],
+            "gap_percent": row.get("gap_percent"),
+        }
+        curves.setdefault(row["instance"], {}).setdefault(row["engine"], []).append(point)
+    for engines in curves.values():
+        for points in engines.values():
+            points.sort(key=lambda p: p["wall_ms"])
+    return curves
+
+
+def run_benchmarks(
+    instances: List[Dict[str, Any]],
+    engines: Optional[List[str]] = None,
+    time_limits: Optional[List[int]] = None,
+    repeats: int = 1,
+    measure_memory: bool = True,
+    best_known: Optional[Dict[str, float]] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Run the selected engine paths over the instances
+
+    Time-limited paths (OR-Tools) run once per budget in `time_limits` so the
+    results trace a quality-vs-time curve; constructive paths run once.
+    """
+    paths = build_engine_paths()
+    selected = [paths[name] for name in (engines or list(paths))]
+    time_limits = time_limits or [1, 2, 5]
+    results = []
+    for instance in instances:
+        for path in selected:
+            for limit in (time_limits if path.time_limited else [None]):
+                row = run_case(path, instance, limit, repeats, measure_memory)
+                results.append(row)
+                if progress:
+                    progress(row)
+    best = apply_gaps(results, best_known or {})
+    return {
+        "results": results,
+        "curves": quality_time_curves(results),
+        "best_known": best,
+    }
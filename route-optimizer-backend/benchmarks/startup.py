@@ -0,0 +1,148 @@
+"""Worker startup benchmark: ``python -m benchmarks.startup``
+
+Measures, each in a fresh interpreter, how long ``import app.main`` takes and
+how long a uvicorn worker takes from spawn to its first 200 on
+/api/health/live. Redis points at an unroutable address by default so a
+startup path that blocks on the cache shows up immediately.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --importtime 15        # slowest imports
+    python -m benchmarks.startup --max-import-seconds 1.5  # exit 1 if slower
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+import httpx
+from benchmarks.loadtest import BACKEND_DIR, _free_port
+
+# TEST-NET-1: connects hang until the client's timeout instead of failing fast
+UNREACHABLE_REDIS = "redis://192.0.2.1:6379/0"
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def _env(redis_url: str, database_url: str) -> Dict[str, str]:
+    return dict(os.environ, REDIS_URL=redis_url, DATABASE_URL=database_url, DEBUG="False")
+
+
+def measure_import(module: str, runs: int, env: Dict[str, str]) -> List[float]:
+    """Seconds to import `module` in `runs` fresh interpreters"""
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse `python -X importtime` output into per-module self/cumulative microseconds"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def slowest_imports(module: str, env: Dict[str, str], limit: int) -> List[Dict[str, Any]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return sorted(parse_importtime(out.stderr), key=lambda r: r["self_us"], reverse=True)[:limit]
+
+
+def measure_time_to_ready(runs: int, env: Dict[str, str], timeout: float = 60.0) -> List[float]:
+    """Seconds from spawning a uvicorn worker to its first successful health check"""
+    times = []
+    for _ in range(runs):
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}/api/health/live"
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        # One client for all polls: httpx.get() would rebuild an SSL context every try
+        client = httpx.Client(timeout=0.5)
+        try:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {server.returncode}")
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"Server not ready after {timeout}s")
+                try:
+                    if client.get(url).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.01)
+            times.append(time.perf_counter() - start)
+        finally:
+            client.close()
+            server.terminate()
+            server.wait(timeout=30)
+    return times
+
+
+def _summary(times: List[float]) -> Dict[str, float]:
+    return {
+        "median_s": round(statistics.median(times), 3),
+        "min_s": round(min(times), 3),
+        "max_s": round(max(times), 3),
+        "runs": len(times),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure worker startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--redis-url", default=UNREACHABLE_REDIS)
+    parser.add_argument("--database-url", default=None, help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure the import")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="Also list the N slowest imports")
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='startup-')}/startup.db"
+    env = _env(args.redis_url, database_url)
+
+    report: Dict[str, Any] = {"module": args.module, "redis_url": args.redis_url}
+    report["import"] = _summary(measure_import(args.module, args.runs, env))
+    print(f"import {args.module}: median {report['import']['median_s']:.3f}s", flush=True)
+    if not args.skip_server:
+        report["time_to_ready"] = _summary(measure_time_to_ready(args.runs, env))
+        print(f"uvicorn worker ready: median {report['time_to_ready']['median_s']:.3f}s", flush=True)
+    if args.importtime:
+        report["slowest_imports"] = slowest_imports(args.module, env, args.importtime)
+        for row in report["slowest_imports"]:
+            print(f"  {row['self_us'] / 1000:8.1f}ms  {row['module']}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.max_import_seconds is not None and report["import"]["median_s"] > args.max_import_seconds:
+        print(f"FAIL: import median above {args.max_import_seconds}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Initial schema: users, addresses, routes, optimization_history
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-19
+
+Databases created by ``init_db`` (``create_all``) before migrations existed
+already have these tables, so each one is only created when missing. With
+``--sql`` nothing can be inspected, and every table is emitted.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0001_initial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("business_name", sa.String(255), unique=True),
+            sa.Column("contact_name", sa.String(255)),
+            sa.Column("email", sa.String(255), unique=True),
+            sa.Column("phone", sa.String(20)),
+            sa.Column("api_key", sa.String(255)),
+            sa.Column("subscription_plan", sa.String(50)),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+        op.create_index("ix_users_api_key", "users", ["api_key"], unique=True)
+    if "addresses" not in existing:
+        op.create_table(
+            "addresses",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer),
+            sa.Column("name", sa.String(255)),
+            sa.Column("street", sa.String(255)),
+            sa.Column("city", sa.String(100)),
+            sa.Column("postal_code", sa.String(20), nullable=True),
+            sa.Column("latitude", sa.Float),
+            sa.Column("longitude", sa.Float),
+            sa.Column("phone", sa.String(20), nullable=True),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index("ix_addresses_user_id", "addresses", ["user_id"])
+    if "routes" not in existing:
+        op.create_table(
+            "routes",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("route_id", sa.String(50)),
+            sa.Column("user_id", sa.Integer),
+            sa.Column("optimization_date", sa.DateTime),
+            sa.Column("total_distance_km", sa.Float),
+            sa.Column("total_cost_inr", sa.Float),
+            sa.Column("cost_saved_inr", sa.Float),
+            sa.Column("route_data", sa.Text),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index("ix_routes_route_id", "routes", ["route_id"], unique=True)
+        op.create_index("ix_routes_user_id", "routes", ["user_id"])
+    if "optimization_history" not in existing:
+        op.create_table(
+            "optimization_history",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("request_id", sa.String(50)),
+            sa.Column("user_id", sa.Integer),
+            sa.Column("addresses_count", sa.Integer),
+            sa.Column("computation_time_ms", sa.Integer),
+            sa.Column("quality_score", sa.Float),
+            sa.Column("success", sa.Boolean),
+            sa.Column("error_message", sa.Text, nullable=True),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index("ix_optimization_history_request_id", "optimization_history", ["request_id"], unique=True)
+        op.create_index("ix_optimization_history_user_id", "optimization_history", ["user_id"])
+
+
+def downgrade():
+    for table in ("optimization_history", "routes", "addresses", "users"):
+        op.drop_table(table)
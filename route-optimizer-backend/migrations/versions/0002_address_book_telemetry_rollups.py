@@ -0,0 +1,84 @@
+"""Address book ids, solver traces, the routes history index and per-user rollups
+
+Revision ID: 0002_address_book_telemetry_rollups
+Revises: 0001_initial
+Create Date: 2026-10-19
+
+Adds addresses.external_id/updated_at with their per-user unique index,
+optimization_history.solver_trace, ix_routes_user_date and user_stats_rollups.
+``create_all`` at startup creates new tables but never alters existing ones,
+so each step checks what is already there. An ix_routes_user_date from before
+the id tiebreaker is recreated. With ``--sql`` the database cannot be
+inspected, and the DDL for a database at 0001_initial is emitted. Run
+``python -m app.database.rollups`` after upgrading a database that already
+has routes.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002_address_book_telemetry_rollups"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+ROUTE_INDEX_COLUMNS = ["user_id", "optimization_date", "id"]
+
+
+def _columns(inspector, table):
+    return {c["name"] for c in inspector.get_columns(table)} if inspector else set()
+
+
+def _indexes(inspector, table):
+    return {i["name"]: i["column_names"] for i in inspector.get_indexes(table)} if inspector else {}
+
+
+def upgrade():
+    inspector = None if context.is_offline_mode() else sa.inspect(op.get_bind())
+
+    columns = _columns(inspector, "addresses")
+    with op.batch_alter_table("addresses") as batch:
+        if "external_id" not in columns:
+            batch.add_column(sa.Column("external_id", sa.BigInteger))
+        if "updated_at" not in columns:
+            batch.add_column(sa.Column("updated_at", sa.DateTime))
+    if "ix_addresses_user_external" not in _indexes(inspector, "addresses"):
+        op.create_index("ix_addresses_user_external", "addresses", ["user_id", "external_id"], unique=True)
+
+    if "solver_trace" not in _columns(inspector, "optimization_history"):
+        with op.batch_alter_table("optimization_history") as batch:
+            batch.add_column(sa.Column("solver_trace", sa.Text, nullable=True))
+
+    route_index = _indexes(inspector, "routes").get("ix_routes_user_date")
+    if route_index != ROUTE_INDEX_COLUMNS:
+        if route_index is not None:
+            op.drop_index("ix_routes_user_date", table_name="routes")
+        op.create_index("ix_routes_user_date", "routes", ROUTE_INDEX_COLUMNS,
+                        postgresql_include=["total_distance_km", "cost_saved_inr"])
+
+    if inspector is None or not inspector.has_table("user_stats_rollups"):
+        op.create_table(
+            "user_stats_rollups",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, nullable=False),
+            sa.Column("period", sa.String(5), nullable=False),
+            sa.Column("period_start", sa.Date, nullable=False),
+            sa.Column("route_count", sa.Integer),
+            sa.Column("total_distance_km", sa.Float),
+            sa.Column("total_cost_inr", sa.Float),
+            sa.Column("cost_saved_inr", sa.Float),
+            sa.Column("optimization_count", sa.Integer),
+            sa.Column("computation_time_ms", sa.BigInteger),
+        )
+        op.create_index("ix_rollups_user_period", "user_stats_rollups", ["user_id", "period", "period_start"],
+                        unique=True)
+
+
+def downgrade():
+    op.drop_table("user_stats_rollups")
+    op.drop_index("ix_routes_user_date", table_name="routes")
+    with op.batch_alter_table("optimization_history") as batch:
+        batch.drop_column("solver_trace")
+    op.drop_index("ix_addresses_user_external", table_name="addresses")
+    with op.batch_alter_table("addresses") as batch:
+        batch.drop_column("updated_at")
+        batch.drop_column("external_id")
@@ -0,0 +1,29 @@
+"""users.rollups_backfilled_at: analytics read the rollups only once it is set
+
+Revision ID: 0003_rollups_backfill_marker
+Revises: 0002_address_book_telemetry_rollups
+Create Date: 2026-10-19
+
+Existing users stay NULL, so their analytics come from the routes aggregate
+until ``python -m app.database.rollups`` has rebuilt their rollups.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0003_rollups_backfill_marker"
+down_revision = "0002_address_book_telemetry_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        if "rollups_backfilled_at" in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("users")}:
+            return  # created by create_all
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("rollups_backfilled_at", sa.DateTime, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("rollups_backfilled_at")
@@ -42,6 +42,14 @@ MAX_ADDRESSES=1000
 """)
         print("✓ Created .env file")
     
+    # create_all at startup never adds columns to existing tables
+    print("\n🗄  Migrating database...")
+    try:
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=app_path, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"\n✗ Migration failed: {e}")
+        sys.exit(1)
+    
     print("\n🚀 Starting RouteOptimizer API...")
     print("   Access at: http://localhost:8000")
     print("   Docs at: http://localhost:8000/api/docs")
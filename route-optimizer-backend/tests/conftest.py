@@ -0,0 +1,54 @@
+import os
+import uuid
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.config import settings
+from app.database.models import Base
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite with every table, shared by all sessions of one test"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+@pytest.fixture
+def postgres_session_factory():
+    """Sessions on PostgreSQL (TEST_POSTGRES_URL, else DATABASE_URL), in a throwaway schema
+
+    Skipped when neither points at a reachable PostgreSQL server.
+    """
+    url = make_url(os.environ.get("TEST_POSTGRES_URL") or settings.DATABASE_URL)
+    if url.get_backend_name() != "postgresql":
+        pytest.skip("no PostgreSQL URL")
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(url, connect_args={"connect_timeout": 2})
+    try:
+        with admin.begin() as conn:
+            conn.exec_driver_sql(f"CREATE SCHEMA {schema}")
+    except Exception as e:
+        admin.dispose()
+        pytest.skip(f"PostgreSQL unavailable: {e.__class__.__name__}")
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+    try:
+        Base.metadata.create_all(bind=engine)
+        yield sessionmaker(bind=engine, expire_on_commit=False)
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
+        admin.dispose()
@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from app.main import app
+from app.database.connection import get_db
+from app.database.crud import CRUDUser, CRUDAddress
+from app.database.models import Address
+from app.services.geocoder import geocoder
+
+ADDRESSES = [
+    {"id": 101, "name": "Office", "street": "123 Main St", "city": "Delhi", "latitude": 28.6139, "longitude": 77.2090},
+    {"id": 102, "name": "Shop", "street": "456 Second St", "city": "Delhi", "latitude": 28.6145, "longitude": 77.2100},
+    {"id": 103, "name": "Stall", "street": "789 Third St", "city": "Delhi"},
+    {"id": 104, "name": "Kiosk", "street": "Nowhere Lane", "city": "Delhi"},
+    {"id": 105, "name": "Depot", "street": "1 Fourth St", "city": "Delhi", "latitude": 28.6100, "longitude": 77.2000},
+]
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    db = session_factory()
+    CRUDUser.create(db, "Book Co", "Ravi", "ravi@example.com", "+919800000001", "book_key")
+    CRUDUser.create(db, "Other Co", "Mina", "mina@example.com", "+919800000002", "other_key")
+    db.close()
+
+    calls = []
+    def geocode(query):
+        calls.append(query)
+        return None if query.startswith("Nowhere") else MagicMock(latitude=28.6150, longitude=77.2110)
+    monkeypatch.setattr(geocoder, "min_delay_seconds", 0)
+    monkeypatch.setattr(geocoder, "cache", {})
+    monkeypatch.setattr(geocoder, "geolocator", MagicMock(geocode=geocode))
+
+    def override_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = override_db
+    try:
+        test_client = TestClient(app)
+        test_client.geocode_calls = calls
+        yield test_client
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+def _upsert(client, addresses, api_key="book_key"):
+    return client.put("/api/addresses", params={"api_key": api_key}, json={"addresses": addresses})
+
+def test_upsert_geocodes_once_and_updates(client):
+    data = _upsert(client, ADDRESSES).json()
+    assert (data["inserted"], data["updated"], data["geocode_failed_ids"]) == (4, 0, [104])
+    assert client.geocode_calls == ["789 Third St, Delhi", "Nowhere Lane, Delhi"]
+
+    renamed = [dict(ADDRESSES[2], name="Stall 2", latitude=28.62, longitude=77.22), ADDRESSES[1]]
+    data = _upsert(client, renamed).json()
+    assert (data["inserted"], data["updated"]) == (0, 2)
+    assert len(client.geocode_calls) == 2
+
+    listed = client.get("/api/addresses", params={"api_key": "book_key"}).json()["addresses"]
+    assert [a["id"] for a in listed] == [101, 102, 103, 105]
+    assert (listed[2]["name"], listed[2]["latitude"]) == ("Stall 2", 28.62)
+    assert client.get("/api/addresses", params={"api_key": "other_key"}).json()["addresses"] == []
+
+def test_optimize_by_id_matches_optimize(client):
+    _upsert(client, ADDRESSES)
+    ids = [105, 101, 102, 103]
+    data = client.post("/api/optimize/by-id", params={"api_key": "book_key"}, json={"address_ids": ids}).json()
+    assert data["status"] == "success"
+    assert data["route"]["stops"][0]["address_id"] == 105
+    calls = len(client.geocode_calls)
+
+    rows = [dict(next(a for a in ADDRESSES if a["id"] == i), latitude=None, longitude=None) for i in ids]
+    listed = {a["id"]: a for a in client.get("/api/addresses", params={"api_key": "book_key"}).json()["addresses"]}
+    for row in rows:
+        row.update(latitude=listed[row["id"]]["latitude"], longitude=listed[row["id"]]["longitude"])
+    expected = client.post("/api/optimize", json={"addresses": rows}).json()
+    assert [s["address_id"] for s in data["route"]["stops"]] == [s["address_id"] for s in expected["route"]["stops"]]
+    assert data["route"]["total_distance_km"] == pytest.approx(expected["route"]["total_distance_km"])
+    assert len(client.geocode_calls) == calls  # nothing geocoded for known stops
+
+def test_optimize_by_id_errors(client):
+    _upsert(client, ADDRESSES)
+    post = lambda ids, key="book_key": client.post("/api/optimize/by-id", params={"api_key": key}, json={"address_ids": ids})
+    assert post([101, 102], key="nope").status_code == 401
+    response = post([101, 104, 999])
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Unknown address ids: [104, 999]"
+    assert post([101, 102], key="other_key").status_code == 404  # another user's book
+    assert post([101, 101]).status_code == 422
+
+def test_delete_address(client):
+    _upsert(client, ADDRESSES)
+    assert client.delete("/api/addresses/101", params={"api_key": "book_key"}).status_code == 200
+    assert client.delete("/api/addresses/101", params={"api_key": "book_key"}).status_code == 404
+    assert client.delete("/api/addresses/102", params={"api_key": "other_key"}).status_code == 404
+
+def test_address_book_queries_run_off_the_event_loop(client, monkeypatch):
+    _upsert(client, ADDRESSES)
+    loops = []
+    def recording(method):
+        def call(*args, **kwargs):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return method(*args, **kwargs)
+        return call
+    for name in ("get_by_external_ids", "get_user_addresses", "delete"):
+        monkeypatch.setattr(CRUDAddress, name, recording(getattr(CRUDAddress, name)))
+    monkeypatch.setattr(CRUDUser, "get_by_api_key", recording(CRUDUser.get_by_api_key))
+
+    client.post("/api/optimize/by-id", params={"api_key": "book_key"}, json={"address_ids": [101, 102]})
+    client.get("/api/addresses", params={"api_key": "book_key"})
+    client.delete("/api/addresses/101", params={"api_key": "book_key"})
+    assert len(loops) == 6 and loops == [None] * 6  # threadpool, never the loop
+
+def test_external_id_unique_per_user(session_factory):
+    db = session_factory()
+    row = {"external_id": 1, "name": "A", "street": "S", "city": "C", "latitude": 1.0, "longitude": 2.0}
+    assert CRUDAddress.upsert_many(db, 1, [row, dict(row, name="B")]) == (1, 0)
+    assert CRUDAddress.upsert_many(db, 2, [row]) == (1, 0)
+    assert CRUDAddress.get_by_external_ids(db, 1, [1, 2]) == {1: ("B", "S", "C", None, None, 1.0, 2.0)}
+    db.add(Address(user_id=1, external_id=1, name="dup"))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.close()
@@ -0,0 +1,63 @@
+import json
+import pytest
+from sqlalchemy import func, select
+from app.database import bulk, rollups
+from app.database.crud import CRUDAddress, CRUDOptimization, CRUDRoute
+from app.database.models import Address
+
+# COPY and the temp-table upsert only run on PostgreSQL; see the
+# postgres_session_factory fixture for how to point these at a server
+
+@pytest.fixture
+def pg(postgres_session_factory):
+    session = postgres_session_factory()
+    yield session
+    session.close()
+
+def _address(i, **extra):
+    return dict({"external_id": i, "name": f"Stop {i}", "street": f"{i} MG Road", "city": "Delhi",
+                 "latitude": 28.0 + i * 1e-5, "longitude": 77.0}, **extra)
+
+def test_copy_routes_and_history(pg):
+    routes = [{"route_id": f"r{i}", "user_id": 1, "total_distance_km": 2.5, "total_cost_inr": 30.0,
+               "cost_saved_inr": 1.0, "route_data": json.dumps({"stops": [i, "a,b"]})} for i in range(1200)]
+    assert CRUDRoute.create_many(pg, routes) == 1200
+    assert len(CRUDRoute.get_user_routes(pg, 1, limit=2000)) == 1200
+    route = CRUDRoute.get_by_route_id(pg, "r7")
+    assert json.loads(route.route_data) == {"stops": [7, "a,b"]}
+    assert route.optimization_date is not None
+
+    records = [{"request_id": f"q{i}", "user_id": 1, "addresses_count": 5, "computation_time_ms": 3,
+                "quality_score": 1.0, "solver_trace": {"stop": "heuristic"} if i else None} for i in range(3)]
+    assert CRUDOptimization.create_many(pg, records) == 3
+    assert CRUDOptimization.get_by_request_id(pg, "q0").solver_trace is None
+    history = CRUDOptimization.get_by_request_id(pg, "q1")
+    assert history.success is True and history.created_at is not None
+    assert CRUDOptimization.get_solver_trace(pg, "q1", 1) == {"stop": "heuristic"}
+
+    totals = rollups.totals(pg, 1)
+    assert (totals["route_count"], totals["total_distance_km"], totals["optimization_count"]) == (1200, 3000.0, 3)
+
+def test_upsert_through_staging_table(pg):
+    assert bulk.upsert_addresses(pg, 1, [_address(i) for i in range(2500)], chunk_rows=1000) == (2500, 0)
+    rows = [_address(i, name="Renamed") for i in range(2000, 3000)] + [_address(5, phone="+91")]
+    assert bulk.upsert_addresses(pg, 1, rows, chunk_rows=300) == (500, 501)
+    assert bulk.upsert_addresses(pg, 2, [_address(1)]) == (1, 0)
+
+    count = pg.execute(select(func.count()).select_from(Address).where(Address.user_id == 1)).scalar()
+    assert count == 3000
+    assert CRUDAddress.get_by_external_ids(pg, 1, [2000, 5]) == {
+        2000: ("Renamed", "2000 MG Road", "Delhi", None, None, 28.02, 77.0),
+        5: ("Stop 5", "5 MG Road", "Delhi", None, "+91", 28.00005, 77.0),
+    }
+
+def test_upsert_csv_quoting(pg):
+    odd = _address(1, name='Shop "A", Delhi', street="Line 1\nLine 2", postal_code="", phone=None)
+    assert bulk.upsert_addresses(pg, 1, [odd, _address(2)]) == (2, 0)
+    assert CRUDAddress.get_by_external_ids(pg, 1, [1])[1] == (
+        'Shop "A", Delhi', "Line 1\nLine 2", "Delhi", "", None, 28.00001, 77.0
+    )
+    created = pg.execute(select(Address.created_at).where(Address.external_id == 2)).scalar()
+    assert bulk.upsert_addresses(pg, 1, [_address(2, name="A"), _address(2, name="B")]) == (0, 1)
+    name, created_after = pg.execute(select(Address.name, Address.created_at).where(Address.external_id == 2)).one()
+    assert (name, created_after) == ("B", created)
@@ -0,0 +1,63 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+COLUMNS = {
+    "ids": [1, 2, 3, 4],
+    "names": ["Office", "Stop 1", "Stop 2", "Stop 3"],
+    "streets": ["123 Main St", "456 Second St", "789 Third St", "1 Fourth St"],
+    "cities": ["Delhi", "Delhi", "Delhi", "Delhi"],
+    "latitudes": [28.6139, 28.6145, 28.6150, 28.6100],
+    "longitudes": [77.2090, 77.2100, 77.2110, 77.2000],
+}
+
+def test_columnar_json_round_trip():
+    response = client.post("/api/optimize/columnar", json=COLUMNS)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "success"
+    assert data["ids"][0] == 1
+    assert sorted(data["ids"]) == [1, 2, 3, 4]
+    assert [COLUMNS["ids"][p] for p in data["positions"]] == data["ids"]
+    n = len(data["ids"])
+    for column in ("latitudes", "longitudes", "distance_from_previous_km", "cumulative_distance_km"):
+        assert len(data[column]) == n
+    assert data["cumulative_distance_km"][-1] == pytest.approx(sum(data["distance_from_previous_km"]))
+
+def test_columnar_matches_row_endpoint():
+    rows = [
+        {"id": i, "name": n, "street": s, "city": c, "latitude": lat, "longitude": lng}
+        for i, n, s, c, lat, lng in zip(*(COLUMNS[k] for k in ("ids", "names", "streets", "cities",
+                                                                 "latitudes", "longitudes")))
+    ]
+    row_data = client.post("/api/optimize", json={"addresses": rows}).json()
+    col_data = client.post("/api/optimize/columnar", json=COLUMNS).json()
+    assert [s["address_id"] for s in row_data["route"]["stops"]] == col_data["ids"]
+    assert row_data["route"]["total_distance_km"] == col_data["total_distance_km"]
+    assert len(json.dumps(col_data)) < len(json.dumps(row_data))
+
+def test_columnar_rejects_misaligned_columns():
+    body = dict(COLUMNS, cities=["Delhi"])
+    response = client.post("/api/optimize/columnar", json=body)
+    assert response.status_code == 422
+    assert "cities has 1 rows" in json.dumps(response.json())
+
+def test_columnar_validates_ranges_and_size():
+    assert client.post("/api/optimize/columnar", json=dict(COLUMNS, latitudes=[95.0, 0, 0, 0])).status_code == 422
+    small = {k: v[:1] for k, v in COLUMNS.items()}
+    assert client.post("/api/optimize/columnar", json=small).status_code == 422
+    assert client.post("/api/optimize/columnar", content=b"{not json",
+                       headers={"Content-Type": "application/json"}).status_code == 422
+
+def test_columnar_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post(
+        "/api/optimize/columnar", content=msgpack.packb(COLUMNS),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert sorted(msgpack.unpackb(response.content)["ids"]) == [1, 2, 3, 4]
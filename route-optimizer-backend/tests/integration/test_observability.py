@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+def _payload(n=5):
+    return {"addresses": [
+        {"id": i, "name": f"Stop{i}", "street": f"Street{i}", "city": "Delhi",
+         "latitude": 28.6139 + i * 0.001, "longitude": 77.2090 + i * 0.001}
+        for i in range(n)
+    ]}
+
+def test_optimize_emits_server_timing():
+    response = client.post("/api/optimize", json=_payload())
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+    timing = response.headers["Server-Timing"]
+    for name in ("geocode", "solve", "build_response", "serialize", "total"):
+        assert f"{name};dur=" in timing
+
+def test_metrics_endpoint_exposes_stage_histograms():
+    client.post("/api/optimize", json=_payload())
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'route_optimizer_stage_duration_seconds_count{stage="solve"}' in body
+    assert 'route="/api/optimize"' in body
+    assert "route_optimizer_solver_queue_depth 0" in body
+    assert "# TYPE route_optimizer_cache_hit_ratio gauge" in body
+    assert "# TYPE route_optimizer_geocode_rate_limit_wait_seconds histogram" in body
@@ -0,0 +1,105 @@
+import io
+import orjson
+import pytest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.geocoder import geocoder
+
+client = TestClient(app)
+
+CSV = b"""id,name,street,city,latitude,longitude
+1,Office,123 Main St,Delhi,28.6139,77.2090
+2,Stop 1,456 Second St,Delhi,28.6145,77.2100
+3,Stop 2,789 Third St,Delhi,,
+4,,1 Fourth St,Delhi,28.6100,77.2000
+5,Stop 4,Nowhere Lane,Delhi,,
+6,Stop 5,2 Fifth St,Delhi,28.6120,77.2050
+"""
+
+@pytest.fixture
+def fake_nominatim(monkeypatch):
+    calls = []
+    def geocode(query):
+        calls.append(query)
+        return None if query.startswith("Nowhere") else MagicMock(latitude=28.6150, longitude=77.2110)
+    monkeypatch.setattr(geocoder, "min_delay_seconds", 0)
+    monkeypatch.setattr(geocoder, "cache", {})
+    monkeypatch.setattr(geocoder, "geolocator", MagicMock(geocode=geocode))
+    return calls
+
+def _post(body, **params):
+    return client.post("/api/optimize/upload", params=params,
+                       files={"file": ("stops.csv", io.BytesIO(body), "text/csv")})
+
+def test_upload_returns_route(fake_nominatim):
+    response = _post(CSV)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "success"
+    # Only the rows without coordinates were geocoded
+    assert fake_nominatim == ["789 Third St, Delhi", "Nowhere Lane, Delhi"]
+    stops = data["route"]["stops"]
+    assert stops[0]["address_id"] == 1
+    assert sorted(s["address_id"] for s in stops) == [1, 2, 3, 6]
+    assert data["upload"]["errors"] == ["Row 5: empty name"]
+    assert data["upload"]["geocode_failed_ids"] == [5]
+    assert (data["upload"]["total_rows"], data["upload"]["parsed_successfully"]) == (6, 5)
+
+def test_upload_matches_optimize_endpoint(fake_nominatim):
+    rows = [
+        {"id": 1, "name": "Office", "street": "123 Main St", "city": "Delhi", "latitude": 28.6139, "longitude": 77.2090},
+        {"id": 2, "name": "Stop 1", "street": "456 Second St", "city": "Delhi", "latitude": 28.6145, "longitude": 77.2100},
+        {"id": 3, "name": "Stop 2", "street": "789 Third St", "city": "Delhi"},
+        {"id": 6, "name": "Stop 5", "street": "2 Fifth St", "city": "Delhi", "latitude": 28.6120, "longitude": 77.2050},
+    ]
+    expected = client.post("/api/optimize", json={"addresses": rows}).json()
+    data = _post(CSV).json()
+    assert [s["address_id"] for s in data["route"]["stops"]] == [s["address_id"] for s in expected["route"]["stops"]]
+    assert data["route"]["total_distance_km"] == pytest.approx(expected["route"]["total_distance_km"])
+
+def test_upload_progress_events(fake_nominatim):
+    response = _post(CSV, progress="true")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [e["stage"] for e in events] == ["parse", "geocode", "solve", "result"]
+    assert events[0]["parsed_successfully"] == 5
+    assert events[1] == {"stage": "geocode", "done": 2, "total": 2, "failed": 1}
+    assert events[2]["stops"] == 4
+    assert events[-1]["result"]["status"] == "success"
+
+def test_upload_errors(fake_nominatim):
+    assert _post(b"id,name\n1,a\n").status_code == 400
+    assert _post(b"id,name\n1,a\n", progress="true").status_code == 400  # before the stream starts
+    one = b"id,name,street,city\n1,Office,Nowhere Lane,Delhi\n2,Shop,Nowhere Road,Delhi\n"
+    assert _post(one).json()["detail"] == "Failed geocoding"
+    events = [orjson.loads(line) for line in _post(one, progress="true").text.splitlines()]
+    assert events[-1] == {"stage": "error", "status_code": 400, "detail": "Failed geocoding"}
+
+def test_upload_parse_failure_is_an_error_body(fake_nominatim, monkeypatch):
+    from app.routers import optimize as optimize_router
+    def broken(source, filename):
+        raise ValueError("bad bytes")
+    monkeypatch.setattr(optimize_router, "read_upload_stops", broken)
+    for progress in ("false", "true"):
+        response = _post(CSV, progress=progress)
+        assert response.status_code == 200
+        assert response.json()["status"] == "error"
+        assert response.json()["error_message"] == "bad bytes"
+
+def test_upload_progress_without_events(fake_nominatim, monkeypatch):
+    from app.routers import optimize as optimize_router
+    monkeypatch.setattr(optimize_router, "_upload_events", lambda *args: iter(()))
+    response = _post(CSV, progress="true")
+    assert response.json()["status"] == "error"
+
+def test_upload_parquet(fake_nominatim):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    import pandas as pd
+    sink = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(pd.read_csv(io.BytesIO(CSV))), sink)
+    response = client.post("/api/optimize/upload", files={"file": ("stops.parquet", io.BytesIO(sink.getvalue()))})
+    data = response.json()
+    assert data["upload"]["format"] == "parquet"
+    assert sorted(s["address_id"] for s in data["route"]["stops"]) == [1, 2, 3, 6]
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import connection
+from app.database.connection import async_database_url
+from app.database.models import Base
+from app.utils.metrics import registry
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.database.async_crud import AsyncCRUDOptimization, AsyncCRUDRoute, AsyncCRUDStats, AsyncCRUDUser
+from app.database.crud import CRUDRoute, CRUDUser
+from app.utils.pagination import InvalidCursor
+
+@pytest.fixture
+def aiosqlite():
+    return pytest.importorskip("aiosqlite")
+
+@pytest.fixture
+async def db(aiosqlite):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+def test_async_database_url():
+    assert async_database_url("postgresql://u:p@db:5432/routes") == "postgresql+asyncpg://u:p@db:5432/routes"
+    assert async_database_url("postgresql+psycopg2://u@db/routes") == "postgresql+asyncpg://u@db/routes"
+    assert async_database_url("sqlite:///./route_optimizer.db") == "sqlite+aiosqlite:///./route_optimizer.db"
+
+async def test_async_crud_round_trip(db):
+    user = await AsyncCRUDUser.create(db, "Async Co", "Dev", "async@example.com", "+919800000005", "async_key")
+    assert (await AsyncCRUDUser.get_by_api_key(db, "async_key")).id == user.id
+    assert await AsyncCRUDUser.get_by_api_key(db, "nope") is None
+
+    for i in range(5):
+        await AsyncCRUDRoute.create(db, f"a{i}", user.id, 10.0 + i, 120.0, 2.0, "{}")
+    page, cursor = await AsyncCRUDRoute.get_user_route_page(db, user.id, limit=3)
+    rest, last = await AsyncCRUDRoute.get_user_route_page(db, user.id, limit=3, cursor=cursor)
+    assert [r.route_id for r in page + rest] == ["a4", "a3", "a2", "a1", "a0"] and last is None
+    with pytest.raises(InvalidCursor):
+        await AsyncCRUDRoute.get_user_route_page(db, user.id, cursor="x")
+
+    assert await AsyncCRUDRoute.delete(db, "a0", user.id)
+    assert not await AsyncCRUDRoute.delete(db, "a1", user.id + 1)
+    stats = await AsyncCRUDStats.get_user_stats(db, user.id)
+    assert stats == await AsyncCRUDRoute.get_user_stats(db, user.id)
+    assert stats["total_routes"] == 4 and stats["total_distance_km"] == 50.0
+
+    await AsyncCRUDOptimization.create(db, "q1", user.id, addresses_count=5, computation_time_ms=40,
+                                       quality_score=1.0, solver_trace={"points": [[0, 10]]})
+    assert await AsyncCRUDOptimization.get_solver_trace(db, "q1", user.id) == {"points": [[0, 10]]}
+    assert await AsyncCRUDOptimization.get_solver_trace(db, "q1", user.id + 1) is None
+    today = datetime.utcnow().date()
+    series = await AsyncCRUDStats.get_timeseries(db, user.id, "day", today, today)
+    assert series[0]["routes"] == 4 and series[0]["optimizations"] == 1
+
+def test_history_routes_endpoint_pages(tmp_path, aiosqlite):
+    from app.main import app
+    from app.database.connection import get_async_db
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    CRUDUser.create(db, "Page Co", "Dev", "page@example.com", "+919800000004", "page_key")
+    now = datetime.utcnow()
+    CRUDRoute.create_many(db, [{"route_id": f"u1-{i}", "user_id": 1, "total_distance_km": 1.0, "total_cost_inr": 12.0,
+                                "cost_saved_inr": 0.0, "route_data": "{}", "optimization_date": now} for i in range(3)])
+    db.close()
+
+    async_sessions = async_sessionmaker(
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}", poolclass=NullPool),
+        expire_on_commit=False)
+
+    async def override_db():
+        async with async_sessions() as session:
+            yield session
+    app.dependency_overrides[get_async_db] = override_db
+    try:
+        client = TestClient(app)
+        first = client.get("/api/history/routes", params={"api_key": "page_key", "limit": 2}).json()
+        last = client.get("/api/history/routes", params={"api_key": "page_key", "limit": 2,
+                                                         "cursor": first["next_cursor"]}).json()
+        assert [r["route_id"] for r in first["routes"] + last["routes"]] == ["u1-2", "u1-1", "u1-0"]
+        assert last["next_cursor"] is None
+        assert client.get("/api/history/routes", params={"api_key": "page_key", "cursor": "x"}).status_code == 400
+        assert client.delete("/api/history/routes/u1-0", params={"api_key": "page_key"}).status_code == 200
+        assert client.delete("/api/history/routes/u1-0", params={"api_key": "page_key"}).status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        engine.dispose()
+
+async def test_async_pool_metrics(tmp_path, monkeypatch, aiosqlite):
+    monkeypatch.setattr(connection.settings, "DATABASE_ASYNC_URL", f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    monkeypatch.setattr(connection.settings, "DATABASE_POOL_SIZE", 3)
+    await connection.dispose_async_engine()
+    held = []
+    try:
+        async with connection.get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        held = [connection.AsyncSessionLocal() for _ in range(2)]
+        await asyncio.gather(*[AsyncCRUDUser.get_by_id(s, 1) for s in held])  # each checks out a connection
+        rendered = registry.render()
+        assert 'route_optimizer_db_pool_connections{engine="async",state="size"} 3' in rendered
+        assert 'route_optimizer_db_pool_connections{engine="async",state="checked_out"} 2' in rendered
+        for session in held:
+            await session.close()
+        assert 'route_optimizer_db_pool_connections{engine="async",state="checked_in"} 2' in registry.render()
+    finally:
+        for session in held:
+            await session.close()
+        await connection.dispose_async_engine()
+
+def test_session_needs_no_engine_until_it_queries(monkeypatch):
+    from app.main import app
+    monkeypatch.setattr(connection.settings, "DATABASE_ASYNC_URL", "postgresql+nodriver://u@db/routes")
+    monkeypatch.setattr(connection, "_async_engine", None)
+    # A request that fails validation never resolves the (unloadable) engine
+    assert TestClient(app).get("/api/history/routes").status_code == 422
+    assert connection._async_engine is None
@@ -0,0 +1,85 @@
+import pytest
+from benchmarks.instances import generate_instance, corpus, DISTRIBUTIONS
+from benchmarks.runner import (
+    build_engine_paths, run_case, run_benchmarks, routes_valid, route_cost_m, apply_gaps
+)
+
+@pytest.mark.parametrize("distribution", DISTRIBUTIONS)
+def test_instances_are_deterministic(distribution):
+    a = generate_instance(distribution, 50, vehicles=2, seed=7)
+    b = generate_instance(distribution, 50, vehicles=2, seed=7)
+    assert a == b
+    assert len(a["coords"]) == 50
+    assert a["name"] == f"{distribution}-50-v2-s7"
+
+def test_seed_changes_instance():
+    assert generate_instance("uniform", 20, seed=1)["coords"] != generate_instance("uniform", 20, seed=2)["coords"]
+
+def test_unknown_distribution():
+    with pytest.raises(ValueError):
+        generate_instance("moon", 10)
+
+def test_corpus_cross_product():
+    instances = corpus(["uniform", "grid"], [10, 50], [1, 5])
+    assert len(instances) == 8
+
+def test_routes_valid():
+    assert routes_valid([[0, 2, 1, 0]], 3)
+    assert routes_valid([[0, 1, 0], [0, 2, 0]], 3)
+    assert not routes_valid([[0, 1, 1, 0]], 3)
+    assert not routes_valid([[0, 1, 0]], 3)
+
+def test_route_cost_closed_loop():
+    coords = [(28.6, 77.2), (28.61, 77.2)]
+    assert route_cost_m(coords, [[0, 1, 0]]) == pytest.approx(2 * 1112, rel=0.01)
+
+def test_run_case_constructive():
+    paths = build_engine_paths()
+    instance = generate_instance("clustered", 30, vehicles=2)
+    row = run_case(paths["engine.cluster"], instance, None)
+    assert row["valid"] is True
+    assert row["objective_m"] > 0
+    assert row["wall_ms"] >= 0
+    assert row["peak_memory_kb"] >= 0
+
+def test_run_case_large_instance_path():
+    paths = build_engine_paths()
+    instance = generate_instance("uniform", 40, vehicles=2)
+    row = run_case(paths["engine.large"], instance, 1)
+    assert row["valid"] is True
+    assert row["objective_m"] > 0
+
+def test_run_case_sparse_path():
+    paths = build_engine_paths()
+    instance = generate_instance("clustered", 60, vehicles=2)
+    row = run_case(paths["engine.sparse"], instance, 1)
+    assert row["valid"] is True
+    assert row["objective_m"] > 0
+
+def test_run_case_skips_unsupported():
+    paths = build_engine_paths()
+    instance = generate_instance("uniform", 20, vehicles=3)
+    row = run_case(paths["route_optimizer.nearest_neighbor"], instance, None)
+    assert row["skipped"] == "single-vehicle only"
+
+def test_gaps_against_best_known():
+    results = [
+        {"instance": "x", "objective_m": 110.0, "valid": True},
+        {"instance": "x", "objective_m": 100.0, "valid": True},
+    ]
+    best = apply_gaps(results, {"x": 120.0})
+    assert best["x"] == 100.0
+    assert results[0]["gap_percent"] == 10.0
+    assert results[1]["gap_percent"] == 0.0
+
+def test_run_benchmarks_report_shape():
+    instances = [generate_instance("india", 15, vehicles=1)]
+    report = run_benchmarks(
+        instances, engines=["route_optimizer.nearest_neighbor", "engine.cluster"],
+        measure_memory=False,
+    )
+    assert len(report["results"]) == 2
+    assert instances[0]["name"] in report["best_known"]
+    assert set(report["curves"][instances[0]["name"]]) == {
+        "route_optimizer.nearest_neighbor", "engine.cluster"
+    }
@@ -0,0 +1,62 @@
+import json
+import time
+from datetime import datetime
+from unittest.mock import MagicMock
+from sqlalchemy import func, select
+from app.database import bulk
+from app.database.crud import CRUDAddress, CRUDOptimization, CRUDRoute
+from app.database.models import Address
+
+def _address(i, **extra):
+    return dict({"external_id": i, "name": f"Stop {i}", "street": f"{i} MG Road", "city": "Delhi",
+                 "latitude": 28.0 + i * 1e-5, "longitude": 77.0}, **extra)
+
+def test_upsert_addresses_in_chunks(db):
+    assert bulk.upsert_addresses(db, 1, [_address(i) for i in range(2500)], chunk_rows=1000) == (2500, 0)
+    rows = [_address(i, name="Renamed") for i in range(2000, 3000)] + [_address(5, phone="+91")]
+    assert bulk.upsert_addresses(db, 1, rows, chunk_rows=300) == (500, 501)
+    assert bulk.upsert_addresses(db, 2, [_address(1)]) == (1, 0)  # external ids are per user
+
+    count = db.execute(select(func.count()).select_from(Address).where(Address.user_id == 1)).scalar()
+    assert count == 3000
+    assert CRUDAddress.get_by_external_ids(db, 1, [2000, 5]) == {
+        2000: ("Renamed", "2000 MG Road", "Delhi", None, None, 28.02, 77.0),
+        5: ("Stop 5", "5 MG Road", "Delhi", None, "+91", 28.00005, 77.0),
+    }
+
+def test_upsert_keeps_created_at_and_last_duplicate_wins(db):
+    bulk.upsert_addresses(db, 1, [_address(1)])
+    created = db.execute(select(Address.created_at)).scalar()
+    time.sleep(0.01)
+    assert bulk.upsert_addresses(db, 1, [_address(1, name="A"), _address(1, name="B")]) == (0, 1)
+    name, created_after, updated = db.execute(select(Address.name, Address.created_at, Address.updated_at)).one()
+    assert (name, created_after) == ("B", created)
+    assert updated > created
+
+def test_insert_routes_and_history_fill_defaults(db):
+    routes = [{"route_id": f"r{i}", "user_id": 1, "total_distance_km": i, "total_cost_inr": i * 12,
+               "cost_saved_inr": i, "route_data": "{}"} for i in range(1200)]
+    assert CRUDRoute.create_many(db, routes) == 1200
+    assert len(CRUDRoute.get_user_routes(db, 1, limit=2000)) == 1200
+    assert CRUDRoute.get_by_route_id(db, "r7").optimization_date is not None
+
+    records = [{"request_id": "q1", "user_id": 1, "addresses_count": 5, "computation_time_ms": 3,
+                "quality_score": 1.0, "solver_trace": {"stop": "heuristic"}}]
+    assert CRUDOptimization.create_many(db, records) == 1
+    history = CRUDOptimization.get_by_request_id(db, "q1")
+    assert history.success is True and history.created_at is not None
+    assert json.loads(history.solver_trace) == {"stop": "heuristic"}
+
+def test_copy_csv_distinguishes_null_and_empty():
+    cursor = MagicMock()
+    session = MagicMock()
+    session.connection.return_value.connection.cursor.return_value = cursor
+    bulk._copy(session, "addresses", ["name", "postal_code", "latitude", "created_at"],
+               [{"name": 'Shop "A", Delhi', "postal_code": None, "latitude": 28.5, "created_at": datetime(2026, 1, 2)},
+                {"name": "", "postal_code": "011001", "latitude": None, "created_at": None}])
+    sql, buffer = cursor.copy_expert.call_args[0]
+    assert sql == "COPY addresses (name, postal_code, latitude, created_at) FROM STDIN WITH (FORMAT csv)"
+    assert buffer.getvalue().splitlines() == [
+        '"Shop ""A"", Delhi",,28.5,"2026-01-02 00:00:00"',
+        '"","011001",,',
+    ]
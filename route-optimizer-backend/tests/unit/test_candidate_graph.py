@@ -0,0 +1,84 @@
+import time
+import numpy as np
+import pytest
+from benchmarks.instances import generate_instance
+from benchmarks.runner import routes_valid
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.candidate_graph import CandidateGraph, two_opt
+from app.services.distance_calculator import DistanceCalculator
+from app.services.optimization_engine import OptimizationEngine
+
+
+def _brute_force_knn(coords, i, k):
+    d = [DistanceCalculator.haversine_distance(*coords[i], *c) if j != i else float("inf")
+         for j, c in enumerate(coords)]
+    return set(np.argsort(d)[:k].tolist())
+
+@pytest.mark.parametrize("kind", ["uniform", "clustered", "india"])
+def test_neighbours_match_brute_force(kind):
+    coords = generate_instance(kind, 400, seed=3)["coords"]
+    graph = CandidateGraph.build(coords, k=8)
+    assert graph.indptr.tolist() == list(range(0, 400 * 8 + 1, 8))
+    for i in range(0, 400, 37):
+        assert set(graph.neighbors(i)) == _brute_force_knn(coords, i, 8)
+
+def test_neighbours_are_sorted_and_costed_with_road_factor():
+    coords = generate_instance("uniform", 100, seed=1)["coords"]
+    graph = CandidateGraph.build(coords, k=5, road_factor=1.5)
+    nbrs = graph.neighbors(0)
+    weights = [graph.cost(0, j) for j in nbrs]
+    assert weights == sorted(weights)
+    expected = DistanceCalculator.haversine_distance(*coords[0], *coords[nbrs[0]]) * 1000 * 1.5
+    assert weights[0] == pytest.approx(expected, abs=1)
+
+def test_non_candidate_arcs_are_estimated():
+    coords = generate_instance("uniform", 100, seed=1)["coords"]
+    graph = CandidateGraph.build(coords, k=3)
+    far = next(j for j in range(1, 100) if j not in graph.neighbors(0))
+    assert graph.cost(0, far) == pytest.approx(graph.estimate(0, far))
+    assert graph.cost(0, 0) == 0.0
+
+def test_tiny_instances():
+    assert CandidateGraph.build([(12.9, 77.5)]).neighbors(0) == []
+    graph = CandidateGraph.build([(12.9, 77.5), (13.0, 77.6)], k=12)
+    assert graph.neighbors(0) == [1]
+
+def test_memory_is_linear_in_n():
+    coords = generate_instance("uniform", 2000, seed=2)["coords"]
+    graph = CandidateGraph.build(coords, k=10)
+    assert graph.nbytes < 2000 * 10 * 9 + 2001 * 8
+
+def test_nearest_neighbor_route_covers_subset():
+    coords = generate_instance("clustered", 300, seed=7)["coords"]
+    graph = CandidateGraph.build(coords, k=4)
+    nodes = list(range(50, 300, 2))
+    route = graph.nearest_neighbor_route(nodes, 0)
+    assert route[0] == route[-1] == 0
+    assert sorted(route[1:-1]) == nodes
+
+def test_two_opt_improves_and_keeps_depot_first():
+    coords = generate_instance("uniform", 300, seed=5)["coords"]
+    graph = CandidateGraph.build(coords, k=10)
+    route = list(range(300)) + [0]
+    improved = two_opt(graph, route)
+    assert improved[0] == improved[-1] == 0
+    assert sorted(improved[:-1]) == list(range(300))
+    assert graph.route_cost(improved) < graph.route_cost(route) * 0.5
+
+def test_two_opt_ignores_stops_on_other_routes():
+    coords = generate_instance("uniform", 200, seed=6)["coords"]
+    graph = CandidateGraph.build(coords, k=10)
+    route = [0] + list(range(100, 200)) + [0]
+    improved = two_opt(graph, route, deadline=time.time() + 5)
+    assert sorted(improved) == sorted(route)
+
+def test_engine_sparse_mode(monkeypatch):
+    monkeypatch.setattr(cache_service, "redis_available", False)
+    monkeypatch.setattr(settings, "SPARSE_INSTANCE_THRESHOLD", 150)
+    coords = generate_instance("india", 200, seed=4)["coords"]
+    # No OSRM at all: the unreachable base URL must never be called
+    result = OptimizationEngine(osrm_base="http://127.0.0.1:9").optimize(coords, vehicles=3, time_limit_seconds=1)
+    assert result["strategy"] == "sparse_candidates"
+    assert routes_valid(result["routes"], len(coords))
+    assert result["total_distance_km"] > 0
@@ -0,0 +1,71 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.database.crud import CRUDRoute
+from app.utils.pagination import InvalidCursor
+
+def _route(i, user_id, when):
+    return {"route_id": f"u{user_id}-{i}", "user_id": user_id, "total_distance_km": 10.0 + i,
+            "total_cost_inr": 12.0 * (10 + i), "cost_saved_inr": 1.5 * i, "route_data": "{}",
+            "optimization_date": when}
+
+def test_user_stats_aggregate_in_sql(db, engine):
+    now = datetime.utcnow()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    dates = [now, month_start, month_start - timedelta(seconds=1), now - timedelta(days=400)]
+    routes = [_route(i, 1, dates[i % 4]) for i in range(40)] + [_route(i, 2, now) for i in range(5)]
+    CRUDRoute.create_many(db, routes)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    stats = CRUDRoute.get_user_stats(db, 1)
+    assert len(statements) == 1 and "route_data" not in statements[0]
+
+    mine = [r for r in routes if r["user_id"] == 1]
+    total = sum(r["total_distance_km"] for r in mine)
+    assert stats == {
+        "total_routes": 40,
+        "total_distance_km": round(total, 2),
+        "total_cost_saved_inr": round(sum(r["cost_saved_inr"] for r in mine), 2),
+        "average_distance_km": round(total / 40, 2),
+        "routes_this_month": 20,
+    }
+
+def test_user_stats_without_routes(db):
+    assert CRUDRoute.get_user_stats(db, 99) == {
+        "total_routes": 0, "total_distance_km": 0, "total_cost_saved_inr": 0,
+        "average_distance_km": 0, "routes_this_month": 0,
+    }
+
+def test_routes_have_user_date_index(engine):
+    from sqlalchemy import inspect
+    indexes = {ix["name"]: ix["column_names"] for ix in inspect(engine).get_indexes("routes")}
+    assert indexes["ix_routes_user_date"] == ["user_id", "optimization_date", "id"]
+
+def test_route_pages_walk_every_route_once(db, engine):
+    now = datetime.utcnow()
+    # Groups of routes share a timestamp, so pages split ties on optimization_date
+    routes = [_route(i, 1, now - timedelta(hours=i // 4)) for i in range(23)] + [_route(i, 2, now) for i in range(3)]
+    CRUDRoute.create_many(db, routes)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2:4]))
+    seen, cursor = [], None
+    while True:
+        page, cursor = CRUDRoute.get_user_route_page(db, 1, limit=5, cursor=cursor)
+        seen += [(r.optimization_date, r.id, r.route_id) for r in page]
+        if cursor is None:
+            break
+    assert len(statements) == 5 and all("route_data" not in sql for sql, _ in statements)
+    assert [s[2] for s in seen] == [r["route_id"] for r in sorted(
+        routes[:23], key=lambda r: (r["optimization_date"], int(r["route_id"].split("-")[1])), reverse=True)]
+    assert seen == sorted(seen, reverse=True)
+
+    sql, params = statements[-1]
+    plan = " ".join(row[-1] for row in db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params))
+    assert "ix_routes_user_date" in plan and "TEMP B-TREE" not in plan
+
+def test_route_page_rejects_bad_cursor(db):
+    with pytest.raises(InvalidCursor):
+        CRUDRoute.get_user_route_page(db, 1, cursor="not-a-cursor")
+    assert CRUDRoute.get_user_route_page(db, 1) == ([], None)
@@ -79,3 +79,33 @@ def test_address_with_postal_code(service):
         # Verify postal code was included in address string
         call_args = m.call_args[0][0]
         assert "110001" in call_args
+
+def test_geocode_stops_fills_in_place_and_drops_failures(service):
+    """StopSet rows are geocoded in place; unresolved rows are dropped"""
+    from app.models.stop_set import StopSet
+    stops = StopSet.from_addresses([
+        AddressInput(id=1, name="A1", street="123", city="Delhi", latitude=28.61, longitude=77.2),
+        AddressInput(id=2, name="A2", street="456", city="Mumbai"),
+        AddressInput(id=3, name="A3", street="Nowhere", city="Mumbai"),
+    ])
+    service.min_delay_seconds = 0
+    with patch.object(service.geolocator, 'geocode') as m:
+        m.side_effect = lambda q: None if q.startswith("Nowhere") else MagicMock(latitude=19.0, longitude=72.8)
+        located, failed = service.geocode_stops(stops)
+    assert m.call_count == 2
+    assert failed == [2]
+    assert located.ids.tolist() == [1, 2]
+    assert located.coords.tolist() == [[28.61, 77.2], [19.0, 72.8]]
+    assert located.source_index.tolist() == [0, 1]
+
+def test_rate_limit_wait_is_measured(service, monkeypatch):
+    """The histogram records the time actually slept, not the configured delay"""
+    from app.utils.metrics import GEOCODE_RATE_LIMIT_WAIT_SECONDS
+    monkeypatch.setattr("app.services.geocoder.time.sleep", lambda seconds: None)
+    service.min_delay_seconds = 5
+    count, total = GEOCODE_RATE_LIMIT_WAIT_SECONDS.count(), GEOCODE_RATE_LIMIT_WAIT_SECONDS.sum()
+    with patch.object(service.geolocator, 'geocode') as m:
+        m.return_value = MagicMock(latitude=28.6, longitude=77.2)
+        service.geocode_query("1 Main, Delhi")
+    assert GEOCODE_RATE_LIMIT_WAIT_SECONDS.count() == count + 1
+    assert GEOCODE_RATE_LIMIT_WAIT_SECONDS.sum() - total < 1
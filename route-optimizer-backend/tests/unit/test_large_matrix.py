@@ -0,0 +1,77 @@
+import os
+import tracemalloc
+import numpy as np
+import pytest
+from benchmarks.instances import generate_instance
+from benchmarks.runner import routes_valid
+from app.config import settings
+from app.offline import geometry
+from app.offline.servers import start_offline_services
+from app.services import large_matrix
+from app.services.cache_service import cache_service
+from app.services.distance_calculator import DistanceCalculator
+from app.services.optimization_engine import OptimizationEngine
+
+COORDS = [(28.6139, 77.2090), (28.7041, 77.1025), (19.0760, 72.8777), (12.9716, 77.5946), (22.5726, 88.3639)]
+
+def _table_fetch(points, sources, destinations):
+    return geometry.table(points, sources, destinations)["distances"]
+
+def test_allocate_leaves_no_file_behind(tmp_path):
+    matrix = large_matrix.allocate(10, directory=str(tmp_path))
+    matrix[:] = 7
+    assert matrix.dtype == np.uint32
+    assert int(matrix.sum()) == 700
+    assert os.listdir(tmp_path) == []
+
+def test_haversine_matches_distance_calculator_for_any_tile():
+    a = large_matrix.fill_haversine(np.zeros((5, 5), dtype=np.float32), COORDS, tile=2)
+    b = large_matrix.fill_haversine(np.zeros((5, 5), dtype=np.float32), COORDS, tile=100)
+    assert np.array_equal(a, b)
+    expected = DistanceCalculator.haversine_distance(*COORDS[0], *COORDS[2]) * 1000
+    assert a[0, 2] == pytest.approx(expected, rel=1e-5)
+
+def test_table_fill_in_blocks_matches_full_table():
+    matrix = large_matrix.fill_from_table(np.zeros((5, 5), dtype=np.uint32), COORDS, _table_fetch, tile=2)
+    full = np.rint(np.array(geometry.table(COORDS)["distances"]))
+    assert np.array_equal(matrix, full.astype(np.uint32))
+
+def test_unreachable_cells():
+    def fetch(points, sources, destinations):
+        return [[None if i != j else 0 for j in destinations] for i in sources]
+    ints = large_matrix.fill_from_table(np.zeros((2, 2), dtype=np.uint32), COORDS[:2], fetch)
+    assert ints[0, 1] == large_matrix.UNREACHABLE_UINT32
+    floats = large_matrix.fill_from_table(np.zeros((2, 2), dtype=np.float32), COORDS[:2], fetch)
+    assert np.isnan(floats[0, 1])
+
+def test_route_cost_and_submatrix():
+    matrix = np.arange(25, dtype=np.uint32).reshape(5, 5)
+    assert large_matrix.route_cost_m(matrix, [0, 2, 4, 0]) == 2 + 14 + 20
+    assert large_matrix.route_cost_m(matrix, [3]) == 0.0
+    assert large_matrix.submatrix(matrix, [1, 3]).tolist() == [[6, 8], [16, 18]]
+
+def test_build_memory_is_bounded_by_tile():
+    coords = generate_instance("uniform", 3000, seed=1)["coords"]
+    matrix = large_matrix.allocate(len(coords))
+    tracemalloc.start()
+    large_matrix.fill_haversine(matrix, coords, tile=128)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < large_matrix.matrix_bytes(len(coords), "float64") / 2
+    assert matrix[0, 1] > 0
+
+def test_engine_large_instance_mode(monkeypatch):
+    nominatim, osrm = start_offline_services(seed=2)
+    try:
+        monkeypatch.setattr(cache_service, "redis_available", False)
+        monkeypatch.setattr(settings, "LARGE_INSTANCE_THRESHOLD", 40)
+        monkeypatch.setattr(settings, "LARGE_MATRIX_TILE", 16)
+        coords = generate_instance("india", 60, seed=4)["coords"]
+        result = OptimizationEngine(osrm_base=osrm.url).optimize(coords, vehicles=2, time_limit_seconds=1)
+        assert result["strategy"] == "large_instance"
+        assert routes_valid(result["routes"], len(coords))
+        assert result["total_distance_km"] > 0
+        assert result["path"][0] == [tuple(coords[i]) for i in result["routes"][0]]
+    finally:
+        nominatim.stop()
+        osrm.stop()
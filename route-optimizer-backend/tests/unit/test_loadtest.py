@@ -0,0 +1,62 @@
+import asyncio
+import json
+import random
+import time
+import httpx
+from benchmarks.loadtest import parse_weights, percentile, summarize, Workload, run_load
+from app.main import app
+from app.utils.loop_monitor import LoopLagMonitor
+
+def test_parse_weights():
+    assert parse_weights("a:0.6,b:0.4") == [("a", 0.6), ("b", 0.4)]
+    assert parse_weights("10:1,100", int) == [(10, 1.0), (100, 1.0)]
+
+def test_percentile_interpolates():
+    values = [1.0, 2.0, 3.0, 4.0]
+    assert percentile(values, 0.5) == 2.5
+    assert percentile(values, 1.0) == 4.0
+    assert percentile([], 0.99) == 0.0
+
+def test_summarize_counts_errors():
+    records = [("optimize", 10.0, 200), ("optimize", 20.0, 500), ("upload", 5.0, None), ("history", 1.0, 401)]
+    report = summarize(records, elapsed=2.0)
+    assert report["overall"]["requests"] == 4
+    assert report["overall"]["rps"] == 2.0
+    assert report["overall"]["error_rate"] == 0.5
+    assert report["by_kind"]["upload"]["statuses"] == {"transport_error": 1}
+    assert report["by_kind"]["history"]["error_rate"] == 0.0
+
+def test_workload_is_seeded():
+    w = Workload(mix="optimize:1", sizes="10:1", geocode_fraction=0.5, seed=3)
+    a = [w.next_request(random.Random(1))[3]["content"] for _ in range(3)]
+    b = [w.next_request(random.Random(1))[3]["content"] for _ in range(3)]
+    assert a == b
+    stops = json.loads(a[0])["addresses"]
+    assert len(stops) == 10
+    assert any("latitude" not in s for s in stops)
+
+def test_workload_kinds():
+    w = Workload(mix="upload:1,history:1", sizes="10:1")
+    kinds = {w.next_request(random.Random(i))[0] for i in range(20)}
+    assert kinds == {"upload", "history"}
+
+async def test_loop_monitor_reports_lag():
+    monitor = LoopLagMonitor(interval_seconds=0.01)
+    monitor.start()
+    await asyncio.sleep(0.03)
+    time.sleep(0.05)  # block the loop
+    await asyncio.sleep(0.03)
+    monitor.stop()
+    stats = monitor.stats()
+    assert stats["samples"] > 0
+    assert stats["max_ms"] >= 30
+
+async def test_run_load_in_process():
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    workload = Workload(mix="optimize:1,upload:1", sizes="10:1")
+    report = await run_load(
+        "http://test", workload, concurrency=2, duration=0.5, warmup=0.0, transport=transport
+    )
+    assert report["overall"]["requests"] > 0
+    assert report["by_kind"]["optimize"]["statuses"].get("200", 0) > 0
+    assert report["concurrency"] == 2
@@ -0,0 +1,99 @@
+import fcntl
+import multiprocessing
+import os
+import threading
+import numpy as np
+import pytest
+from app.offline.servers import start_offline_services
+from app.services import optimization_engine as engine_module
+from app.services.cache_service import cache_service
+from app.services.matrix_store import SharedMatrixStore, matrix_fingerprint
+from app.services.optimization_engine import OptimizationEngine
+from app.utils.metrics import CACHE_REQUESTS
+
+def _read_in_child(directory, key, queue):
+    matrix = SharedMatrixStore(directory=directory).get(key)
+    queue.put(None if matrix is None else (float(matrix.sum()), isinstance(matrix, np.memmap)))
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedMatrixStore(directory=str(tmp_path), max_bytes=3 * 800)
+
+def test_fingerprint_ignores_float_noise():
+    a = matrix_fingerprint("osrm", [(28.6139, 77.209)])
+    assert a == matrix_fingerprint("osrm", [(28.61390000001, 77.209)])
+    assert a != matrix_fingerprint("haversine_m", [(28.6139, 77.209)])
+
+def test_put_returns_read_only_shared_view(store):
+    matrix = store.put("k", np.arange(100, dtype=np.float64).reshape(10, 10))
+    assert isinstance(matrix, np.memmap)
+    assert not matrix.flags.writeable
+    assert store.get("k")[3][4] == 34
+    assert store.get("missing") is None
+
+def test_other_process_attaches_same_matrix(store):
+    store.put("k", np.ones((10, 10)))
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    child = ctx.Process(target=_read_in_child, args=(store.directory, "k", queue))
+    child.start()
+    child.join(30)
+    assert queue.get(timeout=5) == (100.0, True)
+
+def test_lru_eviction_by_bytes_skips_held(store):
+    for key in ("a", "b", "c"):
+        store.put(key, np.zeros((10, 10)))  # 800 bytes each, store holds 3
+    store.get("a")  # a is now most recently used
+    with store.hold("b"):
+        store.put("d", np.zeros((10, 10)))
+        store.put("e", np.zeros((10, 10)))
+    assert store.get("c") is None  # oldest unreferenced
+    assert store.get("b") is not None
+    stats = store.stats()
+    assert stats["bytes"] <= store.max_bytes
+    assert stats["referenced"] == 0
+
+def test_get_takes_no_lock_and_leaves_index_alone(store):
+    store.put("a", np.zeros((10, 10)))
+    index_mtime = os.stat(store._index_path).st_mtime_ns
+    found = []
+    with open(store._lock_path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # another worker holding the index
+        reader = threading.Thread(target=lambda: found.extend([store.get("a"), store.get("missing")]))
+        reader.start()
+        reader.join(5)
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    assert not reader.is_alive()
+    assert found[0] is not None and found[1] is None
+    assert os.stat(store._index_path).st_mtime_ns == index_mtime
+
+def test_refs_of_dead_workers_are_dropped(store):
+    store.put("a", np.zeros((10, 10)))
+    with store._locked_index() as index:
+        index["a"]["refs"] = {"999999999": 1}
+    for key in ("b", "c", "d"):
+        store.put(key, np.zeros((10, 10)))
+    assert store.get("a") is None
+
+def test_oversized_matrix_stays_private(store):
+    matrix = store.put("big", np.zeros((100, 100)))
+    assert not isinstance(matrix, np.memmap)
+    assert store.stats()["entries"] == 0
+
+def test_engine_reuses_stored_table(store, monkeypatch):
+    nominatim, osrm = start_offline_services(seed=1)
+    try:
+        monkeypatch.setattr(cache_service, "redis_available", False)
+        monkeypatch.setattr(engine_module, "matrix_store", SharedMatrixStore(directory=store.directory))
+        engine = OptimizationEngine(osrm_base=osrm.url)
+        coords = [(28.6139, 77.2090), (28.6145, 77.2100), (28.6150, 77.2110)]
+        hits = CACHE_REQUESTS.value(cache="matrix_store", result="hit")
+        first = engine._osrm_table(coords)
+        second = engine._osrm_table(coords)
+        assert CACHE_REQUESTS.value(cache="matrix_store", result="hit") == hits + 1
+        assert second["matrix_key"] == first["matrix_key"]
+        assert np.array_equal(first["distances"], second["distances"])
+        assert second["distances"][0][1] > 0
+    finally:
+        nominatim.stop()
+        osrm.stop()
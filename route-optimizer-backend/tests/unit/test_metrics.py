@@ -0,0 +1,77 @@
+import threading
+import pytest
+from app.utils import metrics
+from app.utils.metrics import Counter, Gauge, Histogram, Registry
+from app.utils.tracing import begin_trace, current_trace, stage
+
+def test_counter_render():
+    c = Counter("demo_total", "Demo counter", ("kind",))
+    c.inc(kind="a")
+    c.inc(2, kind="a")
+    assert c.value(kind="a") == 3
+    lines = c.render()
+    assert "# TYPE demo_total counter" in lines
+    assert 'demo_total{kind="a"} 3' in lines
+
+def test_gauge_inc_dec_and_collect():
+    g = Gauge("depth", "Queue depth")
+    g.inc()
+    g.inc()
+    g.dec()
+    assert g.value() == 1
+    collected = Gauge("ratio", "Ratio", ("cache",), collect=lambda: {("geo",): 0.75})
+    assert 'ratio{cache="geo"} 0.75' in collected.render()
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("lat_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    h.observe(0.05, stage="solve")
+    h.observe(0.5, stage="solve")
+    h.observe(5.0, stage="solve")
+    lines = h.render()
+    assert 'lat_seconds_bucket{stage="solve",le="0.1"} 1' in lines
+    assert 'lat_seconds_bucket{stage="solve",le="1"} 2' in lines
+    assert 'lat_seconds_bucket{stage="solve",le="+Inf"} 3' in lines
+    assert 'lat_seconds_count{stage="solve"} 3' in lines
+    assert h.sum(stage="solve") == pytest.approx(5.55)
+
+def test_cache_hit_ratio_snapshots_under_lock(monkeypatch):
+    requests = Counter("cache_total", "Cache lookups", ("cache", "result"))
+    monkeypatch.setattr(metrics, "CACHE_REQUESTS", requests)
+    requests.inc(3, cache="geo", result="hit")
+    requests.inc(cache="geo", result="miss")
+    requests.inc(cache="route", result="miss")
+    assert metrics._cache_hit_ratios() == {("geo",): 0.75, ("route",): 0.0}
+
+    result = {}
+    with requests._lock:  # a writer mid-inc()
+        scrape = threading.Thread(target=lambda: result.update(metrics._cache_hit_ratios()))
+        scrape.start()
+        scrape.join(0.1)
+        assert scrape.is_alive()
+    scrape.join(5)
+    assert result == {("geo",): 0.75, ("route",): 0.0}
+
+def test_label_values_escaped():
+    c = Counter("esc_total", "Escaping", ("path",))
+    c.inc(path='a"b')
+    assert 'esc_total{path="a\\"b"} 1' in c.render()
+
+def test_registry_render():
+    r = Registry()
+    r.register(Counter("one_total", "One")).inc()
+    assert r.render().endswith("one_total 1\n")
+
+def test_stage_records_into_trace():
+    trace = begin_trace()
+    with stage("geocode"):
+        pass
+    with stage("solve"):
+        pass
+    with stage("solve"):
+        pass
+    assert current_trace() is trace
+    assert [name for name, _ in trace.stages] == ["geocode", "solve", "solve"]
+    header = trace.server_timing()
+    assert header.startswith("geocode;dur=")
+    assert header.count("solve;dur=") == 1
+    assert "total;dur=" in header
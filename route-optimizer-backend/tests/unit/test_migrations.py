@@ -0,0 +1,51 @@
+from pathlib import Path
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect
+from app.database.models import Base
+
+ROOT = Path(__file__).resolve().parents[2]
+
+def _config(url):
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    return config
+
+def _schema_diff(engine):
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn, opts={"compare_type": False})
+        return compare_metadata(context, Base.metadata)
+
+def test_upgrade_old_database_matches_models(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    command.upgrade(_config(url), "0001_initial")  # the schema before the address book
+    engine = create_engine(url)
+    assert "external_id" not in {c["name"] for c in inspect(engine).get_columns("addresses")}
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE INDEX ix_routes_user_date ON routes (user_id, optimization_date)")  # pre-cursor
+    command.upgrade(_config(url), "head")
+    assert _schema_diff(engine) == []
+    index = next(i for i in inspect(engine).get_indexes("routes") if i["name"] == "ix_routes_user_date")
+    assert index["column_names"] == ["user_id", "optimization_date", "id"]
+    engine.dispose()
+
+def test_upgrade_after_create_all_is_a_no_op(tmp_path):
+    url = f"sqlite:///{tmp_path / 'new.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    command.upgrade(_config(url), "head")
+    assert _schema_diff(engine) == []
+    engine.dispose()
+
+def test_committed_local_database_is_at_head():
+    # run_local.py's DATABASE_URL
+    engine = create_engine(f"sqlite:///{ROOT / 'route_optimizer.db'}")
+    with engine.connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+    assert current == ScriptDirectory.from_config(_config("sqlite://")).get_current_head()
+    assert _schema_diff(engine) == []
+    engine.dispose()
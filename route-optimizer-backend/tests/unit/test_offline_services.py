@@ -0,0 +1,90 @@
+import pytest
+import requests
+from app.offline import geometry
+from app.offline.servers import start_offline_services, LatencyModel, FaultModel
+from app.services.geocoder import GeocoderService
+from app.services.optimization_engine import OptimizationEngine
+from app.services.cache_service import cache_service
+from app.models.address import AddressInput
+
+@pytest.fixture(scope="module")
+def services():
+    nominatim, osrm = start_offline_services(seed=3)
+    yield nominatim, osrm
+    nominatim.stop()
+    osrm.stop()
+
+def test_geocode_is_deterministic():
+    a = geometry.geocode("12 MG Road, Bengaluru")
+    b = geometry.geocode("12  mg road, bengaluru")
+    assert (a["lat"], a["lon"]) == (b["lat"], b["lon"])
+    lat, lng = float(a["lat"]), float(a["lon"])
+    assert abs(lat - 12.9716) <= geometry.CITY_SPREAD_DEG
+    assert abs(lng - 77.5946) <= geometry.CITY_SPREAD_DEG
+
+def test_geocode_not_found_rate():
+    assert geometry.geocode("anything", not_found_rate=1.0) is None
+
+def test_table_is_symmetric_road_distance():
+    coords = [(28.61, 77.20), (28.62, 77.21), (28.63, 77.19)]
+    t = geometry.table(coords)
+    assert t["distances"][0][0] == 0
+    assert t["distances"][0][1] == t["distances"][1][0]
+    sub = geometry.table(coords, sources=[0], destinations=[1, 2])
+    assert sub["distances"] == [t["distances"][0][1:]]
+
+def test_latency_models():
+    assert LatencyModel.parse("constant:25").sample_ms() == 25
+    u = LatencyModel.parse("uniform:10:20", seed=1)
+    assert all(10 <= u.sample_ms() <= 20 for _ in range(50))
+    assert LatencyModel.parse("none").sample_ms() == 0
+    with pytest.raises(ValueError):
+        LatencyModel.parse("pareto:1")
+
+def test_fault_model_error_rate():
+    faults = FaultModel(error_rate=1.0)
+    assert faults.next()[1] is True
+    assert faults.errors == 1
+
+def test_nominatim_search(services):
+    nominatim, _ = services
+    r = requests.get(f"{nominatim.url}/search", params={"q": "5 Park Street, Kolkata", "format": "json"})
+    assert r.status_code == 200
+    assert float(r.json()[0]["lat"]) == pytest.approx(22.5726, abs=0.1)
+
+def test_osrm_table_and_route(services):
+    _, osrm = services
+    coords = "77.2090,28.6139;77.2100,28.6145;77.2110,28.6150"
+    table = requests.get(f"{osrm.url}/table/v1/driving/{coords}?annotations=distance,duration").json()
+    assert len(table["distances"]) == 3
+    route = requests.get(f"{osrm.url}/route/v1/driving/{coords}?overview=full&geometries=geojson").json()
+    assert route["code"] == "Ok"
+    assert len(route["routes"][0]["legs"]) == 2
+    assert route["routes"][0]["geometry"]["coordinates"][0] == [77.2090, 28.6139]
+
+def test_injected_errors():
+    nominatim, osrm = start_offline_services(error_rate=1.0)
+    try:
+        r = requests.get(f"{osrm.url}/table/v1/driving/77.2,28.6;77.3,28.7")
+        assert r.status_code == 503
+        assert osrm.faults.errors == 1
+    finally:
+        nominatim.stop()
+        osrm.stop()
+
+def test_geocoder_against_stand_in(services):
+    nominatim, _ = services
+    service = GeocoderService(nominatim_url=nominatim.url, min_delay_seconds=0)
+    result = service.geocode_address(AddressInput(id=1, name="A", street="10 Linking Road", city="Mumbai"))
+    assert result.latitude == pytest.approx(19.0760, abs=0.1)
+
+def test_engine_against_stand_in(services, monkeypatch):
+    _, osrm = services
+    monkeypatch.setattr(cache_service, "redis_available", False)
+    engine = OptimizationEngine(osrm_base=osrm.url)
+    engine._ortools_available = False
+    coords = [(28.6139, 77.2090), (28.6145, 77.2100), (28.6150, 77.2110), (28.6200, 77.2000)]
+    result = engine.optimize(coords, vehicles=1)
+    assert sorted(result["routes"][0][:-1]) == [0, 1, 2, 3]
+    assert result["total_distance_km"] > 0
+    assert len(result["path"][0]) > len(coords)
@@ -0,0 +1,87 @@
+import logging
+import pytest
+from app.services.portfolio_solver import PortfolioSolver, DEFAULT_STRATEGIES
+from app.config import settings
+from app.services.optimization_engine import OptimizationEngine
+from app.services.route_optimizer import RouteOptimizer
+from app.models.address import AddressWithCoordinates
+
+@pytest.fixture(scope="module")
+def solver():
+    s = PortfolioSolver(max_workers=2, strategies=DEFAULT_STRATEGIES[:2])
+    yield s
+    s.shutdown()
+
+@pytest.fixture
+def distances():
+    # 8 points on a line: the optimal closed tour costs 2 * 7 * 100
+    return [[abs(i - j) * 100 for j in range(8)] for i in range(8)]
+
+def test_solve_returns_best(solver, distances):
+    result = solver.solve(distances, vehicles=1, depot_index=0, time_limit_seconds=1)
+    assert result is not None
+    route = result["routes"][0]
+    assert route[0] == 0 and route[-1] == 0
+    assert sorted(route[:-1]) == list(range(8))
+    assert result["objective"] == 1400
+    assert result["strategy"] in {f"{a}+{b}" for a, b in DEFAULT_STRATEGIES[:2]}
+    assert result["objective"] == min(result["objectives"].values())
+    assert result["telemetry"]["strategy"] == result["strategy"]
+    assert result["telemetry"]["solutions"] >= 1
+
+def test_solve_multiple_vehicles(solver, distances):
+    result = solver.solve(distances, vehicles=2, depot_index=0, time_limit_seconds=1)
+    assert len(result["routes"]) == 2
+    visited = [n for r in result["routes"] for n in r[1:-1]]
+    assert sorted(visited) == list(range(1, 8))
+
+def test_winner_logged(solver, distances, caplog):
+    with caplog.at_level(logging.INFO, logger="app.services.portfolio_solver"):
+        solver.solve(distances, time_limit_seconds=1, tag="customer-42")
+    assert any("Portfolio winner [customer-42]" in r.message for r in caplog.records)
+
+def test_unavailable_returns_none(distances):
+    s = PortfolioSolver(max_workers=1)
+    s.available = False
+    assert s.solve(distances) is None
+
+def test_route_optimizer_portfolio_mode(solver, monkeypatch):
+    monkeypatch.setattr("app.services.route_optimizer.portfolio_solver", solver)
+    optimizer = RouteOptimizer(timeout_seconds=1, use_portfolio=True)
+    addresses = [
+        AddressWithCoordinates(
+            id=i, name=f"Stop{i}", street=f"Street{i}", city="Delhi",
+            latitude=28.6139 + (i * 0.001), longitude=77.2090 + (i * 0.001)
+        )
+        for i in range(5)
+    ]
+    route, dist, time_ms = optimizer.optimize(addresses)
+    assert route[0] == 0 and route[-1] == 0
+    assert set(route[:-1]) == set(range(5))
+    assert dist > 0
+
+def test_callers_tag_and_cap_the_portfolio(monkeypatch, distances):
+    calls = []
+    class FakePortfolio:
+        available = True
+        def solve(self, distances, vehicles, depot_index, time_limit_seconds, tag=None):
+            calls.append((time_limit_seconds, tag))
+            return {"routes": [list(range(len(distances))) + [0]] * vehicles, "objective": 0, "strategy": "fake"}
+    monkeypatch.setattr("app.services.route_optimizer.portfolio_solver", FakePortfolio())
+    monkeypatch.setattr("app.services.optimization_engine.portfolio_solver", FakePortfolio())
+    monkeypatch.setattr(settings, "PORTFOLIO_TIME_LIMIT", 3)
+
+    addresses = [
+        AddressWithCoordinates(id=i, name=f"S{i}", street="x", city="Delhi",
+                               latitude=28.61 + i * 0.01, longitude=77.20)
+        for i in range(4)
+    ]
+    RouteOptimizer(timeout_seconds=30, use_portfolio=True).optimize(addresses, tag="req-1")
+
+    engine = OptimizationEngine()
+    engine._ortools_available = True
+    monkeypatch.setattr(engine, "_osrm_table", lambda coords: {"distances": distances})
+    monkeypatch.setattr(engine, "_osrm_route", lambda coords: None)
+    coords = [(28.61 + i * 0.01, 77.20) for i in range(8)]
+    assert engine.optimize(coords, time_limit_seconds=10, portfolio=True, tag="req-2")["strategy"] == "fake"
+    assert calls == [(3, "req-1"), (3, "req-2")]
@@ -0,0 +1,118 @@
+import time
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.routers import profiles
+from app.utils import profiler
+from app.utils.profiler import ProfileStore, RequestProfiler, StackSampler, profiling_middleware, request_id
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    blocks = []
+    while time.perf_counter() < end:
+        blocks.append(bytearray(1024))
+    return len(blocks)
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(profiler, "profile_store", ProfileStore(max_items=2, directory=str(tmp_path)))
+    monkeypatch.setattr(profiles, "profile_store", profiler.profile_store)
+    app = FastAPI()
+    app.middleware("http")(profiling_middleware)
+    app.include_router(profiles.router)
+
+    @app.post("/api/optimize")
+    async def optimize(request: Request):
+        return {"request_id": request_id(request), "blocks": _busy(0.1)}
+
+    @app.get("/api/other")
+    async def other():
+        return {}
+
+    return TestClient(app)
+
+def test_sampler_sees_busy_frames():
+    sampler = StackSampler(interval=0.002)
+    sampler.start()
+    _busy(0.1)
+    sampler.stop()
+    assert sampler.samples > 0
+    assert "_busy (unit/test_profiler.py" in sampler.collapsed()
+
+def test_request_profiler_reports_allocations():
+    p = RequestProfiler(interval=0.002)
+    p.start()
+    keep = [bytearray(4096) for _ in range(500)]
+    result = p.stop()
+    assert len(keep) == 500
+    assert result["peak_traced_kb"] >= 1000
+    assert any("test_profiler.py" in a["site"] for a in result["allocations"])
+
+def test_store_evicts_and_mirrors_to_disk(tmp_path):
+    store = ProfileStore(max_items=1, directory=str(tmp_path))
+    store.save("a", {"collapsed": "main 1"})
+    assert (tmp_path / "a.collapsed").read_text() == "main 1"
+    assert ProfileStore(directory=str(tmp_path)).get("a") == {"collapsed": "main 1"}  # read from disk
+    store.save("b", {"collapsed": "main 2"})
+    assert store.get("a") is None  # evicted from memory and pruned from disk
+    assert store.get("../a") is None
+
+def test_store_is_shared_between_workers_and_pruned(tmp_path):
+    writer, reader = ProfileStore(max_items=2, directory=str(tmp_path)), ProfileStore(directory=str(tmp_path))
+    for i, name in enumerate("abc"):
+        writer.save(name, {"collapsed": f"main {i}"})
+        time.sleep(0.01)  # distinct mtimes
+    assert reader.get("c") == {"collapsed": "main 2"}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["b.collapsed", "b.json", "c.collapsed", "c.json"]
+
+def test_default_store_is_on_disk():
+    assert profiler.profile_store.directory == (settings.PROFILE_DIR or profiler.default_profile_dir())
+
+def test_unprofiled_requests_pass_through(client):
+    response = client.post("/api/optimize")
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/api/other", headers={"X-Profile": "1", "X-Admin-Key": "secret"}).status_code == 200
+
+def test_profile_requires_admin_key(client):
+    assert client.post("/api/optimize", headers={"X-Profile": "1"}).status_code == 403
+    assert client.post("/api/optimize", headers={"X-Profile": "1", "X-Admin-Key": "nope"}).status_code == 403
+
+def test_profiled_request_is_retrievable(client):
+    response = client.post(
+        "/api/optimize", headers={"X-Profile": "1", "X-Admin-Key": "secret", "X-Request-ID": "slow-1"}
+    )
+    assert response.status_code == 200
+    # Named by the client's header; the request_id stays server-generated
+    assert response.headers["X-Profile-Id"] == "slow-1" != response.json()["request_id"]
+
+    profile = client.get("/api/profiles/slow-1", headers={"X-Admin-Key": "secret"}).json()
+    assert profile["request_id"] == response.json()["request_id"]
+    assert profile["path"] == "/api/optimize"
+    assert profile["samples"] > 0
+    assert profile["allocations"]
+
+    folded = client.get("/api/profiles/slow-1?format=collapsed", headers={"X-Admin-Key": "secret"})
+    assert "_busy" in folded.text
+    assert client.get("/api/profiles/slow-1").status_code == 403
+    assert client.get("/api/profiles/missing", headers={"X-Admin-Key": "secret"}).status_code == 404
+
+def test_generated_profile_id_is_the_request_id(client):
+    response = client.post("/api/optimize", headers={"X-Profile": "1", "X-Admin-Key": "secret"})
+    profile_id = response.json()["request_id"]
+    assert response.headers["X-Profile-Id"] == profile_id
+    assert client.get(f"/api/profiles/{profile_id}", headers={"X-Admin-Key": "secret"}).status_code == 200
+
+def test_optimize_request_id_ignores_client_header():
+    from app.main import app
+    payload = {"addresses": [
+        {"id": i, "name": f"Stop{i}", "street": f"Street{i}", "city": "Delhi",
+         "latitude": 28.6139 + i * 0.001, "longitude": 77.2090 + i * 0.001}
+        for i in range(3)
+    ]}
+    client = TestClient(app)
+    ids = {client.post("/api/optimize", json=payload, headers={"X-Request-ID": "trace-42"}).json()["request_id"]
+           for _ in range(2)}
+    assert len(ids) == 2 and "trace-42" not in ids
@@ -0,0 +1,129 @@
+import json
+import pytest
+from benchmarks.regression import (BASELINE_PATH, compare, format_table, merge_baseline, summarize, time_callable,
+                                  run_gate_cases, main)
+from app.services.cache_service import cache_service
+
+def _run(median, mad=0.0):
+    return {"median_ms": median, "mad_ms": mad, "runs": [median]}
+
+@pytest.fixture
+def baseline():
+    return {
+        "calibration": _run(10.0),
+        "cases": {"a": _run(100.0, 1.0), "b": _run(50.0, 0.5), "gone": _run(5.0)},
+    }
+
+def test_summarize_median_and_mad():
+    s = summarize([1.0, 2.0, 3.0, 100.0])
+    assert s["median_ms"] == 2.5
+    assert s["mad_ms"] == 1.0
+
+def test_time_callable_repeats():
+    calls = []
+    times = time_callable(lambda: calls.append(1), repeats=3, warmup=2)
+    assert len(times) == 3
+    assert len(calls) == 5
+
+def test_compare_statuses(baseline):
+    current = {
+        "calibration": _run(10.0),
+        "cases": {"a": _run(130.0, 1.0), "b": _run(30.0, 0.5), "new": _run(1.0)},
+    }
+    rows = {r["case"]: r for r in compare(baseline, current)}
+    assert rows["a"]["status"] == "regression"
+    assert rows["a"]["change_percent"] == 30.0
+    assert rows["b"]["status"] == "improved"
+    assert rows["new"]["status"] == "new"
+    assert rows["gone"]["status"] == "missing"
+
+def test_compare_within_noise(baseline):
+    # 20% slower, but the MAD says this case jitters by far more than that
+    current = {"calibration": _run(10.0), "cases": {"a": _run(120.0, 15.0)}}
+    rows = {r["case"]: r for r in compare(baseline, current)}
+    assert rows["a"]["status"] == "ok"
+
+def test_compare_normalizes_machine_speed(baseline):
+    # Whole machine is 2x slower: calibration and case both double
+    current = {"calibration": _run(20.0), "cases": {"a": _run(200.0, 1.0)}}
+    rows = {r["case"]: r for r in compare(baseline, current)}
+    assert rows["a"]["status"] == "ok"
+    rows = {r["case"]: r for r in compare(baseline, current, normalize=False)}
+    assert rows["a"]["status"] == "regression"
+
+def test_format_table(baseline):
+    current = {"calibration": _run(10.0), "cases": {"a": _run(130.0, 1.0)}}
+    table = format_table(compare(baseline, current), speed=1.0)
+    assert "REGRESSION" in table
+    assert "+30.0%" in table
+
+def test_format_table_pads_missing_values(baseline):
+    current = {"calibration": _run(10.0), "cases": {"a": _run(130.0, 1.0), "b": _run(50.0, 0.5)}}
+    lines = format_table(compare(baseline, current)).splitlines()
+    gone = next(line for line in lines if line.startswith("gone"))
+    assert gone.index("MISSING") == lines[2].index("REGRESSION")
+    assert gone.split()[1:5] == ["5.00", "-", "-", "-"]
+
+def test_merge_baseline_keeps_other_cases(baseline):
+    current = {"calibration": _run(20.0), "cases": {"b": _run(90.0, 1.0)}, "meta": {"repeats": 2}}
+    merged = merge_baseline(baseline, current)
+    assert merged["calibration"] == current["calibration"] and merged["meta"] == {"repeats": 2}
+    assert merged["cases"]["b"] == current["cases"]["b"]
+    # Kept cases move to the new calibration: this machine is 2x slower
+    assert merged["cases"]["a"]["median_ms"] == 200.0 and merged["cases"]["a"]["mad_ms"] == 2.0
+    assert merged["cases"]["gone"]["runs"] == [10.0]
+
+def test_run_gate_cases_subset():
+    result = run_gate_cases(repeats=2, names=["distance_calculator.route_distance_1000"])
+    assert list(result["cases"]) == ["distance_calculator.route_distance_1000"]
+    assert result["calibration"]["median_ms"] > 0
+
+def test_main_exit_codes(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_service, "redis_available", False)
+    path = tmp_path / "baseline.json"
+    case = "distance_calculator.route_distance_1000"
+    assert main(["--baseline", str(path), "--cases", case, "--repeats", "2", "--update-baseline"]) == 0
+    assert main(["--baseline", str(path), "--cases", case, "--repeats", "2", "--tolerance", "5"]) == 0
+
+    data = json.loads(path.read_text())
+    data["cases"][case] = _run(0.001)
+    path.write_text(json.dumps(data))
+    assert main(["--baseline", str(path), "--cases", case, "--repeats", "2", "--no-normalize"]) == 1
+
+def test_main_cases_subset(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_service, "redis_available", False)
+    path = tmp_path / "baseline.json"
+    case = "distance_calculator.route_distance_1000"
+    other = {"calibration": _run(10.0), "cases": {"upload.parse_csv_1000": _run(1.0)}}
+    path.write_text(json.dumps(other))
+    # Updating a subset merges into the file instead of replacing it
+    assert main(["--baseline", str(path), "--cases", case, "--repeats", "2", "--update-baseline"]) == 0
+    data = json.loads(path.read_text())
+    assert sorted(data["cases"]) == [case, "upload.parse_csv_1000"]
+    assert data["calibration"]["median_ms"] > 0
+    # ...and gating a subset does not report the unselected cases as missing
+    assert main(["--baseline", str(path), "--cases", case, "--repeats", "2", "--tolerance", "5"]) == 0
+
+def test_main_remeasures_suspected_regressions(tmp_path, monkeypatch):
+    from benchmarks import regression
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"calibration": _run(10.0), "cases": {"a": _run(100.0)}}))
+    calls = []
+    def fake_runs(*medians):
+        runs = iter(medians)
+        def run(repeats, names=None):
+            calls.append(names)
+            return {"calibration": _run(10.0), "cases": {"a": _run(next(runs))}}
+        monkeypatch.setattr(regression, "run_gate_cases", run)
+    fake_runs(200.0, 101.0)  # one noisy run
+    assert main(["--baseline", str(path), "--cases", "a"]) == 0
+    assert calls == [["a"], ["a"]]
+    fake_runs(200.0, 190.0)  # slow both times
+    assert main(["--baseline", str(path), "--cases", "a"]) == 1
+    fake_runs(200.0)
+    assert main(["--baseline", str(path), "--cases", "a", "--confirm-runs", "0"]) == 1
+
+def test_committed_baseline_passes(monkeypatch):
+    # The unchanged tree must pass its own gate, noisy cases included
+    monkeypatch.setattr(cache_service, "redis_available", False)
+    assert main(["--baseline", str(BASELINE_PATH)]) == 0
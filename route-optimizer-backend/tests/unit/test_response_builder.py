@@ -0,0 +1,38 @@
+import json
+import orjson
+from fastapi.responses import ORJSONResponse
+from app.models.address import AddressWithCoordinates
+from app.models.optimization_result import OptimizationResponse
+from app.models.stop_set import StopSet
+from app.services.response_builder import build_optimization_payload, build_optimization_response
+
+def _addresses(n):
+    return [
+        AddressWithCoordinates(
+            id=i, name=f"Stop{i}", street=f"Street{i}", city="Delhi",
+            latitude=28.6139 + (i * 0.001), longitude=77.2090 + (i * 0.001)
+        )
+        for i in range(n)
+    ]
+
+def test_fast_payload_serializes_like_validated_model():
+    stops = StopSet.from_addresses(_addresses(50))
+    route = list(range(50)) + [0]
+    payload = build_optimization_payload("r1", stops, route, 123.4, 7)
+    fast = json.loads(ORJSONResponse(payload).body)
+    validated = json.loads(OptimizationResponse.model_validate(payload).model_dump_json())
+    assert fast == validated
+    assert len(fast["route"]["stops"]) == 50
+    assert fast["route"]["stops"][0]["address_id"] == 0
+
+def test_validated_response_still_available():
+    stops = StopSet.from_addresses(_addresses(5))
+    resp = build_optimization_response("r2", stops, [0, 2, 1, 4, 3, 0], 10.0, 1)
+    assert isinstance(resp, OptimizationResponse)
+    assert [s.address_id for s in resp.route.stops] == [0, 2, 1, 4, 3]
+    assert abs(resp.metrics.cost_saved_inr - 36.0) < 1e-9
+
+def test_payload_is_orjson_native():
+    payload = build_optimization_payload("r3", StopSet.from_addresses(_addresses(3)), [0, 1, 2, 0], 1.0, 0)
+    # No default= hook needed: everything is a builtin type or datetime
+    assert orjson.loads(orjson.dumps(payload))["route"]["total_distance_km"] == 1.0
@@ -0,0 +1,148 @@
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.main import app
+from app.database import rollups
+from app.database.connection import get_async_db
+from app.database.crud import CRUDOptimization, CRUDRoute, CRUDStats, CRUDUser
+from app.database.models import Base, User, UserStatsRollup
+
+def _rollups(db, user_id=None):
+    query = select(UserStatsRollup).order_by(UserStatsRollup.user_id, UserStatsRollup.period,
+                                             UserStatsRollup.period_start)
+    if user_id is not None:
+        query = query.where(UserStatsRollup.user_id == user_id)
+    return [(r.user_id, r.period, r.period_start, r.route_count, round(r.total_distance_km, 6),
+             round(r.total_cost_inr, 6), round(r.cost_saved_inr, 6), r.optimization_count, r.computation_time_ms)
+            for r in db.execute(query).scalars()]
+
+def _history_routes(now):
+    # Spread over several days and months, two users
+    return [{"route_id": f"r{u}-{i}", "user_id": u, "total_distance_km": 5.0 + i, "total_cost_inr": 60.0 + i,
+             "cost_saved_inr": 0.5 * i, "route_data": "{}", "optimization_date": now - timedelta(days=9 * i)}
+            for u in (1, 2) for i in range(30)]
+
+def test_crud_writes_update_rollups(db):
+    CRUDRoute.create(db, "a", 1, 10.0, 120.0, 3.0, "{}")
+    CRUDRoute.create(db, "b", 1, 5.0, 60.0, 1.0, "{}")
+    CRUDOptimization.create(db, "q", 1, addresses_count=5, computation_time_ms=40, quality_score=1.0)
+    today = datetime.utcnow().date()
+    assert _rollups(db) == [
+        (1, "day", today, 2, 15.0, 180.0, 4.0, 1, 40),
+        (1, "month", today.replace(day=1), 2, 15.0, 180.0, 4.0, 1, 40),
+    ]
+    assert CRUDRoute.delete(db, "a", 1)
+    assert _rollups(db)[1] == (1, "month", today.replace(day=1), 1, 5.0, 60.0, 1.0, 1, 40)
+    assert CRUDStats.get_user_stats(db, 1) == CRUDRoute.get_user_stats(db, 1)
+
+def test_rollup_deltas_roll_back_with_the_rows(db):
+    rollups.apply(db, rollups.route_deltas([{"user_id": 1, "optimization_date": datetime.utcnow(),
+                                              "total_distance_km": 1.0}]))
+    db.rollback()
+    assert _rollups(db) == []
+
+def test_bulk_inserts_match_backfill(db):
+    now = datetime.utcnow()
+    CRUDRoute.create_many(db, _history_routes(now))
+    CRUDOptimization.create_many(db, [
+        {"request_id": f"q{i}", "user_id": 1, "addresses_count": 3, "computation_time_ms": 10 * i,
+         "quality_score": 0.0, "created_at": now - timedelta(days=20 * i)} for i in range(10)
+    ])
+    incremental = _rollups(db)
+    assert len(incremental) > 30
+    assert rollups.backfill(db) == len(incremental)
+    assert _rollups(db) == incremental
+    for user_id in (1, 2):
+        assert CRUDStats.get_user_stats(db, user_id) == CRUDRoute.get_user_stats(db, user_id)
+
+def test_backfill_one_user_repairs_drift(db):
+    CRUDRoute.create_many(db, _history_routes(datetime.utcnow()))
+    expected = _rollups(db)
+    db.execute(delete(UserStatsRollup).where(UserStatsRollup.user_id == 1, UserStatsRollup.period == "day"))
+    db.commit()
+    rollups.backfill(db, user_id=1)
+    assert _rollups(db) == expected
+
+def test_stats_fall_back_to_routes_without_rollups(db):
+    CRUDRoute.create_many(db, _history_routes(datetime.utcnow()))
+    db.execute(delete(UserStatsRollup))  # as on a database that predates the rollups
+    db.commit()
+    assert CRUDStats.get_user_stats(db, 1) == CRUDRoute.get_user_stats(db, 1)
+    assert CRUDStats.get_user_stats(db, 1)["total_routes"] == 30
+    assert CRUDStats.get_user_stats(db, 99)["total_routes"] == 0
+
+def test_stats_ignore_rollups_until_backfilled(db):
+    # A user from before the rollups: old routes, no rollups, no backfill stamp
+    db.add(User(id=1, business_name="Old Co", api_key="old_key"))
+    db.commit()
+    CRUDRoute.create_many(db, [r for r in _history_routes(datetime.utcnow()) if r["user_id"] == 1])
+    db.execute(delete(UserStatsRollup))
+    db.commit()
+    # One new route only puts that route into the rollups
+    CRUDRoute.create(db, "new", 1, 10.0, 120.0, 3.0, "{}")
+    assert not rollups.is_backfilled(db, 1)
+    assert CRUDStats.get_user_stats(db, 1) == CRUDRoute.get_user_stats(db, 1)
+    assert CRUDStats.get_user_stats(db, 1)["total_routes"] == 31
+
+    rollups.backfill(db, user_id=1)
+    assert rollups.is_backfilled(db, 1)
+    assert CRUDStats.get_user_stats(db, 1) == CRUDRoute.get_user_stats(db, 1)
+    assert rollups.totals(db, 1)["route_count"] == 31
+
+def test_new_users_read_rollups_without_backfill(db):
+    user = CRUDUser.create(db, "New Co", "Dev", "new@example.com", "+919800000006", "new_key")
+    assert rollups.is_backfilled(db, user.id)
+    CRUDRoute.create(db, "n1", user.id, 10.0, 120.0, 3.0, "{}")
+    assert CRUDStats.get_user_stats(db, user.id)["total_routes"] == 1
+
+def test_analytics_and_timeseries_endpoints(tmp_path):
+    pytest.importorskip("aiosqlite")
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    CRUDUser.create(db, "Rollup Co", "Dev", "dev@example.com", "+919800000003", "rollup_key")
+    now = datetime.utcnow()
+    CRUDRoute.create_many(db, [r for r in _history_routes(now) if r["user_id"] == 1])
+    expected_stats = CRUDRoute.get_user_stats(db, 1)
+    db.close()
+
+    async_sessions = async_sessionmaker(
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}", poolclass=NullPool),
+        expire_on_commit=False)
+
+    async def override_db():
+        async with async_sessions() as session:
+            yield session
+    app.dependency_overrides[get_async_db] = override_db
+    try:
+        client = TestClient(app)
+        analytics = client.get("/api/history/analytics", params={"api_key": "rollup_key"}).json()
+        assert analytics["analytics"] == expected_stats
+
+        months = client.get("/api/history/timeseries", params={"api_key": "rollup_key"}).json()
+        assert months["period"] == "month"
+        assert months["series"][-1]["period_start"] == now.date().replace(day=1).isoformat()
+        assert len(months["series"]) <= 12
+        assert sum(m["routes"] for m in months["series"]) == sum(
+            1 for i in range(30) if (now - timedelta(days=9 * i)).date() >= datetime.fromisoformat(months["start"]).date())
+
+        start = (now - timedelta(days=20)).date()
+        days = client.get("/api/history/timeseries", params={
+            "api_key": "rollup_key", "period": "day", "start": start.isoformat()}).json()["series"]
+        assert [d["period_start"] for d in days] == [
+            (now - timedelta(days=9 * i)).date().isoformat() for i in (2, 1, 0)]
+        assert days[-1] == {"period_start": now.date().isoformat(), "routes": 1, "total_distance_km": 5.0,
+                            "total_cost_inr": 60.0, "cost_saved_inr": 0.0, "optimizations": 0,
+                            "computation_time_ms": 0}
+
+        bad = client.get("/api/history/timeseries", params={"api_key": "rollup_key", "start": "2026-02-01",
+                                                             "end": "2026-01-01"})
+        assert bad.status_code == 400
+        assert client.get("/api/history/timeseries", params={"api_key": "nope"}).status_code == 401
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        engine.dispose()
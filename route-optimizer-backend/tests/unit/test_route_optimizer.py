@@ -73,3 +73,7 @@ def test_all_addresses_visited(optimizer, addresses):
     # First element is depot, last is return to depot
     assert set(route[:-1]) == {0, 1, 2}
     assert route.count(0) == 2  # Start and end at depot
+
+def test_optimize_stop_set_matches_models(optimizer, addresses):
+    from app.models.stop_set import StopSet
+    assert optimizer.optimize(StopSet.from_addresses(addresses))[:2] == optimizer.optimize(addresses)[:2]
@@ -0,0 +1,156 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.main import app
+from app.database.connection import get_async_db
+from app.database.crud import CRUDUser, CRUDOptimization
+from app.database.models import Base
+from app.models.address import AddressWithCoordinates
+from app.routers import optimize as optimize_router
+from app.services import solver_telemetry
+from app.services.optimization_engine import OptimizationEngine
+from app.services.route_optimizer import RouteOptimizer
+from app.services.solver_telemetry import SolveTelemetry
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "telemetry.db"
+
+@pytest.fixture
+def session_factory(db_path):
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+@pytest.fixture
+def user(session_factory):
+    db = session_factory()
+    user = CRUDUser.create(db, "Telemetry Co", "Asha", "asha@example.com", "+919800000000", "telemetry_key")
+    db.close()
+    return user
+
+def test_records_only_improvements():
+    t = SolveTelemetry()
+    for objective in (100, 120, 90, 90, 80):
+        t.record_solution(objective)
+    t.finish(reason="local_optimum")
+    assert t.solutions == 5
+    assert [p[1] for p in t.improvements] == [100, 90, 80]
+    assert t.first_solution_ms is not None
+    assert t.improvement_percent() == 20.0
+
+def test_round_trip_and_cap(monkeypatch):
+    monkeypatch.setattr(solver_telemetry, "MAX_IMPROVEMENTS", 4)
+    t = SolveTelemetry(strategy="SAVINGS+TABU_SEARCH")
+    for objective in range(100, 90, -1):
+        t.record_solution(objective)
+    data = t.finish(reason="time_limit").to_dict()
+    assert len(data["improvements"]) == 4
+    assert data["improvements"][0][1] == 100 and data["improvements"][-1][1] == 91
+    restored = SolveTelemetry.from_dict(data)
+    assert restored.stop_reason == "time_limit"
+    assert restored.strategy == "SAVINGS+TABU_SEARCH"
+    assert restored.solutions == 10
+
+def test_guided_local_search_trace():
+    distances = [[abs(i - j) * 100 for j in range(8)] for i in range(8)]
+    t = SolveTelemetry()
+    routes = OptimizationEngine()._guided_local_search_vrp(distances, 1, 0, 1, telemetry=t)
+    assert routes
+    assert t.solutions >= 1
+    assert t.final_objective == 1400
+    # GLS never proves optimality, so it runs until the time limit
+    assert t.stop_reason == "time_limit"
+    assert "branches" in t.to_dict()
+
+def test_nearest_neighbor_trace():
+    addresses = [
+        AddressWithCoordinates(id=i, name=f"S{i}", street="x", city="Delhi",
+                               latitude=28.61 + i * 0.01, longitude=77.20)
+        for i in range(5)
+    ]
+    optimizer = RouteOptimizer(use_portfolio=False)
+    optimizer._ortools_available = False
+    t = SolveTelemetry()
+    route, dist, _ = optimizer.optimize(addresses, telemetry=t)
+    assert t.stop_reason == "heuristic"
+    assert t.strategy == "nearest_neighbor"
+    assert t.final_objective == int(dist * 1000)
+
+def test_ortools_route_trace():
+    addresses = [
+        AddressWithCoordinates(id=i, name=f"S{i}", street="x", city="Delhi",
+                               latitude=28.61 + (i % 3) * 0.01, longitude=77.20 + (i // 3) * 0.01)
+        for i in range(9)
+    ]
+    optimizer = RouteOptimizer(timeout_seconds=5, use_portfolio=False)
+    assert optimizer._ortools_available  # ortools.constraint_solver, as pinned
+    t = SolveTelemetry()
+    route, dist, _ = optimizer.optimize(addresses, telemetry=t)
+    assert sorted(route[:-1]) == list(range(9)) and route[0] == route[-1] == 0
+    assert t.strategy == "PATH_CHEAPEST_ARC"
+    assert t.stop_reason == "local_optimum"
+    assert t.solutions >= 1 and "branches" in t.to_dict()
+
+def test_crud_stores_compact_trace(session_factory, user):
+    db = session_factory()
+    t = SolveTelemetry()
+    t.record_solution(10)
+    CRUDOptimization.create(db, "req-1", user.id, 5, 12, 0.0, solver_trace=t.finish(reason="heuristic").to_dict())
+    assert " " not in CRUDOptimization.get_by_request_id(db, "req-1").solver_trace
+    assert CRUDOptimization.get_solver_trace(db, "req-1", user.id)["stop"] == "heuristic"
+    assert CRUDOptimization.get_solver_trace(db, "req-1", user.id + 1) is None
+    db.close()
+
+def test_optimize_with_telemetry_round_trip(session_factory, db_path, user, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    # /api/history reads through the async engine; the optimizer writes through SessionLocal
+    async_sessions = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool),
+                                        expire_on_commit=False)
+
+    async def override_db():
+        async with async_sessions() as db:
+            yield db
+    monkeypatch.setattr(optimize_router, "SessionLocal", session_factory)
+    app.dependency_overrides[get_async_db] = override_db
+    try:
+        client = TestClient(app)
+        payload = {"addresses": [
+            {"id": i, "name": f"Stop{i}", "street": f"Street{i}", "city": "Delhi",
+             "latitude": 28.6139 + i * 0.001, "longitude": 77.2090 + i * 0.001}
+            for i in range(5)
+        ]}
+        assert client.post("/api/optimize?telemetry=true", json=payload).status_code == 400
+        # A reused X-Request-Id must not collide in optimization_history
+        request_ids = [
+            client.post("/api/optimize?telemetry=true&api_key=telemetry_key", json=payload,
+                        headers={"X-Request-ID": "same"}).json()["request_id"]
+            for _ in range(2)
+        ]
+        assert len(set(request_ids)) == 2
+        for request_id in request_ids:
+            trace = client.get(f"/api/history/telemetry/{request_id}", params={"api_key": "telemetry_key"})
+            assert trace.status_code == 200
+            assert trace.json()["telemetry"]["solutions"] >= 1
+            assert trace.json()["telemetry"]["strategy"] == "PATH_CHEAPEST_ARC"  # OR-Tools, not the fallback
+        missing = client.get("/api/history/telemetry/nope", params={"api_key": "telemetry_key"})
+        assert missing.status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+
+def test_telemetry_with_unknown_api_key_is_rejected_before_solving(session_factory, user, monkeypatch):
+    monkeypatch.setattr(optimize_router, "SessionLocal", session_factory)
+    solves = []
+    monkeypatch.setattr(optimize_router.route_optimizer, "optimize", lambda *a, **k: solves.append(a))
+    payload = {"addresses": [
+        {"id": i, "name": f"Stop{i}", "street": f"Street{i}", "city": "Delhi",
+         "latitude": 28.6139 + i * 0.001, "longitude": 77.2090 + i * 0.001}
+        for i in range(3)
+    ]}
+    response = TestClient(app).post("/api/optimize?telemetry=true&api_key=wrong", json=payload)
+    assert response.status_code == 401
+    assert solves == []
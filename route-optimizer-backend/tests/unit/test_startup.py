@@ -0,0 +1,82 @@
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+from benchmarks.loadtest import BACKEND_DIR
+from benchmarks.startup import parse_importtime
+from app.services.cache_service import CacheService
+from app.services.geocoder import GeocoderService
+from app.services.route_optimizer import RouteOptimizer
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      5000 |       9000 | pandas
+"""
+
+def test_parse_importtime():
+    rows = parse_importtime(IMPORTTIME)
+    assert rows == [
+        {"module": "_io", "depth": 1, "self_us": 120, "cumulative_us": 120},
+        {"module": "pandas", "depth": 0, "self_us": 5000, "cumulative_us": 9000},
+    ]
+
+def test_app_import_defers_heavy_modules():
+    code = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('pandas', 'geopy', 'numpy', 'ortools') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+@patch("redis.from_url")
+def test_background_cache_connect_does_not_block(mock_redis):
+    released = threading.Event()
+    client = MagicMock()
+    client.ping.side_effect = lambda: released.wait(5)
+    mock_redis.return_value = client
+
+    start = time.perf_counter()
+    cache = CacheService(background=True)
+    assert time.perf_counter() - start < 0.5
+    assert cache.redis_available is False
+    assert cache.get_geocoded("x") is None
+
+    released.set()
+    for _ in range(100):
+        if cache.redis_available:
+            break
+        time.sleep(0.01)
+    assert cache.redis_available is True
+
+def test_services_build_clients_on_first_use():
+    service = GeocoderService()
+    assert service._geolocator is None
+    assert service.geolocator is service.geolocator
+
+    optimizer = RouteOptimizer()
+    assert optimizer._ortools_checked is None
+    optimizer._ortools_available = False
+    assert optimizer._ortools_available is False
+
+def test_db_requests_wait_for_background_schema_init(monkeypatch):
+    import app.main as main
+    from app.database import connection
+    gate = threading.Event()
+    monkeypatch.setattr(main.settings, "INIT_DB_ON_STARTUP", True)
+    monkeypatch.setattr(main, "init_db", lambda: gate.wait(5))
+    main.startup_event()
+    try:
+        assert not connection.schema_ready.is_set()
+        sessions = []
+        waiter = threading.Thread(target=lambda: sessions.append(next(connection.get_db())))
+        waiter.start()
+        waiter.join(0.2)
+        assert sessions == []  # still blocked on create_all
+        gate.set()
+        waiter.join(5)
+        assert len(sessions) == 1 and connection.schema_ready.is_set()
+        sessions[0].close()
+    finally:
+        gate.set()
+        connection.schema_ready.wait(5)
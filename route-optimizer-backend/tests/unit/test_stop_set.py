@@ -0,0 +1,48 @@
+import math
+import pytest
+from app.models.address import AddressInput
+from app.models.stop_set import StopSet
+from app.services.distance_calculator import DistanceCalculator
+from app.services.response_builder import build_optimization_response
+
+ADDRESSES = [
+    AddressInput(id=10, name="Depot", street="1 MG Road", city="Delhi", latitude=28.6139, longitude=77.2090),
+    AddressInput(id=11, name="B", street="2 Link Road", city="Delhi", postal_code="110001"),
+    AddressInput(id=12, name="C", street="3 Ring Road", city="Delhi", latitude=28.7041, longitude=77.1025,
+                 phone="9999999999"),
+]
+
+def test_from_addresses_is_columnar():
+    stops = StopSet.from_addresses(ADDRESSES)
+    assert len(stops) == 3
+    assert stops.ids.tolist() == [10, 11, 12]
+    assert stops.coords.shape == (3, 2)
+    assert math.isnan(stops.coords[1, 0])
+    assert stops.located.tolist() == [True, False, True]
+    assert stops.missing() == [1]
+    assert stops.postal_codes == [None, "110001", None]
+
+def test_take_keeps_rows_aligned():
+    stops = StopSet.from_addresses(ADDRESSES).take([2, 0])
+    assert stops.ids.tolist() == [12, 10]
+    assert stops.names == ["C", "Depot"]
+    assert stops.phones == ["9999999999", None]
+    assert stops.source_index.tolist() == [2, 0]
+    assert stops.coord_tuples() == [(28.7041, 77.1025), (28.6139, 77.2090)]
+
+def test_to_addresses_round_trip():
+    stops = StopSet.from_addresses(ADDRESSES).take([0, 2])
+    addresses = stops.to_addresses()
+    assert [a.id for a in addresses] == [10, 12]
+    assert addresses[1].latitude == 28.7041
+    assert addresses[1].street == "3 Ring Road"
+
+def test_response_from_stop_set_matches_per_stop_haversine():
+    stops = StopSet.from_addresses(ADDRESSES).take([0, 2])
+    resp = build_optimization_response("r1", stops, [0, 1, 0], 20.0, 5)
+    first = resp.route.stops[0]
+    expected = DistanceCalculator.haversine_distance(28.6139, 77.2090, 28.7041, 77.1025)
+    assert first.address_id == 10
+    assert first.distance_from_previous_km == pytest.approx(expected, rel=1e-12)
+    assert resp.route.stops[1].cumulative_distance_km == pytest.approx(2 * expected, rel=1e-12)
+    assert resp.route.total_time_min == pytest.approx(2 * expected / 30 * 60)
@@ -0,0 +1,215 @@
+import io
+import tracemalloc
+import orjson
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.upload import iter_csv_chunks, parse_csv_text, stream_csv_ndjson
+
+CSV = """id,name,street,city,postal_code,latitude,longitude
+1,Office,123 Main,Delhi,011001,28.6139,77.2090
+x,Bad,1 Road,Delhi,,28.6,77.2
+3,Shop,456 Second,Delhi,,,
+4,Far,789 Third,Delhi,,95.0,77.2
+5,,1 Lane,Delhi,,28.6,77.2
+6,Stall,2 Lane,Delhi,,28.7,77.3
+"""
+
+def test_column_conversion_and_errors():
+    data = parse_csv_text(CSV, "a.csv")
+    assert data["total_rows"] == 6
+    assert data["parsed_successfully"] == 3
+    assert data["failed"] == 3
+    first, default, last = data["addresses"]
+    assert first == {"id": 1, "name": "Office", "street": "123 Main", "city": "Delhi",
+                     "postal_code": "011001", "lat": 28.6139, "lng": 77.209}
+    assert (default["lat"], default["lng"]) == (20.5937, 78.9629)  # empty cells fall back like absent columns
+    assert last["postal_code"] is None
+    assert data["errors"] == ["Row 3: invalid id", "Row 5: latitude out of range", "Row 6: empty name"]
+
+def test_chunking_does_not_change_results():
+    whole = [a for chunk, _, _ in iter_csv_chunks(io.StringIO(CSV), chunk_rows=100) for a in chunk]
+    small = list(iter_csv_chunks(io.StringIO(CSV), chunk_rows=2))
+    assert len(small) == 3
+    assert [a for chunk, _, _ in small for a in chunk] == whole
+    assert [e for _, errors, _ in small for e in errors] == ["Row 3: invalid id", "Row 5: latitude out of range",
+                                                            "Row 6: empty name"]
+
+def test_missing_columns_and_empty_file():
+    with pytest.raises(HTTPException) as e:
+        list(iter_csv_chunks(io.StringIO("id,name\n1,a\n")))
+    assert "Missing columns" in e.value.detail
+    with pytest.raises(HTTPException) as e:
+        list(iter_csv_chunks(io.StringIO("")))
+    assert e.value.status_code == 400
+
+def test_ndjson_stream_lines():
+    lines = [orjson.loads(l) for chunk in stream_csv_ndjson(io.BytesIO(CSV.encode()), "a.csv")
+             for l in chunk.splitlines()]
+    assert sum("address" in l for l in lines) == 3
+    assert sum("error" in l for l in lines) == 3
+    assert lines[-1]["summary"]["total_rows"] == 6
+
+def test_ndjson_endpoint():
+    client = TestClient(app)
+    files = {"file": ("a.csv", io.BytesIO(CSV.encode()), "text/csv")}
+    response = client.post("/api/upload/csv?format=ndjson", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert orjson.loads(response.text.strip().splitlines()[-1])["summary"]["parsed_successfully"] == 3
+    files = {"file": ("a.csv", io.BytesIO(b"id,name\n1,a\n"), "text/csv")}
+    assert client.post("/api/upload/csv?format=ndjson", files=files).status_code == 400
+
+def _peak_parse_bytes(rows: int) -> int:
+    body = "".join(f"{i},Stop {i},{i} MG Road,Delhi,110001,28.{i % 9999:04d},77.{i % 7777:04d}\n"
+                   for i in range(rows))
+    source = io.BytesIO(("id,name,street,city,postal_code,latitude,longitude\n" + body).encode())
+    tracemalloc.start()
+    try:
+        count = sum(len(chunk) for chunk, _, _ in iter_csv_chunks(source, chunk_rows=1000))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == rows
+    return peak
+
+def test_parse_memory_does_not_grow_with_file_size():
+    _peak_parse_bytes(10)  # warm up pandas' one-off allocations
+    small, large = _peak_parse_bytes(5000), _peak_parse_bytes(25000)
+    assert large < small * 1.5
+
+TEXT = b"12 MG Road, Delhi\n\nNowhere Lane\n12 MG Road,   Delhi\nPark Street, Kolkata\n"
+
+@pytest.fixture
+def fake_nominatim(monkeypatch):
+    from unittest.mock import MagicMock
+    from app.services.geocoder import geocoder
+    calls = []
+    def geocode(query):
+        calls.append(query)
+        return None if query.startswith("Nowhere") else MagicMock(latitude=28.6 + len(calls), longitude=77.2)
+    monkeypatch.setattr(geocoder, "min_delay_seconds", 0)
+    monkeypatch.setattr(geocoder, "cache", {})
+    monkeypatch.setattr(geocoder, "geolocator", MagicMock(geocode=geocode))
+    return calls
+
+def test_text_upload_uses_shared_geocoder_with_dedupe(fake_nominatim):
+    client = TestClient(app)
+    files = {"file": ("stops.dat", io.BytesIO(TEXT), "application/octet-stream")}
+    data = client.post("/api/upload/csv", files=files).json()
+    assert fake_nominatim == ["12 MG Road, Delhi", "Nowhere Lane", "Park Street, Kolkata"]
+    assert data["total_rows"] == 4
+    assert data["failed"] == 1
+    assert data["errors"] == ["Line 2: could not geocode"]
+    first, missing, repeat, _ = data["addresses"]
+    assert (first["lat"], first["lng"]) == (repeat["lat"], repeat["lng"]) == (29.6, 77.2)
+    assert (missing["lat"], missing["lng"]) == (20.5937, 78.9629)
+
+def test_text_upload_streams_ndjson(fake_nominatim):
+    client = TestClient(app)
+    files = {"file": ("stops.dat", io.BytesIO(TEXT), "application/octet-stream")}
+    response = client.post("/api/upload/csv?format=ndjson", files=files)
+    lines = [orjson.loads(l) for l in response.text.splitlines()]
+    assert [l["address"]["id"] for l in lines[:-1]] == [1, 2, 3, 4]
+    assert lines[1]["error"] == "Line 2: could not geocode"
+    assert lines[-1]["summary"] == {"filename": "stops.dat", "total_rows": 4, "parsed_successfully": 3, "failed": 1}
+
+def _address_table():
+    pa = pytest.importorskip("pyarrow")
+    return pa.table({
+        "id": [1, 2, 3, 4, 5],
+        "name": ["Office", "Shop", "", "Stall", "Kiosk"],
+        "street": ["123 Main", "456 Second", "1 Lane", "2 Lane", "3 Lane"],
+        "city": ["Delhi"] * 5,
+        "postal_code": [110001, None, None, 110003, None],
+        "latitude": [28.6139, None, 28.6, 95.0, 28.7],
+        "longitude": [77.209, None, 77.2, 77.2, 77.3],
+        "notes": ["x" * 1000] * 5,  # not an address column: never read
+    })
+
+def _columnar_bytes(kind):
+    pa = pytest.importorskip("pyarrow")
+    table, sink = _address_table(), io.BytesIO()
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink)
+    elif kind == "arrow":
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue()
+
+@pytest.mark.parametrize("kind,fmt", [("parquet", "parquet"), ("arrow", "arrow"), ("stream", "arrow")])
+def test_columnar_upload(kind, fmt):
+    client = TestClient(app)
+    files = {"file": (f"book.{kind}", io.BytesIO(_columnar_bytes(kind)), "application/octet-stream")}
+    data = client.post("/api/upload/columnar", files=files).json()
+    assert (data["format"], data["total_rows"], data["parsed_successfully"], data["failed"]) == (fmt, 5, 3, 2)
+    assert data["errors"] == ["Row 3: empty name", "Row 4: latitude out of range"]
+    columns = data["columns"]
+    assert columns["ids"] == [1, 2, 5]
+    assert columns["postal_codes"] == ["110001", None, None]
+    assert columns["latitudes"] == [28.6139, None, 28.7]  # left for the optimizer to geocode
+    assert set(columns) == {"ids", "names", "streets", "cities", "postal_codes", "phones", "latitudes", "longitudes"}
+
+def test_columnar_batches_do_not_change_results(tmp_path):
+    from app.routers.upload import read_columnar_stops
+    path = tmp_path / "book.arrow"
+    path.write_bytes(_columnar_bytes("arrow"))
+    whole, errors, total, _ = read_columnar_stops(str(path), chunk_rows=100)
+    small, small_errors, small_total, _ = read_columnar_stops(str(path), chunk_rows=2)
+    assert small.to_columns() == whole.to_columns()
+    assert (small_errors, small_total) == (errors, total)
+
+def test_columnar_upload_rejects_bad_files():
+    pytest.importorskip("pyarrow")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    client = TestClient(app)
+    sink = io.BytesIO()
+    pq.write_table(pa.table({"id": [1], "name": ["a"]}), sink)
+    response = client.post("/api/upload/columnar", files={"file": ("b.parquet", io.BytesIO(sink.getvalue()))})
+    assert response.status_code == 400
+    assert "street" in response.json()["detail"]
+    response = client.post("/api/upload/columnar", files={"file": ("b.parquet", io.BytesIO(b"id,name\n1,a\n"))})
+    assert response.status_code == 400
+
+def test_columnar_upload_without_pyarrow(monkeypatch):
+    from app.routers import upload
+    monkeypatch.setattr(upload, "_pyarrow", lambda: None)
+    client = TestClient(app)
+    response = client.post("/api/upload/columnar", files={"file": ("b.parquet", io.BytesIO(b"PAR1"))})
+    assert response.status_code == 415
+
+def test_upload_rows_follow_address_input_limits(tmp_path):
+    import pyarrow as pa
+    from app.models.address import AddressInput
+    from app.routers.upload import MAX_LENGTHS, read_columnar_stops, read_csv_stops
+    for col, limit in MAX_LENGTHS.items():
+        assert any(getattr(m, "max_length", None) == limit for m in AddressInput.model_fields[col].metadata)
+
+    rows = [
+        (1, "Office", "1 MG Road   ", "Delhi  ", "110001"),
+        (2, "N" * 256, "Street", "Delhi", None),
+        (3, "Shop", "S" * 256, "Delhi", None),
+        (4, "Shop", "Street", "C" * 101, None),
+        (5, "Shop", "Street", "Delhi", "1" * 21),
+        (6, "N" * 255, "Street", "C" * 100, "1" * 20),
+    ]
+    expected_reasons = ["name longer than 255 characters", "street longer than 255 characters",
+                        "city longer than 100 characters", "postal_code longer than 20 characters"]
+    csv_path = tmp_path / "book.csv"
+    csv_path.write_text("id,name,street,city,postal_code\n" + "".join(
+        f"{i},{n},{s},{c},{p or ''}\n" for i, n, s, c, p in rows))
+    arrow_path = tmp_path / "book.arrow"
+    table = pa.table(dict(zip(["id", "name", "street", "city", "postal_code"], map(list, zip(*rows)))))
+    with pa.ipc.new_file(str(arrow_path), table.schema) as writer:
+        writer.write_table(table)
+
+    for stops, errors in (read_csv_stops(str(csv_path))[:2], read_columnar_stops(str(arrow_path))[:2]):
+        assert stops.ids.tolist() == [1, 6]
+        assert (stops.streets[0], stops.cities[0]) == ("1 MG Road", "Delhi")
+        assert [e.split(": ", 1)[1] for e in errors] == expected_reasons  # CSV rows count the header line